@@ -0,0 +1,106 @@
+"""Micro-benchmark: should_ignore_file vs. the precompiled IgnoreMatcher.
+
+Builds a synthetic in-memory tree (200k paths by default) and walks it the way
+the scanner does, pruning ignored directories, once with the per-path
+should_ignore_file checks and once with IgnoreMatcher.matches_entry.
+
+Usage:
+    python benchmarks/bench_ignore_matcher.py [--paths 200000] [--seed 0]
+"""
+
+import argparse
+import os
+import random
+import time
+from typing import Callable, Dict, List, Tuple
+
+from scanners.utils.file_utils import IgnoreMatcher, should_ignore_file
+
+
+EXACT_NAMES = [
+    "ignore.json", "LICENSE", ".venv", ".git", "clone_dir", "build", "dist",
+    "pyproject.toml", "README.md", "scanner_metadata", "config.json", "node_modules",
+]
+GLOB_PATTERNS = [
+    "*.log", "*.tmp", "*.bak", "*.swp", "*.min.js", "*.map", "*.lock", "temp/*",
+    "coverage*", "*.egg-info", "__pycache__", "*.orig", "*.rej", ".DS_Store",
+]
+GITIGNORE_LINES = ["*.pyc\n", "/out/\n", "docs/_build/\n", "**/fixtures/*.json\n", "!keep.log\n"]
+
+DIR_NAMES = ["src", "lib", "pkg", "core", "utils", "tests", "docs", "api", "models", "views",
+             "build", "node_modules", "temp", "fixtures", "__pycache__", "vendor", ".git"]
+FILE_NAMES = ["index", "main", "util", "helpers", "config", "types", "service", "model", "test_core"]
+FILE_EXTENSIONS = [".py", ".js", ".ts", ".md", ".json", ".log", ".pyc", ".min.js", ".txt", ".yaml"]
+
+# Tree node: (subdirectory name -> node, file names)
+Node = Tuple[Dict[str, "Node"], List[str]]
+
+
+def build_tree(path_count: int, seed: int) -> Node:
+    """Generate a random directory tree with roughly path_count entries."""
+    rng = random.Random(seed)
+    root: Node = ({}, [])
+    directories = [(root, 0)]
+    created = 0
+    while created < path_count:
+        node, depth = rng.choice(directories)
+        if depth < 8 and rng.random() < 0.15:
+            name = f"{rng.choice(DIR_NAMES)}{rng.randint(0, 3) or ''}"
+            if name not in node[0]:
+                child: Node = ({}, [])
+                node[0][name] = child
+                directories.append((child, depth + 1))
+                created += 1
+        else:
+            node[1].append(f"{rng.choice(FILE_NAMES)}{rng.randint(0, 999)}{rng.choice(FILE_EXTENSIONS)}")
+            created += 1
+    return root
+
+
+def walk_tree(root: Node, is_ignored: Callable[[str, str, bool], bool]) -> int:
+    """Walk the tree top-down with pruning and count the files that are kept."""
+    kept = 0
+    stack = [("", root)]
+    while stack:
+        prefix, (dirs, files) = stack.pop()
+        for name, child in dirs.items():
+            if not is_ignored(prefix + name, name, True):
+                stack.append((prefix + name + "/", child))
+        kept += sum(1 for name in files if not is_ignored(prefix + name, name, False))
+    return kept
+
+
+def run(path_count: int, seed: int) -> None:
+    tree = build_tree(path_count, seed)
+    base_path = os.path.abspath(os.sep + "repo")
+
+    def legacy(relative_path: str, name: str, is_dir: bool) -> bool:
+        return should_ignore_file(os.path.join(base_path, relative_path), base_path, EXACT_NAMES, GLOB_PATTERNS)
+
+    compiled = IgnoreMatcher(EXACT_NAMES, GLOB_PATTERNS)
+    with_gitignore = IgnoreMatcher(EXACT_NAMES, GLOB_PATTERNS, GITIGNORE_LINES)
+
+    print(f"Synthetic tree: {path_count} paths, {len(EXACT_NAMES)} names, {len(GLOB_PATTERNS)} globs")
+    results = []
+    for label, check in (
+        ("should_ignore_file", legacy),
+        ("IgnoreMatcher", compiled.matches_entry),
+        ("IgnoreMatcher + .gitignore", with_gitignore.matches_entry),
+    ):
+        start = time.perf_counter()
+        kept = walk_tree(tree, check)
+        elapsed = time.perf_counter() - start
+        results.append((label, kept, elapsed))
+        print(f"  {label:<28} kept {kept:>7} files in {elapsed * 1000:8.1f} ms")
+
+    if results[0][1] != results[1][1]:
+        print("  WARNING: legacy and compiled matchers disagree")
+    print(f"  Speedup: {results[0][2] / results[1][2]:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paths", type=int, default=200_000, help="number of synthetic paths")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the tree layout")
+    args = parser.parse_args()
+    run(args.paths, args.seed)
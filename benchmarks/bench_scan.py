@@ -0,0 +1,144 @@
+"""End-to-end scanner benchmark against a local mock LLM server.
+
+Generates a synthetic repository, serves /chat/completions locally with the
+configured latency, jitter and 429 ratio, and runs scan_repository on it in a
+fresh process so peak RSS covers the scan alone. No network access or API
+key is needed, and runs with the same seed are directly comparable.
+
+Reports files/sec, end-to-end time, time per phase (walk, filter, read, llm,
+write, rollup) summed over worker threads, request counts and peak RSS.
+
+Usage:
+    python benchmarks/bench_scan.py [--files 2000] [--latency-ms 50] [--concurrency 8] [--json report.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict
+
+from mock_llm_server import MockLLMServer
+from synthetic_repo import generate_synthetic_repo
+
+
+def run_scan(repo_path: str, target_dir: str, config_path: str, scan_options: Dict[str, Any], verbose: bool) -> Dict[str, Any]:
+    """Scan a repository with phase metrics enabled. Runs in the benchmark's child process."""
+    from scanners.ScanFullRepo import scan_repository
+    from scanners.utils.clone_repo import get_clone_path
+    from scanners.utils.scan_metrics import SCAN_REPORT_FILENAME
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with output:
+        start = time.perf_counter()
+        succeeded = scan_repository(repo_path, target_dir, config_path=config_path, **scan_options)
+        elapsed = time.perf_counter() - start
+
+    report_path = os.path.join(get_clone_path(repo_path, target_dir), "scanner_metadata", SCAN_REPORT_FILENAME)
+    with open(report_path) as file:
+        scan_report = json.load(file)
+
+    return {
+        "succeeded": succeeded,
+        "seconds": elapsed,
+        "phases": scan_report["phases"],
+        "llm": scan_report["llm"],
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    }
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="scythe-bench-") as work_dir:
+        repo = generate_synthetic_repo(
+            os.path.join(work_dir, "repo"), args.files, args.depth, args.files_per_dir,
+            args.median_size, args.size_sigma, args.binary_ratio, args.seed
+        )
+        print(
+            f"Synthetic repository: {repo.text_files} text + {repo.binary_files} binary files, "
+            f"{repo.total_bytes / 1024 / 1024:.1f} MB, {repo.directories} directories"
+        )
+
+        with MockLLMServer(
+            latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+            rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after,
+            requests_per_second=args.requests_per_second, seed=args.seed,
+            slow_ratio=args.slow_ratio, slow_latency=args.slow_latency_ms / 1000
+        ) as server:
+            config_path = os.path.join(work_dir, "config.json")
+            with open(config_path, 'w') as file:
+                json.dump({"openrouter_api_key": "benchmark", "model": "benchmark-model", "base_url": server.url}, file)
+
+            scan_options = {
+                "max_concurrency": args.concurrency,
+                "use_cache": args.cache,
+                "cache_path": os.path.join(work_dir, "summary_cache.sqlite3"),
+                "batch_small_files": not args.no_batch,
+                "store_backend": args.store,
+                "first_token_timeout": args.first_token_timeout,
+                "hedge_percentile": args.hedge_percentile,
+            }
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                result = executor.submit(
+                    run_scan, repo.path, os.path.join(work_dir, "clones"), config_path, scan_options, args.verbose
+                ).result()
+            result["server"] = server.stats()
+
+    result["text_files"] = repo.text_files
+    result["files_per_second"] = repo.text_files / result["seconds"] if result["seconds"] else 0.0
+    result["parameters"] = {name: value for name, value in vars(args).items() if name != "json"}
+    return result
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"\nScan {'succeeded' if result['succeeded'] else 'FAILED'}")
+    print(f"  End-to-end:   {result['seconds']:8.2f} s")
+    print(f"  Throughput:   {result['files_per_second']:8.1f} files/s")
+    print(f"  Peak RSS:     {result['peak_rss_mb']:8.1f} MB")
+    server = result["server"]
+    print(f"  LLM requests: {server['completions']:8d} completed, {server['rate_limited']} rate limited")
+    latency = result["llm"]["latency_seconds"]
+    print(f"  LLM latency:  p50 {latency['p50'] * 1000:.0f} ms, p95 {latency['p95'] * 1000:.0f} ms, p99 {latency['p99'] * 1000:.0f} ms")
+    print("  Phases (summed over threads):")
+    for phase, totals in result["phases"].items():
+        print(f"    {phase:<8} {totals['seconds']:8.2f} s over {totals['count']} calls")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000, help="number of files in the synthetic repository")
+    parser.add_argument("--depth", type=int, default=4, help="maximum directory depth")
+    parser.add_argument("--files-per-dir", type=int, default=20, help="average files per directory")
+    parser.add_argument("--median-size", type=int, default=2048, help="median file size in bytes")
+    parser.add_argument("--size-sigma", type=float, default=1.0, help="log-normal spread of file sizes")
+    parser.add_argument("--binary-ratio", type=float, default=0.05, help="fraction of binary files")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the repository and the server")
+    parser.add_argument("--latency-ms", type=float, default=50, help="mean mock LLM latency")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="maximum mock LLM latency deviation")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--requests-per-second", type=float, help="mock rate limit above which requests get 429s")
+    parser.add_argument("--slow-ratio", type=float, default=0.0, help="fraction of mock requests answered after --slow-latency-ms")
+    parser.add_argument("--slow-latency-ms", type=float, default=10000, help="latency of the slow mock requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="scan max_concurrency")
+    parser.add_argument("--first-token-timeout", type=float, help="scan first_token_timeout in seconds")
+    parser.add_argument("--hedge-percentile", type=float, help="scan hedge_percentile")
+    parser.add_argument("--store", choices=["sqlite", "markdown"], default="sqlite", help="summary store backend")
+    parser.add_argument("--cache", action="store_true", help="use a (fresh) summary cache")
+    parser.add_argument("--no-batch", action="store_true", help="disable small-file batching")
+    parser.add_argument("--verbose", action="store_true", help="show the scanner's own output")
+    parser.add_argument("--json", help="also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(report, file, indent=2)
+    sys.exit(0 if report["succeeded"] else 1)
@@ -0,0 +1,283 @@
+"""Local stand-in for an OpenAI-compatible ``/chat/completions`` endpoint.
+
+Answers every completion request after a configurable latency with jitter,
+and can reject a fraction of requests, or the requests above a rate limit,
+with HTTP 429 and a Retry-After header. A fraction of the requests can be made
+much slower, like the stuck requests of a real provider. Requests with
+``"stream": true`` get their answer as server-sent events, sent after the latency.
+Batched summary prompts (files introduced by ``=== path ===`` lines) are
+answered with a JSON object keyed by path, like a real model would.
+
+Usage:
+    python benchmarks/mock_llm_server.py [--port 8765] [--latency-ms 50] [--jitter-ms 20] [--rate-limit-ratio 0.05]
+        [--requests-per-second 100] [--slow-ratio 0.02] [--slow-latency-ms 10000]
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+
+_BATCH_PATH_PATTERN = re.compile(r"^=== (.+) ===$", re.MULTILINE)
+
+
+class MockLLMServer:
+    """Threaded HTTP server that imitates the chat completions API."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        rate_limit_ratio: float = 0.0,
+        retry_after: float = 0.5,
+        requests_per_second: Optional[float] = None,
+        seed: Optional[int] = None,
+        slow_ratio: float = 0.0,
+        slow_latency: float = 10.0
+    ) -> None:
+        """Bind the server; call start() to begin serving.
+
+        Args:
+            host: Interface to listen on.
+            port: Port to listen on, or 0 for any free port.
+            latency: Mean response latency in seconds.
+            jitter: Maximum deviation from the mean latency in seconds.
+            rate_limit_ratio: Fraction of requests rejected with HTTP 429.
+            retry_after: Retry-After value sent with 429 responses, in seconds.
+            requests_per_second: Rate above which requests are rejected with
+                HTTP 429, like a provider's rate limit, or None for no limit.
+                Allows a burst of one second of requests.
+            seed: Seed for latency and rate-limit randomness.
+            slow_ratio: Fraction of requests answered after slow_latency instead.
+            slow_latency: Latency of the slow requests in seconds.
+
+        Raises:
+            ValueError: If a latency, jitter or ratio is out of range.
+        """
+        if latency < 0 or jitter < 0 or slow_latency < 0:
+            raise ValueError("latency and jitter must not be negative")
+        if not 0 <= rate_limit_ratio < 1 or not 0 <= slow_ratio < 1:
+            raise ValueError("rate_limit_ratio and slow_ratio must be in [0, 1)")
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.requests_per_second = requests_per_second
+        self.slow_ratio = slow_ratio
+        self.slow_latency = slow_latency
+        self._tokens = requests_per_second or 0.0
+        self._last_refill = time.monotonic()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "completions": 0, "rate_limited": 0, "slow": 0, "prompt_tokens": 0}
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to configure as the API ``base_url``."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until stop() is called."""
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        """Stop serving and release the port."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        """Get request counters since the server started."""
+        with self._lock:
+            return dict(self._counters)
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def _next_delay(self) -> Tuple[Optional[float], float]:
+        """Decide how to answer the next request.
+
+        Returns:
+            Retry-After seconds if the request is rejected (else None), and the
+            response latency.
+        """
+        with self._lock:
+            self._counters["requests"] += 1
+            retry_after = self.retry_after if self._random.random() < self.rate_limit_ratio else None
+            if retry_after is None and self.requests_per_second:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.requests_per_second,
+                    self._tokens + (now - self._last_refill) * self.requests_per_second
+                )
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                else:
+                    retry_after = (1 - self._tokens) / self.requests_per_second
+            if retry_after is not None:
+                self._counters["rate_limited"] += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            if self._random.random() < self.slow_ratio:
+                self._counters["slow"] += 1
+                delay = self.slow_latency
+        return retry_after, delay
+
+    def _complete(self, body: Dict) -> Dict:
+        prompt = body["messages"][-1]["content"]
+        batch_paths = _BATCH_PATH_PATTERN.findall(prompt)
+        if batch_paths and "JSON" in prompt:
+            text = json.dumps({path: f"Mock summary of {path}." for path in batch_paths})
+        else:
+            first_line = prompt.splitlines()[0] if prompt else ""
+            text = f"Mock summary ({len(prompt)} characters): {first_line[:80]}"
+
+        prompt_tokens = len(prompt) // 4
+        with self._lock:
+            self._counters["completions"] += 1
+            self._counters["prompt_tokens"] += prompt_tokens
+
+        return {
+            "id": "mock-completion",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(text) // 4,
+                "total_tokens": prompt_tokens + len(text) // 4,
+            },
+        }
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+            def handle(self) -> None:
+                try:
+                    super().handle()
+                except ConnectionResetError:
+                    # Clients drop the connections of streams they gave up on
+                    pass
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                retry_after, delay = server._next_delay()
+                if retry_after is not None:
+                    self._send_json(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit"}}, {
+                        "Retry-After": f"{math.ceil(retry_after)}",
+                        "retry-after-ms": str(math.ceil(retry_after * 1000)),
+                    })
+                    return
+
+                if not body.get("stream"):
+                    time.sleep(delay)
+                    self._send_json(200, server._complete(body))
+                    return
+
+                # Providers send the headers at once and the first token after the latency
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self.wfile.flush()
+                time.sleep(delay)
+                try:
+                    for event in _stream_events(server._complete(body), body):
+                        data = f"data: {event}\n\n".encode("utf-8")
+                        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on the stream
+                    self.close_connection = True
+
+            def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def _stream_events(completion: Dict, body: Dict) -> List[str]:
+    """Split a completion into the ``data:`` payloads of a streamed response."""
+    text = completion["choices"][0]["message"]["content"]
+    base = {key: completion[key] for key in ("id", "created", "model")}
+    base["object"] = "chat.completion.chunk"
+    pieces = [text[start:start + 16] for start in range(0, len(text), 16)]
+    events = [
+        json.dumps({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        for piece in pieces
+    ]
+    events.append(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+    if (body.get("stream_options") or {}).get("include_usage"):
+        events.append(json.dumps({**base, "choices": [], "usage": completion["usage"]}))
+    events.append("[DONE]")
+    return events
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--latency-ms", type=float, default=50, help="mean response latency")
+    parser.add_argument("--jitter-ms", type=float, default=20, help="maximum latency deviation")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.5, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--requests-per-second", type=float, help="rate limit above which requests get 429s")
+    parser.add_argument("--slow-ratio", type=float, default=0.0, help="fraction of requests answered after --slow-latency-ms")
+    parser.add_argument("--slow-latency-ms", type=float, default=10000, help="latency of the slow requests")
+    args = parser.parse_args()
+
+    mock_server = MockLLMServer(
+        port=args.port, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+        rate_limit_ratio=args.rate_limit_ratio, retry_after=args.retry_after,
+        requests_per_second=args.requests_per_second, slow_ratio=args.slow_ratio,
+        slow_latency=args.slow_latency_ms / 1000
+    )
+    print(f"Serving mock chat completions at {mock_server.url} (Ctrl+C to stop)")
+    try:
+        mock_server.serve_forever()
+    except KeyboardInterrupt:
+        mock_server.stop()
@@ -0,0 +1,162 @@
+"""Generate synthetic Git repositories for scanner benchmarks.
+
+File sizes follow a log-normal distribution around a median, directories are
+nested up to a maximum depth, and a fraction of the files is binary. The same
+seed always produces the same repository.
+
+Usage:
+    python benchmarks/synthetic_repo.py OUTPUT_DIR [--files 1000] [--depth 4] [--median-size 2048]
+"""
+
+import argparse
+import math
+import os
+import random
+from dataclasses import dataclass
+from typing import List
+
+from git import Repo
+
+
+TEXT_EXTENSIONS = [".py", ".js", ".ts", ".go", ".md", ".json", ".yaml", ".txt"]
+BINARY_EXTENSIONS = [".dat", ".bin", ".blob"]
+WORDS = [
+    "def", "class", "return", "import", "self", "value", "config", "result", "items", "index",
+    "parse", "load", "save", "error", "request", "response", "client", "server", "cache", "path",
+]
+MAX_FILE_SIZE = 4 * 1024 * 1024
+
+
+@dataclass
+class SyntheticRepoStats:
+    """What generate_synthetic_repo created.
+
+    Attributes:
+        path: Path of the repository working tree.
+        text_files: Number of text files.
+        binary_files: Number of binary files.
+        directories: Number of directories, including the root.
+        total_bytes: Combined size of all files.
+    """
+
+    path: str
+    text_files: int
+    binary_files: int
+    directories: int
+    total_bytes: int
+
+
+def generate_synthetic_repo(
+    path: str,
+    file_count: int = 1000,
+    max_depth: int = 4,
+    files_per_directory: int = 20,
+    median_size: int = 2048,
+    size_sigma: float = 1.0,
+    binary_ratio: float = 0.05,
+    seed: int = 0
+) -> SyntheticRepoStats:
+    """Create a Git repository with one commit of synthetic files.
+
+    Args:
+        path: Directory to create the repository in. Must not exist or be empty.
+        file_count: Number of files to create.
+        max_depth: Maximum directory nesting below the root.
+        files_per_directory: Average number of files per directory.
+        median_size: Median file size in bytes.
+        size_sigma: Spread of the log-normal size distribution; 0 makes every
+            file median_size bytes.
+        binary_ratio: Fraction of files that are binary.
+        seed: Random seed.
+
+    Returns:
+        Counts of what was created.
+
+    Raises:
+        ValueError: If a count, size or ratio is out of range.
+    """
+    if file_count < 1 or files_per_directory < 1 or median_size < 1:
+        raise ValueError("file_count, files_per_directory and median_size must be at least 1")
+    if max_depth < 0 or size_sigma < 0:
+        raise ValueError("max_depth and size_sigma must not be negative")
+    if not 0 <= binary_ratio <= 1:
+        raise ValueError("binary_ratio must be between 0 and 1")
+
+    rng = random.Random(seed)
+    os.makedirs(path, exist_ok=True)
+    directories = _generate_directories(rng, path, max(1, file_count // files_per_directory), max_depth)
+    line_pool = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 12))) for _ in range(256)]
+
+    stats = SyntheticRepoStats(path, 0, 0, len(directories), 0)
+    for index in range(file_count):
+        directory = rng.choice(directories)
+        size = min(MAX_FILE_SIZE, max(1, int(rng.lognormvariate(math.log(median_size), size_sigma))))
+        is_binary = rng.random() < binary_ratio
+        extension = rng.choice(BINARY_EXTENSIONS if is_binary else TEXT_EXTENSIONS)
+        file_path = os.path.join(directory, f"file_{index}{extension}")
+
+        if is_binary:
+            with open(file_path, 'wb') as file:
+                file.write(b"\x00" + rng.randbytes(size - 1))
+            stats.binary_files += 1
+        else:
+            with open(file_path, 'w') as file:
+                file.write(_text_of_size(rng, line_pool, size))
+            stats.text_files += 1
+        stats.total_bytes += size
+
+    repo = Repo.init(path)
+    repo.git.add(A=True)
+    with repo.git.custom_environment(
+        GIT_AUTHOR_NAME="bench", GIT_AUTHOR_EMAIL="bench@example.com",
+        GIT_COMMITTER_NAME="bench", GIT_COMMITTER_EMAIL="bench@example.com"
+    ):
+        repo.git.commit("-q", "-m", "Synthetic repository")
+
+    return stats
+
+
+def _generate_directories(rng: random.Random, root: str, count: int, max_depth: int) -> List[str]:
+    """Create count directories (including root) as a random tree of bounded depth."""
+    directories = [(root, 0)]
+    while len(directories) < count and max_depth > 0:
+        parent, depth = rng.choice(directories)
+        if depth >= max_depth:
+            continue
+        directory = os.path.join(parent, f"dir_{len(directories)}")
+        os.mkdir(directory)
+        directories.append((directory, depth + 1))
+    return [directory for directory, _ in directories]
+
+
+def _text_of_size(rng: random.Random, line_pool: List[str], size: int) -> str:
+    """Build source-like text of exactly size ASCII characters."""
+    lines = []
+    length = 0
+    while length < size:
+        line = rng.choice(line_pool)
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)[:size - 1] + "\n" if size > 1 else "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_dir", help="directory to create the repository in")
+    parser.add_argument("--files", type=int, default=1000, help="number of files")
+    parser.add_argument("--depth", type=int, default=4, help="maximum directory depth")
+    parser.add_argument("--files-per-dir", type=int, default=20, help="average files per directory")
+    parser.add_argument("--median-size", type=int, default=2048, help="median file size in bytes")
+    parser.add_argument("--size-sigma", type=float, default=1.0, help="log-normal spread of file sizes")
+    parser.add_argument("--binary-ratio", type=float, default=0.05, help="fraction of binary files")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    created = generate_synthetic_repo(
+        args.output_dir, args.files, args.depth, args.files_per_dir,
+        args.median_size, args.size_sigma, args.binary_ratio, args.seed
+    )
+    print(
+        f"Created {created.text_files} text and {created.binary_files} binary files "
+        f"({created.total_bytes / 1024 / 1024:.1f} MB) in {created.directories} directories at {created.path}"
+    )
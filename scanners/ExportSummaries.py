@@ -0,0 +1,62 @@
+"""Export stored summaries to the markdown scanner_metadata/ layout."""
+
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+from .utils import color_print
+from .utils.summary_store import DEFAULT_STORE_BACKEND, STORE_BACKENDS, export_markdown, open_summary_store
+
+
+def export_summaries(metadata_dir: str, output_dir: Optional[str] = None, backend: str = DEFAULT_STORE_BACKEND) -> bool:
+    """Write every stored summary of a scanned repository as markdown files.
+
+    The output matches the layout scans used to write directly:
+    ``path/to/file.py.summary.md``, ``path/to/dir/_directory_summary.md`` and
+    ``_repository_summary.md``. Markdown summaries left in the output
+    directory by an earlier export, whose files are no longer in the store,
+    are removed.
+
+    Args:
+        metadata_dir: scanner_metadata directory of the scanned repository.
+        output_dir: Directory to write the markdown files to. Defaults to metadata_dir.
+        backend: Backend the summaries are stored in.
+
+    Returns:
+        True if the export completed successfully, False otherwise.
+    """
+    if not os.path.isdir(metadata_dir):
+        color_print.print_red(f"Metadata directory not found: {metadata_dir}")
+        return False
+
+    output_dir = output_dir or metadata_dir
+    with open_summary_store(metadata_dir, backend) as store:
+        exported, removed = export_markdown(store, output_dir)
+
+    color_print.print_green(f"Exported {exported} summaries to: {output_dir}")
+    if removed:
+        color_print.print_yellow(f"Removed {removed} stale summaries no longer in the store")
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the export from the command line.
+
+    Args:
+        argv: Command-line arguments, without the program name. Defaults to sys.argv.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("metadata_dir", help="scanner_metadata directory of a scanned repository")
+    parser.add_argument("--output", help="directory to write the markdown files to (default: metadata_dir)")
+    parser.add_argument("--backend", choices=sorted(STORE_BACKENDS), default=DEFAULT_STORE_BACKEND, help="backend to export from")
+    args = parser.parse_args(argv)
+
+    return 0 if export_summaries(args.metadata_dir, args.output, args.backend) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
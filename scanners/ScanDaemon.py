@@ -0,0 +1,575 @@
+"""Resident scanner service with a job queue and a local HTTP API."""
+
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from .ScanFullRepo import scan_repository
+from .ScanPr import scan_pull_request
+from .utils import color_print
+from .utils.clone_repo import get_clone_path
+from .utils.fair_share import FairShareClient, FairShareLimiter
+from .utils.llm_client import DEFAULT_TIMEOUT, LLMClient, load_api_key, load_base_url
+from .utils.llm_router import LLMRouter, load_endpoints
+from .utils.scan_metrics import ScanMetrics, collect_metrics
+from .utils.scan_progress import FILE_DONE_COUNTERS, PROGRESS_QUIET
+from .utils.summary_cache import SummaryCache
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8770
+DEFAULT_MAX_PARALLEL_SCANS = 4
+DEFAULT_LLM_CONCURRENCY = 32
+# Finished jobs kept for status queries; older ones are forgotten
+MAX_FINISHED_JOBS = 1000
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+# Options a job may pass through to scan_repository or scan_pull_request. Not
+# "profile": cProfile, sys.monitoring and tracemalloc are process-wide, so
+# profiled jobs running side by side would fail or profile each other
+REPOSITORY_SCAN_OPTIONS = {
+    "incremental", "depth", "blobless", "use_mirror", "batch_small_files",
+    "store_backend", "max_concurrency", "use_cache", "resume", "token_budget", "cost_budget",
+    "build_index",
+}
+PULL_REQUEST_SCAN_OPTIONS = {
+    "blobless", "use_mirror", "batch_small_files", "store_backend", "max_concurrency", "use_cache",
+    "resume", "build_index",
+}
+
+@dataclass
+class ScanJob:
+    """A queued, running or finished scan.
+
+    Attributes:
+        job_id: Identifier of the job.
+        repo_url: URL of the repository to scan.
+        branch: Branch to scan, or None for the default branch.
+        pr_number: Pull request to scan instead of a branch, or None.
+        options: Extra keyword arguments for scan_repository or scan_pull_request.
+        status: One of queued, running, succeeded, failed or cancelled.
+        submitted_at: Submission time, as a Unix timestamp.
+        started_at: Start time, or None while queued.
+        finished_at: End time, or None until the job finishes.
+        error: Why the job failed, if it did.
+        metrics: Metrics of the running or finished scan.
+    """
+
+    job_id: str
+    repo_url: str
+    branch: Optional[str] = None
+    pr_number: Optional[int] = None
+    options: Dict[str, Any] = field(default_factory=dict)
+    status: str = JOB_QUEUED
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    metrics: Optional[ScanMetrics] = field(default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the job, with the progress of its scan so far.
+
+        Returns:
+            JSON-serializable job description.
+        """
+        description = {
+            "job_id": self.job_id,
+            "repo_url": self.repo_url,
+            "branch": self.branch,
+            "pr_number": self.pr_number,
+            "options": self.options,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if self.metrics is not None:
+            report = self.metrics.report()
+            counters = report["counters"]
+            description["progress"] = {
+                "files_discovered": counters.get("files_discovered", 0),
+                "files_done": sum(counters.get(counter, 0) for counter in FILE_DONE_COUNTERS),
+                "directories_done": counters.get("directories_generated", 0) + counters.get("directories_reused", 0),
+                "llm_requests": report["llm"]["requests"],
+                "total_tokens": report["llm"]["total_tokens"],
+                "elapsed_seconds": report["duration_seconds"] if self.finished_at is None
+                else self.finished_at - self.started_at,
+            }
+        return description
+
+
+class ScanDaemon:
+    """Runs scan jobs for many repositories on a pool of scan workers.
+
+    Jobs are queued per repository and workers take them round-robin across
+    repositories, so one repository with many queued jobs does not hold up the
+    others. Two jobs that would use the same clone never run at once, and
+    submitting a job identical to one still queued returns the queued one.
+
+    All scans share one summary cache and one LLM client, with its keep-alive
+    connections, or one LLMRouter if config.json lists several endpoints. At
+    most ``llm_concurrency`` LLM requests are in flight across all scans, and
+    the cap is split fairly between the repositories being scanned.
+
+    Jobs report their progress through the status API; while they summarize,
+    only their warnings and errors are printed.
+    """
+
+    def __init__(
+        self,
+        config_path: Optional[str] = None,
+        target_dir: Optional[str] = None,
+        max_parallel_scans: int = DEFAULT_MAX_PARALLEL_SCANS,
+        llm_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+        request_timeout: float = DEFAULT_TIMEOUT,
+        use_cache: bool = True,
+        cache_path: Optional[str] = None,
+        first_token_timeout: Optional[float] = None,
+        hedge_percentile: Optional[float] = None
+    ) -> None:
+        """Configure the daemon; call start() to load the configuration and start the workers.
+
+        Args:
+            config_path: Path to config.json. Defaults to config.json in the project root.
+            target_dir: Directory where repositories are cloned.
+            max_parallel_scans: Maximum number of scans running at once.
+            llm_concurrency: Maximum number of LLM requests in flight across all scans.
+            request_timeout: Per-request LLM timeout in seconds.
+            use_cache: Whether scans use the global summary cache.
+            cache_path: Path to the global summary cache. Defaults to the user cache directory.
+            first_token_timeout: Stream responses and retry an attempt that has
+                produced no text after this many seconds, or None to not stream.
+            hedge_percentile: Latency percentile after which a request is sent
+                a second time, or None to never hedge.
+
+        Raises:
+            ValueError: If max_parallel_scans or llm_concurrency is less than 1,
+                first_token_timeout is not positive or hedge_percentile is not
+                between 0 and 100.
+        """
+        if max_parallel_scans < 1:
+            raise ValueError("max_parallel_scans must be at least 1")
+        if llm_concurrency < 1:
+            raise ValueError("llm_concurrency must be at least 1")
+        if first_token_timeout is not None and first_token_timeout <= 0:
+            raise ValueError("first_token_timeout must be positive")
+        if hedge_percentile is not None and not 0 < hedge_percentile < 100:
+            raise ValueError("hedge_percentile must be between 0 and 100")
+
+        self.config_path = config_path or os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.json")
+        self.target_dir = target_dir
+        self.max_parallel_scans = max_parallel_scans
+        self.llm_concurrency = llm_concurrency
+        self.request_timeout = request_timeout
+        self.first_token_timeout = first_token_timeout
+        self.hedge_percentile = hedge_percentile
+        self.use_cache = use_cache
+        self.cache_path = cache_path
+
+        self._condition = threading.Condition()
+        self._jobs: Dict[str, ScanJob] = {}
+        self._queues: "OrderedDict[str, Deque[ScanJob]]" = OrderedDict()
+        self._finished: Deque[str] = deque()
+        self._running_clones: Dict[str, str] = {}
+        self._stopping = False
+        self._workers: List[threading.Thread] = []
+        self._client: Optional[Union[LLMClient, LLMRouter]] = None
+        self._cache: Optional[SummaryCache] = None
+        self._limiter = FairShareLimiter(llm_concurrency)
+        self.started_at: Optional[float] = None
+
+    def start(self) -> bool:
+        """Open the shared LLM client and summary cache and start the scan workers.
+
+        Returns:
+            True if the daemon started, False if the configuration is missing.
+        """
+        endpoints = load_endpoints(self.config_path)
+        if endpoints:
+            self._client = LLMRouter(
+                endpoints, self.request_timeout,
+                first_token_timeout=self.first_token_timeout, hedge_percentile=self.hedge_percentile
+            )
+        else:
+            api_key = load_api_key(self.config_path)
+            if not api_key:
+                color_print.print_red("Cannot start without API key. Please configure config.json")
+                return False
+            self._client = LLMClient(
+                api_key, load_base_url(self.config_path), self.llm_concurrency, self.request_timeout,
+                first_token_timeout=self.first_token_timeout, hedge_percentile=self.hedge_percentile
+            )
+        self._cache = SummaryCache(self.cache_path) if self.use_cache else None
+        self.started_at = time.time()
+        for number in range(self.max_parallel_scans):
+            worker = threading.Thread(target=self._run_worker, name=f"scan-worker-{number}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        return True
+
+    def stop(self) -> None:
+        """Stop taking jobs, wait for the running scans and close the shared client and cache."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+        if self._client is not None:
+            self._client.close()
+        if self._cache is not None:
+            self._cache.close()
+
+    def submit(
+        self,
+        repo_url: str,
+        branch: Optional[str] = None,
+        pr_number: Optional[int] = None,
+        options: Optional[Dict[str, Any]] = None
+    ) -> ScanJob:
+        """Queue a scan of a repository branch or pull request.
+
+        Args:
+            repo_url: URL of the repository to scan.
+            branch: Branch to scan, or the base branch of the pull request.
+            pr_number: Pull request to scan, or None to scan the branch.
+            options: Extra keyword arguments for scan_repository (or
+                scan_pull_request), from REPOSITORY_SCAN_OPTIONS (or
+                PULL_REQUEST_SCAN_OPTIONS).
+
+        Returns:
+            The new job, or the identical job that was already queued.
+
+        Raises:
+            ValueError: If repo_url is empty or an option is not allowed.
+        """
+        if not repo_url:
+            raise ValueError("repo_url is required")
+        options = dict(options or {})
+        allowed_options = PULL_REQUEST_SCAN_OPTIONS if pr_number is not None else REPOSITORY_SCAN_OPTIONS
+        unknown_options = set(options) - allowed_options
+        if unknown_options:
+            raise ValueError(f"Unsupported scan options: {', '.join(sorted(unknown_options))}")
+
+        with self._condition:
+            if self._stopping:
+                raise ValueError("The daemon is shutting down")
+
+            queue = self._queues.setdefault(repo_url, deque())
+            for queued_job in queue:
+                if (queued_job.branch, queued_job.pr_number, queued_job.options) == (branch, pr_number, options):
+                    return queued_job
+
+            job = ScanJob(uuid.uuid4().hex[:12], repo_url, branch, pr_number, options)
+            self._jobs[job.job_id] = job
+            queue.append(job)
+            self._condition.notify_all()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job. Running scans cannot be cancelled.
+
+        Args:
+            job_id: Identifier of the job.
+
+        Returns:
+            True if the job was cancelled, False if it does not exist or is not queued.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != JOB_QUEUED:
+                return False
+            self._queues[job.repo_url].remove(job)
+            if not self._queues[job.repo_url]:
+                del self._queues[job.repo_url]
+            self._finish(job, JOB_CANCELLED)
+            return True
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Describe a job.
+
+        Args:
+            job_id: Identifier of the job.
+
+        Returns:
+            The job description, or None if the job is unknown.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Describe every known job, oldest first."""
+        with self._condition:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in jobs]
+
+    def status(self) -> Dict[str, Any]:
+        """Describe the daemon: job counts, LLM slot use, rate limit and circuit state, and summary cache statistics."""
+        with self._condition:
+            job_counts = {state: 0 for state in (JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)}
+            for job in self._jobs.values():
+                job_counts[job.status] += 1
+
+        return {
+            "started_at": self.started_at,
+            "max_parallel_scans": self.max_parallel_scans,
+            "jobs": job_counts,
+            "llm": {**self._limiter.stats(), **self._client.stats()},
+            "cache": self._cache.stats() if self._cache is not None else None,
+        }
+
+    def _run_worker(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._run_job(job)
+
+    def _next_job(self) -> Optional[ScanJob]:
+        """Wait for the next runnable job, round-robin across repositories."""
+        with self._condition:
+            while True:
+                if self._stopping:
+                    return None
+                picked = self._pick_job()
+                if picked is not None:
+                    repo_url, job, clone_paths = picked
+                    self._queues[repo_url].remove(job)
+                    if self._queues[repo_url]:
+                        self._queues.move_to_end(repo_url)
+                    else:
+                        del self._queues[repo_url]
+                    for clone_path in clone_paths:
+                        self._running_clones[clone_path] = job.job_id
+                    job.status = JOB_RUNNING
+                    job.started_at = time.time()
+                    job.metrics = ScanMetrics()
+                    return job
+                self._condition.wait()
+
+    def _pick_job(self) -> Optional[Tuple[str, ScanJob, List[str]]]:
+        for repo_url, queue in self._queues.items():
+            for job in queue:
+                clone_paths = self._clone_paths(job)
+                if not any(clone_path in self._running_clones for clone_path in clone_paths):
+                    return repo_url, job, clone_paths
+        return None
+
+    def _clone_paths(self, job: ScanJob) -> List[str]:
+        """Get the clones a job uses, which no other job may use while it runs.
+
+        A pull request scan also reads its base branch's clone, whose summaries
+        it copies, so it must not run while that branch is being scanned.
+        """
+        base_clone_path = get_clone_path(job.repo_url, self.target_dir, job.branch)
+        if job.pr_number is not None:
+            return [get_clone_path(job.repo_url, self.target_dir, pr_number=job.pr_number), base_clone_path]
+        return [base_clone_path]
+
+    def _run_job(self, job: ScanJob) -> None:
+        color_print.print_bright_cyan(f"Job {job.job_id}: scanning {job.repo_url}")
+        client = FairShareClient(self._client, self._limiter, job.repo_url)
+        options = dict(job.options)
+        use_cache = options.pop("use_cache", self.use_cache) and self._cache is not None
+        options.setdefault("max_concurrency", self.llm_concurrency)
+
+        succeeded, error = False, None
+        try:
+            with collect_metrics(job.metrics):
+                if job.pr_number is not None:
+                    succeeded = scan_pull_request(
+                        job.repo_url, job.pr_number, job.branch, self.target_dir, request_timeout=self.request_timeout,
+                        use_cache=use_cache, config_path=self.config_path, client=client, cache=self._cache,
+                        progress=PROGRESS_QUIET, **options
+                    )
+                else:
+                    succeeded = scan_repository(
+                        job.repo_url, self.target_dir, job.branch, request_timeout=self.request_timeout,
+                        use_cache=use_cache, config_path=self.config_path, client=client, cache=self._cache,
+                        progress=PROGRESS_QUIET, **options
+                    )
+        except Exception as error_raised:
+            error = f"{type(error_raised).__name__}: {error_raised}"
+            color_print.print_red(f"Job {job.job_id} failed: {error}")
+
+        with self._condition:
+            for clone_path in self._clone_paths(job):
+                del self._running_clones[clone_path]
+            if succeeded:
+                self._finish(job, JOB_SUCCEEDED)
+            else:
+                job.error = error or "Scan failed; see the daemon output"
+                self._finish(job, JOB_FAILED)
+            self._condition.notify_all()
+
+    def _finish(self, job: ScanJob, status: str) -> None:
+        """Record a job's final status and forget the oldest finished jobs. Needs the lock."""
+        job.status = status
+        job.finished_at = time.time()
+        self._finished.append(job.job_id)
+        while len(self._finished) > MAX_FINISHED_JOBS:
+            self._jobs.pop(self._finished.popleft(), None)
+
+
+def _make_handler(daemon: ScanDaemon):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+        def do_GET(self) -> None:
+            path = self.path.rstrip('/')
+            if path == "/status":
+                self._send_json(200, daemon.status())
+            elif path == "/jobs":
+                self._send_json(200, {"jobs": daemon.list_jobs()})
+            elif path.startswith("/jobs/"):
+                job = daemon.get_job(path[len("/jobs/"):])
+                if job:
+                    self._send_json(200, job)
+                else:
+                    self._send_error(404, "Unknown job")
+            else:
+                self._send_error(404, f"Unknown path {self.path}")
+
+        def do_POST(self) -> None:
+            if self.path.rstrip('/') != "/jobs":
+                self._send_error(404, f"Unknown path {self.path}")
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                pr_number = body.get("pr_number")
+                job = daemon.submit(
+                    body.get("repo_url"), body.get("branch"), int(pr_number) if pr_number is not None else None,
+                    body.get("options")
+                )
+            except (ValueError, TypeError, AttributeError) as error:
+                self._send_error(400, str(error))
+                return
+            self._send_json(202, daemon.get_job(job.job_id))
+
+        def do_DELETE(self) -> None:
+            path = self.path.rstrip('/')
+            if not path.startswith("/jobs/"):
+                self._send_error(404, f"Unknown path {self.path}")
+                return
+            job_id = path[len("/jobs/"):]
+            if daemon.cancel(job_id):
+                self._send_json(200, daemon.get_job(job_id))
+            elif daemon.get_job(job_id):
+                self._send_error(409, "Only queued jobs can be cancelled")
+            else:
+                self._send_error(404, "Unknown job")
+
+        def _send_error(self, status: int, message: str) -> None:
+            self._send_json(status, {"error": message})
+
+        def _send_json(self, status: int, payload: Dict) -> None:
+            data = json.dumps(payload, indent=2).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(daemon: ScanDaemon, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: Optional[str] = None):
+    """Create the HTTP server exposing a daemon's job API.
+
+    Endpoints: ``POST /jobs`` (JSON body with ``repo_url`` and optional
+    ``branch``, ``pr_number`` and ``options``), ``GET /jobs``,
+    ``GET /jobs/<id>``, ``DELETE /jobs/<id>`` and ``GET /status``.
+
+    Args:
+        daemon: Daemon whose jobs are served.
+        host: Interface to listen on.
+        port: TCP port to listen on, or 0 for any free port.
+        socket_path: Listen on this Unix socket instead of TCP.
+
+    Returns:
+        The server; call serve_forever() on it.
+    """
+    handler = _make_handler(daemon)
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return _ThreadingUnixHTTPServer(socket_path, handler)
+
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main(argv: Optional[List[str]] = None, prog: Optional[str] = None) -> int:
+    """Run the daemon from the command line until interrupted.
+
+    Args:
+        argv: Command-line arguments, without the program name. Defaults to sys.argv.
+        prog: Program name shown in usage messages. Defaults to the script name.
+
+    Returns:
+        Process exit code.
+    """
+    parser = argparse.ArgumentParser(prog=prog, description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST, help="interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on")
+    parser.add_argument("--socket", help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--config", help="path to config.json (default: project root)")
+    parser.add_argument("--target-dir", help="directory repositories are cloned into (default: clone_dir)")
+    parser.add_argument("--max-scans", type=int, default=DEFAULT_MAX_PARALLEL_SCANS, help="scans running at once")
+    parser.add_argument("--llm-concurrency", type=int, default=DEFAULT_LLM_CONCURRENCY, help="LLM requests in flight across all scans")
+    parser.add_argument("--request-timeout", type=float, default=DEFAULT_TIMEOUT, help="per-request LLM timeout in seconds")
+    parser.add_argument("--cache-path", help="path to the global summary cache")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the global summary cache")
+    parser.add_argument("--first-token-timeout", type=float, help="stream responses and retry requests without text after this many seconds")
+    parser.add_argument("--hedge-percentile", type=float, help="resend requests slower than this latency percentile, e.g. 95")
+    args = parser.parse_args(argv)
+
+    scan_daemon = ScanDaemon(
+        args.config, args.target_dir, args.max_scans, args.llm_concurrency,
+        args.request_timeout, not args.no_cache, args.cache_path,
+        args.first_token_timeout, args.hedge_percentile
+    )
+    if not scan_daemon.start():
+        return 1
+
+    http_server = create_server(scan_daemon, args.host, args.port, args.socket)
+    address = args.socket or f"http://{args.host}:{http_server.server_address[1]}"
+    color_print.print_bright_green(f"Scanner daemon listening on {address} (Ctrl+C to stop)")
+    try:
+        http_server.serve_forever()
+    except KeyboardInterrupt:
+        color_print.print_yellow("Stopping: waiting for running scans to finish...")
+    finally:
+        http_server.server_close()
+        scan_daemon.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,127 +1,357 @@
 """Full repository scanner with LLM-based summary generation."""
 
 import os
-import sys
-from typing import Dict, List
+from contextlib import nullcontext
+from typing import Optional, Set
 
-sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
+from .utils import color_print
+from .utils.clone_repo import clone_repository, get_clone_path
+from .utils.file_utils import IgnoreMatcher, build_ignore_matcher, load_ignore_patterns
+from .utils.git_index import load_git_index
+from .utils.incremental import (
+    get_changed_files,
+    get_head_commit,
+    invalidate_changed_summaries,
+    load_last_scanned_commit,
+    save_last_scanned_commit,
+)
+from .utils.llm_client import (
+    DEFAULT_TIMEOUT,
+    BudgetExceededError,
+    LLMClient,
+    load_api_key,
+    load_base_url,
+    load_model,
+    load_model_tiers,
+)
+from .utils.llm_router import LLMRouter, load_endpoints
+from .utils.rate_limiter import ProviderUnavailableError
+from .utils.scan_budget import BudgetedClient, ScanBudget, load_pricing
+from .utils.scan_journal import ScanJournal
+from .utils.scan_metrics import SCAN_REPORT_FILENAME, instrument_scan, timed, write_json_report
+from .utils.scan_planner import SCAN_ESTIMATE_FILENAME, estimate_scan, load_last_scan_rates, print_scan_estimate
+from .utils.scan_progress import DEFAULT_PROGRESS_MODE, PROGRESS_MODES, ProgressReporter
+from .utils.summary_cache import SummaryCache
+from .utils.summary_index import IndexedSummaryStore, open_summary_index, remove_summary_index
+from .utils.summary_store import DEFAULT_STORE_BACKEND, open_summary_store
+from .utils.tree_summarizer import plan_repository_tree, summarize_repository_tree
 
-from utils.clone_repo import clone_repository
-from utils import color_print
-from utils.file_utils import load_ignore_patterns, should_ignore_file, is_binary_file
-from utils.llm_client import load_api_key, load_model
-from utils.summary_generator import generate_file_summary, generate_directory_summary
 
+DEFAULT_MAX_CONCURRENCY = 8
 
-def scan_repository(repo_url: str, target_dir: str = None, branch: str = None) -> bool:
+
+def scan_repository(
+    repo_url: str,
+    target_dir: str = None,
+    branch: str = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    request_timeout: float = DEFAULT_TIMEOUT,
+    use_cache: bool = True,
+    cache_path: Optional[str] = None,
+    incremental: bool = True,
+    depth: Optional[int] = None,
+    blobless: bool = False,
+    use_mirror: bool = False,
+    batch_small_files: bool = True,
+    store_backend: str = DEFAULT_STORE_BACKEND,
+    config_path: Optional[str] = None,
+    prometheus_path: Optional[str] = None,
+    profile: bool = False,
+    client: Optional[LLMClient] = None,
+    cache: Optional[SummaryCache] = None,
+    resume: bool = False,
+    dry_run: bool = False,
+    token_budget: Optional[int] = None,
+    cost_budget: Optional[float] = None,
+    first_token_timeout: Optional[float] = None,
+    hedge_percentile: Optional[float] = None,
+    progress: str = DEFAULT_PROGRESS_MODE,
+    verbose: bool = False,
+    build_index: bool = True
+) -> bool:
     """Scan a repository and generate summaries for all files and directories.
     
+    File summaries are generated concurrently, with at most ``max_concurrency``
+    LLM requests in flight. Results are collected in walk order, so directory
+    rollups and the output under ``scanner_metadata/`` match a sequential run.
+    A single pooled LLM client is shared by every request in the scan, and file
+    summaries are looked up in the global content-addressed cache first.
+    
+    Each completed scan records the commit it covered. When ``incremental`` is
+    set and a previous scan is recorded, only files changed since that commit
+    (per ``git diff --name-status``) are re-summarized, summaries of removed or
+    renamed files are deleted, and only the affected directories are rolled up.
+    
+    Each scan keeps a journal of its work plan and completed summaries in
+    ``scanner_metadata/_scan_journal.jsonl`` until it completes. With ``resume``,
+    an interrupted scan of the same commit continues from its journal without
+    walking the tree again.
+    
+    With ``dry_run``, the repository is cloned, walked and filtered as for a
+    real scan, but no summary is requested or written. Instead the scan prints,
+    and saves to ``scanner_metadata/_scan_estimate.json``, an estimate of the LLM
+    requests, tokens, cost per priced model and duration the real scan would
+    take. ``token_budget`` and ``cost_budget`` cap a real scan: a request that
+    could take it over either budget is not sent and the scan stops, keeping its
+    journal so it can be resumed with a larger budget.
+    
+    With ``build_index``, every summary written or deleted is also updated in
+    the search index ``scanner_metadata/summary_index.sqlite3`` (see
+    SummaryIndex), which is built from the stored summaries the first time.
+    
     Args:
         repo_url: URL of the repository to scan.
         target_dir: Directory where repository will be cloned.
         branch: Specific branch to clone.
+        max_concurrency: Maximum number of file summaries generated in parallel.
+            Use 1 for a fully sequential scan. Also sets the connection pool size.
+        request_timeout: Per-request LLM timeout in seconds.
+        use_cache: Whether to use the global summary cache.
+        cache_path: Path to the global summary cache. Defaults to the user cache directory.
+        incremental: Whether to rescan only the files changed since the last scan.
+        depth: Number of commits of history to clone (e.g. 1), or None for full history.
+        blobless: Whether to clone with --filter=blob:none.
+        use_mirror: Whether to clone through the persistent local mirror cache, so
+            rescans only fetch new objects instead of downloading the repository again.
+        batch_small_files: Whether to pack small files into shared summary requests.
+        store_backend: Summary storage backend, "sqlite" (one indexed file,
+            ``scanner_metadata/summaries.sqlite3``) or "markdown" (one file per summary).
+        config_path: Path to config.json with the API key, model and optional
+            ``base_url``, ``endpoints`` and ``model_tiers``. Defaults to config.json
+            in the project root.
+        prometheus_path: Also write the scan metrics to this file in Prometheus
+            text format.
+        profile: Whether to profile the scan with cProfile and tracemalloc.
+        client: Long-lived LLM client to send requests with, for example one
+            shared by many scans. It is not closed. If None, a client is created
+            for the scan, sized by max_concurrency and configured with
+            request_timeout, first_token_timeout and hedge_percentile.
+        cache: Open summary cache to use instead of opening cache_path. It is not
+            closed, and the cache statistics reported cover its whole lifetime.
+        resume: Whether to continue an interrupted scan of the same commit from
+            its journal. Without a usable journal the scan starts over.
+        dry_run: Whether to only estimate the scan instead of running it. No
+            API key is needed.
+        token_budget: Maximum prompt plus completion tokens the scan may use.
+        cost_budget: Maximum cost of the scan in US dollars, priced with the
+            model's entry in the ``pricing`` section of config.json.
+        first_token_timeout: Stream responses and retry an attempt that has
+            produced no text after this many seconds, instead of waiting for
+            request_timeout. None waits for whole responses.
+        hedge_percentile: Send a request a second time once it has taken longer
+            than this percentile of recent request latencies, e.g. 95, and use
+            whichever answer comes first. None never hedges.
+        progress: How to report progress while summarizing: "live" (a status
+            line redrawn in place), "plain" (a status line every few seconds),
+            "json" (JSON lines), "quiet" (only warnings and errors) or "auto"
+            ("live" on a terminal, "plain" otherwise).
+        verbose: Whether to also print a line for every file and directory.
+        build_index: Whether to keep the summary search index up to date.
         
     Returns:
-        True if scanning completed successfully, False otherwise.
+        True if scanning (or estimating) completed successfully, False otherwise.
+        
+    Raises:
+        ValueError: If max_concurrency is less than 1, store_backend or progress
+            is unknown, a budget or first_token_timeout is not positive or
+            hedge_percentile is not between 0 and 100.
     """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    if token_budget is not None and token_budget <= 0:
+        raise ValueError("token_budget must be positive")
+    if cost_budget is not None and cost_budget <= 0:
+        raise ValueError("cost_budget must be positive")
+    if first_token_timeout is not None and first_token_timeout <= 0:
+        raise ValueError("first_token_timeout must be positive")
+    if hedge_percentile is not None and not 0 < hedge_percentile < 100:
+        raise ValueError("hedge_percentile must be between 0 and 100")
+    if progress not in PROGRESS_MODES:
+        raise ValueError(f"progress must be one of {', '.join(PROGRESS_MODES)}")
+    
     color_print.print_bright_cyan("=" * 60)
     color_print.print_bright_cyan("Starting Full Repository Scan")
     color_print.print_bright_cyan("=" * 60)
     
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.json")
-    api_key = load_api_key(config_path)
-    if not api_key:
+    config_path = config_path or os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.json")
+    # Endpoints may each have their own key instead of the top-level one
+    endpoints = [] if dry_run else load_endpoints(config_path)
+    api_key = None if dry_run or endpoints else load_api_key(config_path)
+    if not api_key and not dry_run and not endpoints:
         color_print.print_red("Cannot proceed without API key. Please configure config.json")
         return False
 
     model = load_model(config_path)
-    if not model:
+    if not model and not dry_run:
         color_print.print_red("Cannot proceed without model configuration. Please configure config.json")
         return False
     
-    color_print.print_cyan("\nStep 1: Cloning repository...")
-    if not clone_repository(repo_url, target_dir, branch):
-        color_print.print_red("Failed to clone repository")
-        return False
-    
-    if target_dir is None:
-        target_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "clone_dir")
+    budget_price = None
+    if cost_budget is not None and not dry_run:
+        budget_price = load_pricing(config_path).get(model)
+        if budget_price is None:
+            color_print.print_red(f"Cannot enforce the cost budget without a price for {model}. Please add it to the pricing section of config.json")
+            return False
     
-    repo_name = repo_url.rstrip('/').split('/')[-1].replace('.git', '')
-    if branch:
-        repo_name = f"{repo_name}-{branch}"
-    
-    repo_path = os.path.join(target_dir, repo_name)
+    repo_path = get_clone_path(repo_url, target_dir, branch)
     metadata_dir = os.path.join(repo_path, "scanner_metadata")
     
-    ignore_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "ignore.json")
-    exact_names, regex_patterns = load_ignore_patterns(ignore_file_path)
-    
-    color_print.print_cyan(f"\nStep 2: Loading ignore patterns from {ignore_file_path}")
-    color_print.print_green(f"Loaded {len(exact_names)} exact names and {len(regex_patterns)} regex patterns")
-    
-    color_print.print_cyan("\nStep 3: Scanning repository files...")
-    
-    directory_summaries: Dict[str, List[str]] = {}
-    
-    for root, dirs, files in os.walk(repo_path):
-        dirs_to_remove = []
-        for dir_name in dirs:
-            dir_path = os.path.join(root, dir_name)
-            if should_ignore_file(dir_path, repo_path, exact_names, regex_patterns):
-                dirs_to_remove.append(dir_name)
+    # A dry run leaves the last scan's report alone, so it reports nothing itself
+    scan_context = nullcontext() if dry_run else instrument_scan(metadata_dir, prometheus_path, profile)
+    with scan_context as metrics:
+        color_print.print_cyan("\nStep 1: Cloning repository...")
+        with timed("clone"):
+            cloned = clone_repository(repo_url, target_dir, branch, depth=depth, blobless=blobless, use_mirror=use_mirror)
+        if not cloned:
+            color_print.print_red("Failed to clone repository")
+            return False
+        
+        ignore_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "ignore.json")
+        exact_names, regex_patterns = load_ignore_patterns(ignore_file_path)
+        matcher = build_ignore_matcher(exact_names, regex_patterns, repo_path)
         
-        for dir_name in dirs_to_remove:
-            dirs.remove(dir_name)
+        color_print.print_cyan(f"\nStep 2: Loading ignore patterns from {ignore_file_path}")
+        color_print.print_green(
+            f"Loaded {len(exact_names)} exact names, {len(regex_patterns)} regex patterns "
+            f"and {matcher.gitignore_rule_count} .gitignore rules"
+        )
         
-        current_dir_summaries = []
+        head_commit = get_head_commit(repo_path)
+        if dry_run:
+            return _estimate_repository_scan(
+                repo_path, metadata_dir, matcher, head_commit, model, max_concurrency,
+                incremental, batch_small_files, store_backend, config_path
+            )
         
-        for file_name in files:
-            file_path = os.path.join(root, file_name)
+        journal = ScanJournal.resume(metadata_dir, head_commit) if resume and head_commit else None
+        
+        with open_summary_store(metadata_dir, store_backend) as store, \
+                open_summary_index(metadata_dir, store) if build_index else nullcontext() as index:
+            if index is not None:
+                store = IndexedSummaryStore(store, index)
+            else:
+                remove_summary_index(metadata_dir)
+            # None means a full scan; otherwise only these directories need new summaries
+            affected_dirs: Optional[Set[str]] = None
+            if journal is not None:
+                color_print.print_green(
+                    f"Resuming the interrupted scan of {head_commit[:12]}: {journal.done_count} summaries already done"
+                )
+            elif incremental and head_commit:
+                last_commit = load_last_scanned_commit(metadata_dir)
+                changes = get_changed_files(repo_path, last_commit, head_commit) if last_commit else None
+                if changes is not None:
+                    deleted_count = invalidate_changed_summaries(store, changes)
+                    affected_dirs = {os.path.normpath(os.path.join(repo_path, d)) for d in changes.affected_directories}
+                    color_print.print_green(
+                        f"Incremental rescan since {last_commit[:12]}: {len(changes.modified)} added or modified, "
+                        f"{len(changes.removed)} removed, {deleted_count} stale summaries deleted"
+                    )
             
-            if should_ignore_file(file_path, repo_path, exact_names, regex_patterns):
-                continue
+            if journal is None:
+                journal = ScanJournal.start(metadata_dir, head_commit)
             
-            if is_binary_file(file_path):
-                continue
+            color_print.print_cyan("\nStep 3: Summarizing files and directories...")
             
-            summary = generate_file_summary(file_path, metadata_dir, repo_path, api_key, model)
-            if summary:
-                current_dir_summaries.append(summary)
+            if client is not None:
+                client_context = nullcontext(client)
+            elif endpoints:
+                client_context = LLMRouter(endpoints, request_timeout, first_token_timeout=first_token_timeout, hedge_percentile=hedge_percentile)
+            else:
+                client_context = LLMClient(
+                    api_key, load_base_url(config_path), max_concurrency, request_timeout, first_token_timeout=first_token_timeout, hedge_percentile=hedge_percentile
+                )
+            if not use_cache:
+                cache_context = nullcontext()
+            elif cache is not None:
+                cache_context = nullcontext(cache)
+            else:
+                cache_context = SummaryCache(cache_path)
+
+            with client_context as client, cache_context as cache, journal or nullcontext():
+                if token_budget is not None or cost_budget is not None:
+                    client = BudgetedClient(client, ScanBudget(metrics, token_budget, cost_budget, budget_price))
+                try:
+                    with ProgressReporter(metrics, progress, verbose):
+                        summarize_repository_tree(
+                            repo_path, store, api_key, model, client, cache,
+                            matcher, max_concurrency, affected_dirs, batch_small_files, journal,
+                            load_model_tiers(config_path)
+                        )
+                except ProviderUnavailableError as error:
+                    color_print.print_red(f"Stopping the scan: {error}. Rerun it once the provider is back")
+                    return False
+                except BudgetExceededError as error:
+                    color_print.print_red(f"Stopping the scan: {error}. Rerun it with resume=True and a larger budget to finish it")
+                    return False
+                
+                if cache is not None:
+                    cache_stats = cache.stats()
+                    metrics.set_section("cache", cache_stats)
+                    color_print.print_green(
+                        f"\nSummary cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                        f"({cache_stats['hit_rate']:.0%} hit rate)"
+                    )
         
-        if current_dir_summaries:
-            directory_summaries[root] = current_dir_summaries
-    
-    color_print.print_cyan("\nStep 4: Generating directory summaries...")
-    
-    sorted_dirs = sorted(directory_summaries.keys(), key=lambda x: x.count(os.sep), reverse=True)
-    
-    for dir_path in sorted_dirs:
-        file_summaries = directory_summaries[dir_path]
+        if head_commit:
+            save_last_scanned_commit(metadata_dir, head_commit)
+        if journal is not None:
+            journal.finish()
         
-        subdirs = [d for d in sorted_dirs if d != dir_path and d.startswith(dir_path + os.sep)]
-        for subdir in subdirs:
-            subdir_summary_path = os.path.join(metadata_dir, os.path.relpath(subdir, repo_path), "_directory_summary.md")
-            if os.path.exists(subdir_summary_path):
-                try:
-                    with open(subdir_summary_path, 'r') as f:
-                        lines = f.readlines()
-                        if len(lines) > 2:
-                            file_summaries.append(''.join(lines[2:]).strip())
-                except (IOError, OSError):
-                    pass
+        color_print.print_bright_green("\n" + "=" * 60)
+        color_print.print_bright_green("Repository scan completed successfully!")
+        color_print.print_bright_green("=" * 60)
+        color_print.print_green(f"\nSummaries saved to: {metadata_dir}")
+        color_print.print_green(f"Scan report saved to: {os.path.join(metadata_dir, SCAN_REPORT_FILENAME)}")
+        
+        return True
+
+
+def _estimate_repository_scan(
+    repo_path: str,
+    metadata_dir: str,
+    matcher: IgnoreMatcher,
+    head_commit: Optional[str],
+    model: Optional[str],
+    max_concurrency: int,
+    incremental: bool,
+    batch_small_files: bool,
+    store_backend: str,
+    config_path: str
+) -> bool:
+    """Estimate a scan of a cloned repository, print it and save it next to the summaries.
+
+    Returns:
+        True if the estimate was made, False otherwise.
+    """
+    color_print.print_cyan("\nStep 3: Estimating the scan...")
+    with open_summary_store(metadata_dir, store_backend) as store:
+        changes = None
+        affected_dirs: Optional[Set[str]] = None
+        if incremental and head_commit:
+            last_commit = load_last_scanned_commit(metadata_dir)
+            changes = get_changed_files(repo_path, last_commit, head_commit) if last_commit else None
+            if changes is not None:
+                affected_dirs = {os.path.normpath(os.path.join(repo_path, d)) for d in changes.affected_directories}
+                color_print.print_green(
+                    f"Incremental rescan since {last_commit[:12]}: {len(changes.modified)} added or modified, "
+                    f"{len(changes.removed)} removed"
+                )
         
-        generate_directory_summary(dir_path, metadata_dir, repo_path, api_key, model, file_summaries)
+        git_index = load_git_index(repo_path)
+        plans = plan_repository_tree(os.path.normpath(repo_path), store, matcher, affected_dirs, git_index=git_index)
+        latency_seconds, summary_tokens = load_last_scan_rates(metadata_dir)
+        estimate = estimate_scan(
+            plans, store, changes, batch_small_files, max_concurrency, load_pricing(config_path),
+            latency_seconds, summary_tokens, git_index=git_index
+        )
     
     color_print.print_bright_green("\n" + "=" * 60)
-    color_print.print_bright_green("Repository scan completed successfully!")
+    color_print.print_bright_green("Scan estimate (dry run, nothing was summarized)")
     color_print.print_bright_green("=" * 60)
-    color_print.print_green(f"\nSummaries saved to: {metadata_dir}")
+    print_scan_estimate(estimate, model)
     
+    estimate_path = os.path.join(metadata_dir, SCAN_ESTIMATE_FILENAME)
+    if write_json_report({"commit": head_commit, "model": model, **estimate.to_dict()}, estimate_path):
+        color_print.print_green(f"\nEstimate saved to: {estimate_path}")
     return True
-
-
-if __name__ == "__main__":
-    repository_url = "https://github.com/example/repo.git"
-    
-    scan_repository(repository_url)
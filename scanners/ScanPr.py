@@ -0,0 +1,338 @@
+"""Pull request scanner that only re-summarizes what the PR changed."""
+
+import os
+import shutil
+from contextlib import nullcontext
+from typing import Optional
+
+from .utils import color_print
+from .utils.clone_repo import clone_repository, get_clone_path
+from .utils.file_utils import build_ignore_matcher, load_ignore_patterns, write_file_atomic
+from .utils.incremental import (
+    ChangeSet,
+    find_merge_base,
+    get_changed_files,
+    get_head_commit,
+    invalidate_changed_summaries,
+    load_last_scanned_commit,
+    save_last_scanned_commit,
+)
+from .utils.llm_client import DEFAULT_TIMEOUT, LLMClient, load_api_key, load_base_url, load_model, load_model_tiers
+from .utils.llm_router import LLMRouter, load_endpoints
+from .utils.rate_limiter import ProviderUnavailableError
+from .utils.scan_journal import ScanJournal
+from .utils.scan_metrics import SCAN_REPORT_FILENAME, instrument_scan, timed
+from .utils.scan_progress import DEFAULT_PROGRESS_MODE, PROGRESS_MODES, ProgressReporter
+from .utils.summary_cache import SummaryCache
+from .utils.summary_index import IndexedSummaryStore, open_summary_index, remove_summary_index
+from .utils.summary_store import (
+    DEFAULT_STORE_BACKEND,
+    DIRECTORY_SUMMARY,
+    FILE_SUMMARY,
+    SummaryStore,
+    open_summary_store,
+)
+from .utils.tree_summarizer import summarize_repository_tree
+
+
+DEFAULT_MAX_CONCURRENCY = 8
+DELTA_REPORT_FILENAME = "_pr_delta.md"
+
+
+def scan_pull_request(
+    repo_url: str,
+    pr_number: int,
+    base_branch: Optional[str] = None,
+    target_dir: str = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    request_timeout: float = DEFAULT_TIMEOUT,
+    use_cache: bool = True,
+    cache_path: Optional[str] = None,
+    blobless: bool = False,
+    use_mirror: bool = False,
+    batch_small_files: bool = True,
+    store_backend: str = DEFAULT_STORE_BACKEND,
+    config_path: Optional[str] = None,
+    prometheus_path: Optional[str] = None,
+    profile: bool = False,
+    client: Optional[LLMClient] = None,
+    cache: Optional[SummaryCache] = None,
+    resume: bool = False,
+    first_token_timeout: Optional[float] = None,
+    hedge_percentile: Optional[float] = None,
+    progress: str = DEFAULT_PROGRESS_MODE,
+    verbose: bool = False,
+    build_index: bool = True
+) -> bool:
+    """Scan a pull request by reusing the base branch's summaries.
+
+    The base branch must have been scanned with scan_repository into the same
+    ``target_dir``. Its ``scanner_metadata`` is copied into the PR clone, only the
+    files the PR changed are summarized, only the directory summaries on the paths
+    to those files are regenerated, and a delta report is written to
+    ``scanner_metadata/_pr_delta.md``. Without a base scan, the whole PR is scanned,
+    or, if the PR clone holds an earlier scan of the PR, only what the PR's new
+    commits changed since then.
+
+    Like scan_repository, the scan keeps a journal until it completes, and
+    ``resume`` continues an interrupted scan of the same PR head from it, keeping
+    the base summaries copied by that scan.
+
+    The base branch's search index is copied along with its summaries and, with
+    ``build_index``, updated as the PR's summaries are written.
+
+    Args:
+        repo_url: URL of the repository to scan.
+        pr_number: Number of the pull request to scan.
+        base_branch: Branch the PR targets. If None, the repository's default
+            branch is used, whose scan lives in the un-suffixed clone folder.
+        target_dir: Directory where repositories are cloned.
+        max_concurrency: Maximum number of file summaries generated in parallel.
+        request_timeout: Per-request LLM timeout in seconds.
+        use_cache: Whether to use the global summary cache.
+        cache_path: Path to the global summary cache. Defaults to the user cache directory.
+        blobless: Whether to clone with --filter=blob:none.
+        use_mirror: Whether to clone through the persistent local mirror cache.
+        batch_small_files: Whether to pack small files into shared summary requests.
+        store_backend: Summary storage backend, "sqlite" or "markdown". Must match
+            the backend the base branch was scanned with for its summaries to be reused.
+        config_path: Path to config.json with the API key, model and optional
+            ``base_url``, ``endpoints`` and ``model_tiers``. Defaults to config.json in the project root.
+        prometheus_path: Also write the scan metrics to this file in Prometheus
+            text format.
+        profile: Whether to profile the scan with cProfile and tracemalloc.
+        client: Long-lived LLM client to send requests with, for example one
+            shared by many scans. It is not closed. If None, a client is created
+            for the scan, sized by max_concurrency and configured with
+            request_timeout, first_token_timeout and hedge_percentile.
+        cache: Open summary cache to use instead of opening cache_path. It is not
+            closed, and the cache statistics reported cover its whole lifetime.
+        resume: Whether to continue an interrupted scan of the same PR head from
+            its journal. Without a usable journal the scan starts over.
+        first_token_timeout: Stream responses and retry an attempt that has
+            produced no text after this many seconds, instead of waiting for
+            request_timeout. None waits for whole responses.
+        hedge_percentile: Send a request a second time once it has taken longer
+            than this percentile of recent request latencies, e.g. 95, and use
+            whichever answer comes first. None never hedges.
+        progress: How to report progress while summarizing: "live" (a status
+            line redrawn in place), "plain" (a status line every few seconds),
+            "json" (JSON lines), "quiet" (only warnings and errors) or "auto"
+            ("live" on a terminal, "plain" otherwise).
+        verbose: Whether to also print a line for every file and directory.
+        build_index: Whether to keep the summary search index up to date.
+
+    Returns:
+        True if scanning completed successfully, False otherwise.
+
+    Raises:
+        ValueError: If max_concurrency is less than 1, store_backend or progress
+            is unknown, first_token_timeout is not positive or hedge_percentile
+            is not between 0 and 100.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+    if first_token_timeout is not None and first_token_timeout <= 0:
+        raise ValueError("first_token_timeout must be positive")
+    if hedge_percentile is not None and not 0 < hedge_percentile < 100:
+        raise ValueError("hedge_percentile must be between 0 and 100")
+    if progress not in PROGRESS_MODES:
+        raise ValueError(f"progress must be one of {', '.join(PROGRESS_MODES)}")
+
+    color_print.print_bright_cyan("=" * 60)
+    color_print.print_bright_cyan(f"Starting Pull Request Scan (#{pr_number})")
+    color_print.print_bright_cyan("=" * 60)
+
+    config_path = config_path or os.path.join(os.path.dirname(os.path.dirname(__file__)), "config.json")
+    # Endpoints may each have their own key instead of the top-level one
+    endpoints = load_endpoints(config_path)
+    api_key = None if endpoints else load_api_key(config_path)
+    if not api_key and not endpoints:
+        color_print.print_red("Cannot proceed without API key. Please configure config.json")
+        return False
+
+    model = load_model(config_path)
+    if not model:
+        color_print.print_red("Cannot proceed without model configuration. Please configure config.json")
+        return False
+
+    repo_path = get_clone_path(repo_url, target_dir, pr_number=pr_number)
+    metadata_dir = os.path.join(repo_path, "scanner_metadata")
+
+    with instrument_scan(metadata_dir, prometheus_path, profile) as metrics:
+        color_print.print_cyan("\nStep 1: Cloning pull request...")
+        with timed("clone"):
+            cloned = clone_repository(repo_url, target_dir, pr_number=pr_number, blobless=blobless, use_mirror=use_mirror)
+        if not cloned:
+            color_print.print_red("Failed to clone pull request")
+            return False
+
+        color_print.print_cyan("\nStep 2: Finding files changed by the pull request...")
+        head_commit = get_head_commit(repo_path)
+        merge_base = find_merge_base(repo_path, base_branch)
+        pr_changes = get_changed_files(repo_path, merge_base, head_commit) if merge_base and head_commit else None
+        if pr_changes is None:
+            color_print.print_red("Failed to determine the files changed by the pull request")
+            return False
+
+        color_print.print_green(
+            f"Pull request changes {len(pr_changes.modified)} files and removes {len(pr_changes.removed)} "
+            f"since {merge_base[:12]}"
+        )
+
+        color_print.print_cyan("\nStep 3: Reusing base branch summaries...")
+        journal = ScanJournal.resume(metadata_dir, head_commit) if resume else None
+        base_metadata_dir = os.path.join(get_clone_path(repo_url, target_dir, base_branch), "scanner_metadata")
+        base_commit = load_last_scanned_commit(base_metadata_dir) if journal is None else None
+        # Without a base scan, an earlier scan of this PR is reused for the files its new commits left alone
+        last_commit = load_last_scanned_commit(metadata_dir) if journal is None and not base_commit else None
+        own_changes = get_changed_files(repo_path, last_commit, head_commit) if last_commit else None
+        if journal is not None:
+            color_print.print_green(
+                f"Resuming the interrupted scan of {head_commit[:12]}: {journal.done_count} summaries already done"
+            )
+        elif base_commit:
+            shutil.rmtree(metadata_dir, ignore_errors=True)
+            shutil.copytree(base_metadata_dir, metadata_dir)
+        elif own_changes is not None:
+            color_print.print_yellow(f"No base branch scan found in {base_metadata_dir}; updating the earlier scan of the pull request")
+        else:
+            # Summaries of an unknown or unreachable commit cannot be told apart from current ones
+            shutil.rmtree(metadata_dir, ignore_errors=True)
+            color_print.print_yellow(f"No base branch scan found in {base_metadata_dir}; scanning the whole pull request")
+
+        ignore_file_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "ignore.json")
+        exact_names, regex_patterns = load_ignore_patterns(ignore_file_path)
+        matcher = build_ignore_matcher(exact_names, regex_patterns, repo_path)
+
+        with open_summary_store(metadata_dir, store_backend) as store, \
+                open_summary_index(metadata_dir, store) if build_index else nullcontext() as index:
+            if index is not None:
+                store = IndexedSummaryStore(store, index)
+            else:
+                remove_summary_index(metadata_dir)
+            affected_dirs = None
+            if base_commit:
+                # The base scan may predate the merge base, so diff from the commit it actually covered
+                changes = get_changed_files(repo_path, base_commit, head_commit)
+                if changes is None:
+                    changes = pr_changes
+                deleted_count = invalidate_changed_summaries(store, changes)
+                affected_dirs = {os.path.normpath(os.path.join(repo_path, d)) for d in changes.affected_directories}
+                color_print.print_green(
+                    f"Copied base summaries from {base_commit[:12]}, {deleted_count} stale summaries deleted"
+                )
+            elif own_changes is not None:
+                deleted_count = invalidate_changed_summaries(store, own_changes)
+                affected_dirs = {os.path.normpath(os.path.join(repo_path, d)) for d in own_changes.affected_directories}
+                color_print.print_green(
+                    f"Incremental rescan since {last_commit[:12]}: {len(own_changes.modified)} added or modified, "
+                    f"{len(own_changes.removed)} removed, {deleted_count} stale summaries deleted"
+                )
+            if journal is None:
+                journal = ScanJournal.start(metadata_dir, head_commit)
+
+            color_print.print_cyan("\nStep 4: Summarizing changed files and directories...")
+
+            if client is not None:
+                client_context = nullcontext(client)
+            elif endpoints:
+                client_context = LLMRouter(endpoints, request_timeout, first_token_timeout=first_token_timeout, hedge_percentile=hedge_percentile)
+            else:
+                client_context = LLMClient(
+                    api_key, load_base_url(config_path), max_concurrency, request_timeout, first_token_timeout=first_token_timeout, hedge_percentile=hedge_percentile
+                )
+            if not use_cache:
+                cache_context = nullcontext()
+            elif cache is not None:
+                cache_context = nullcontext(cache)
+            else:
+                cache_context = SummaryCache(cache_path)
+
+            with client_context as client, cache_context as cache, journal or nullcontext():
+                try:
+                    with ProgressReporter(metrics, progress, verbose):
+                        summarize_repository_tree(
+                            repo_path, store, api_key, model, client, cache,
+                            matcher, max_concurrency, affected_dirs, batch_small_files, journal,
+                            load_model_tiers(config_path)
+                        )
+                except ProviderUnavailableError as error:
+                    color_print.print_red(f"Stopping the scan: {error}. Rerun it once the provider is back")
+                    return False
+
+                if cache is not None:
+                    metrics.set_section("cache", cache.stats())
+
+            save_last_scanned_commit(metadata_dir, head_commit)
+            if journal is not None:
+                journal.finish()
+
+            color_print.print_cyan("\nStep 5: Writing delta report...")
+            report_path = _write_delta_report(store, metadata_dir, pr_number, merge_base, head_commit, pr_changes)
+            if not report_path:
+                return False
+
+        color_print.print_bright_green("\n" + "=" * 60)
+        color_print.print_bright_green("Pull request scan completed successfully!")
+        color_print.print_bright_green("=" * 60)
+        color_print.print_green(f"\nDelta report saved to: {report_path}")
+        color_print.print_green(f"Scan report saved to: {os.path.join(metadata_dir, SCAN_REPORT_FILENAME)}")
+
+        return True
+
+
+def _write_delta_report(
+    store: SummaryStore,
+    metadata_dir: str,
+    pr_number: int,
+    merge_base: str,
+    head_commit: str,
+    changes: ChangeSet
+) -> Optional[str]:
+    """Write a markdown report of the summaries a pull request changed.
+
+    Args:
+        store: Store holding the PR clone's summaries.
+        metadata_dir: Base directory for scanner_metadata of the PR clone.
+        pr_number: Number of the pull request.
+        merge_base: Commit the PR diverged from its base branch.
+        head_commit: Commit at the head of the PR.
+        changes: Files the PR changed relative to merge_base.
+
+    Returns:
+        Path of the written report, or None if it could not be written.
+    """
+    lines = [
+        f"# Pull Request #{pr_number} Delta Report",
+        "",
+        f"Base: `{merge_base}`",
+        f"Head: `{head_commit}`",
+        "",
+        "## Changed Files",
+        "",
+    ]
+
+    for path in sorted(changes.modified):
+        summary = store.get(FILE_SUMMARY, path)
+        lines += [f"### {path}", "", summary or "_No summary (ignored, binary or empty file)._", ""]
+
+    if changes.removed:
+        lines += ["## Removed Files", ""]
+        lines += [f"- {path}" for path in sorted(changes.removed)]
+        lines.append("")
+
+    lines += ["## Updated Directory Summaries", ""]
+    for directory in sorted(changes.affected_directories):
+        summary = store.get(DIRECTORY_SUMMARY, directory)
+        if summary:
+            title = "repository root" if directory == '.' else directory
+            lines += [f"### {title}", "", summary, ""]
+
+    report_path = os.path.join(metadata_dir, DELTA_REPORT_FILENAME)
+    try:
+        write_file_atomic(report_path, "\n".join(lines))
+        return report_path
+    except (IOError, OSError) as error:
+        color_print.print_red(f"Failed to write delta report to {report_path}: {error}")
+        return None
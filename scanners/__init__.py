@@ -0,0 +1 @@
+"""Scythe repository scanner: LLM summaries of every file and directory of a repository."""
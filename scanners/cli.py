@@ -0,0 +1,344 @@
+"""The ``scythe-scan`` command line: scan, plan, status, search, subtree, export and daemon.
+
+Each subcommand imports what it needs only when it runs, so that status checks
+start without loading GitPython, the OpenAI SDK or the scan pipeline.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Any, Callable, Dict, List, Optional
+
+from .utils import color_print
+
+
+# Exit code of status when a scan is running or was interrupted
+EXIT_UNFINISHED = 3
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run a ``scythe-scan`` subcommand.
+
+    Args:
+        argv: Command-line arguments, without the program name. Defaults to sys.argv.
+
+    Returns:
+        Process exit code: 0 on success, 1 on failure, 2 on invalid arguments
+        and, for status, 1 if the repository was never scanned and
+        EXIT_UNFINISHED if its last scan did not complete.
+    """
+    parser = _build_parser()
+    args, extra_args = parser.parse_known_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    if extra_args and args.command != "daemon":
+        parser.error(f"unrecognized arguments: {' '.join(extra_args)}")
+    return args.handler(args, extra_args)
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="scythe-scan", description="Summarize repositories with an LLM.")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    scan_parser = subparsers.add_parser("scan", help="scan a repository or pull request")
+    _add_target_arguments(scan_parser)
+    _add_scan_arguments(scan_parser)
+    scan_parser.add_argument("--request-timeout", type=float, help="per-request LLM timeout in seconds")
+    scan_parser.add_argument("--no-cache", action="store_true", help="do not use the global summary cache")
+    scan_parser.add_argument("--cache-path", help="path to the global summary cache")
+    scan_parser.add_argument("--blobless", action="store_true", help="clone with --filter=blob:none")
+    scan_parser.add_argument("--resume", action="store_true", help="continue an interrupted scan of the same commit")
+    scan_parser.add_argument("--token-budget", type=int, help="stop before the scan uses more tokens than this")
+    scan_parser.add_argument("--cost-budget", type=float, help="stop before the scan costs more US dollars than this")
+    scan_parser.add_argument("--first-token-timeout", type=float, help="stream responses and retry requests without text after this many seconds")
+    scan_parser.add_argument("--hedge-percentile", type=float, help="resend requests slower than this latency percentile, e.g. 95")
+    scan_parser.add_argument("--prometheus", help="also write the scan metrics to this file in Prometheus text format")
+    scan_parser.add_argument("--profile", action="store_true", help="profile the scan with cProfile and tracemalloc")
+    scan_parser.add_argument("--progress", help="progress output: auto (default), live, plain, json or quiet")
+    scan_parser.add_argument("--verbose", action="store_true", help="print a line for every file and directory")
+    scan_parser.add_argument("--no-index", action="store_true", help="do not update the summary search index")
+    scan_parser.set_defaults(handler=_scan)
+
+    plan_parser = subparsers.add_parser("plan", help="estimate a scan's requests, tokens, cost and duration")
+    _add_target_arguments(plan_parser, pull_requests=False)
+    _add_scan_arguments(plan_parser)
+    plan_parser.set_defaults(handler=_plan)
+
+    status_parser = subparsers.add_parser("status", help="show the state of a repository's last scan")
+    _add_target_arguments(status_parser)
+    status_parser.add_argument("--json", action="store_true", help="print the status as JSON")
+    status_parser.set_defaults(handler=_status)
+
+    search_parser = subparsers.add_parser("search", help="find the summaries most relevant to a query")
+    _add_target_arguments(search_parser)
+    search_parser.add_argument("query", help="words to search the summaries and paths for")
+    search_parser.add_argument("-k", "--top-k", type=int, default=10, help="number of results (default: 10)")
+    search_parser.add_argument("--kind", choices=("file", "directory"), help="only return file or directory summaries")
+    search_parser.add_argument("--under", help="only return summaries of this directory and below it")
+    search_parser.add_argument("--rebuild", action="store_true", help="rebuild the index from the stored summaries first")
+    _add_index_arguments(search_parser)
+    search_parser.set_defaults(handler=_search)
+
+    subtree_parser = subparsers.add_parser("subtree", help="list the summarized paths under a directory")
+    _add_target_arguments(subtree_parser)
+    subtree_parser.add_argument("path", nargs="?", default=".", help="directory relative to the repository root (default: the root)")
+    subtree_parser.add_argument("--depth", type=int, help="levels below the directory to list (default: all)")
+    subtree_parser.add_argument("--kind", choices=("file", "directory"), help="only list files or directories")
+    _add_index_arguments(subtree_parser)
+    subtree_parser.set_defaults(handler=_subtree)
+
+    export_parser = subparsers.add_parser("export", help="export stored summaries as markdown")
+    _add_target_arguments(export_parser)
+    export_parser.add_argument("--output", help="directory to write the markdown files to (default: the scanner_metadata directory)")
+    export_parser.add_argument("--store-backend", default="sqlite", help="summary storage backend: sqlite (default) or markdown")
+    export_parser.set_defaults(handler=_export)
+
+    daemon_parser = subparsers.add_parser("daemon", help="run the resident scanner daemon", add_help=False)
+    daemon_parser.set_defaults(handler=_daemon)
+    return parser
+
+
+def _add_target_arguments(parser: argparse.ArgumentParser, pull_requests: bool = True) -> None:
+    parser.add_argument("repo_url", help="URL of the repository")
+    parser.add_argument("--branch", help="branch to scan, or with --pr the branch the pull request targets")
+    if pull_requests:
+        parser.add_argument("--pr", type=int, help="number of a pull request to scan instead of a branch")
+    parser.add_argument("--target-dir", help="directory repositories are cloned into (default: clone_dir)")
+
+
+def _add_scan_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--config", help="path to config.json (default: project root)")
+    parser.add_argument("--max-concurrency", type=int, help="file summaries generated in parallel")
+    parser.add_argument("--full", action="store_true", help="rescan every file instead of only those changed since the last scan")
+    parser.add_argument("--depth", type=int, help="commits of history to clone")
+    parser.add_argument("--mirror", action="store_true", help="clone through the persistent local mirror cache")
+    parser.add_argument("--no-batch", action="store_true", help="do not pack small files into shared requests")
+    parser.add_argument("--store-backend", help="summary storage backend: sqlite (default) or markdown")
+
+
+def _add_index_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--summaries", action="store_true", help="print each summary in full instead of its first line")
+    parser.add_argument("--store-backend", default="sqlite", help="summary storage backend: sqlite (default) or markdown")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+
+
+def _scan_options(args: argparse.Namespace) -> Dict[str, Any]:
+    """Keyword arguments of scan_repository set on the command line; the others keep their defaults."""
+    options = {
+        "max_concurrency": args.max_concurrency,
+        "depth": args.depth,
+        "store_backend": args.store_backend,
+        "config_path": args.config,
+    }
+    options = {name: value for name, value in options.items() if value is not None}
+    if args.full:
+        options["incremental"] = False
+    if args.mirror:
+        options["use_mirror"] = True
+    if args.no_batch:
+        options["batch_small_files"] = False
+    return options
+
+
+def _scan(args: argparse.Namespace, extra_args: List[str]) -> int:
+    options = _scan_options(args)
+    if args.request_timeout is not None:
+        options["request_timeout"] = args.request_timeout
+    if args.cache_path is not None:
+        options["cache_path"] = args.cache_path
+    options.update(
+        use_cache=not args.no_cache,
+        blobless=args.blobless,
+        prometheus_path=args.prometheus,
+        profile=args.profile,
+        resume=args.resume,
+        first_token_timeout=args.first_token_timeout,
+        hedge_percentile=args.hedge_percentile,
+        verbose=args.verbose,
+        build_index=not args.no_index,
+    )
+    if args.progress is not None:
+        options["progress"] = args.progress
+
+    if args.pr is not None:
+        unsupported = [flag for flag, value in (
+            ("--full", args.full), ("--depth", args.depth), ("--token-budget", args.token_budget),
+            ("--cost-budget", args.cost_budget),
+        ) if value]
+        if unsupported:
+            color_print.print_red(f"{', '.join(unsupported)} cannot be used with --pr")
+            return 2
+        from .ScanPr import scan_pull_request
+        return _run_scan(scan_pull_request, args.repo_url, args.pr, args.branch, args.target_dir, **options)
+
+    from .ScanFullRepo import scan_repository
+    return _run_scan(
+        scan_repository, args.repo_url, args.target_dir, args.branch,
+        token_budget=args.token_budget, cost_budget=args.cost_budget, **options
+    )
+
+
+def _plan(args: argparse.Namespace, extra_args: List[str]) -> int:
+    from .ScanFullRepo import scan_repository
+    return _run_scan(scan_repository, args.repo_url, args.target_dir, args.branch, dry_run=True, **_scan_options(args))
+
+
+def _run_scan(scan_function, *args: Any, **kwargs: Any) -> int:
+    try:
+        return 0 if scan_function(*args, **kwargs) else 1
+    except ValueError as error:
+        color_print.print_red(str(error))
+        return 2
+
+
+def _status(args: argparse.Namespace, extra_args: List[str]) -> int:
+    from .utils.clone_repo import get_clone_path
+    from .utils.incremental import load_last_scanned_commit
+    from .utils.scan_journal import read_journal_progress
+    from .utils.scan_metrics import SCAN_REPORT_FILENAME
+
+    repo_path = get_clone_path(args.repo_url, args.target_dir, args.branch, args.pr)
+    metadata_dir = os.path.join(repo_path, "scanner_metadata")
+    status: Dict[str, Any] = {
+        "repo_path": repo_path,
+        "cloned": os.path.isdir(repo_path),
+        "last_scanned_commit": load_last_scanned_commit(metadata_dir),
+        "unfinished_scan": read_journal_progress(metadata_dir),
+        "last_report": None,
+    }
+    try:
+        with open(os.path.join(metadata_dir, SCAN_REPORT_FILENAME), 'r') as file:
+            report = json.load(file)
+        status["last_report"] = {
+            "started_at": report["started_at"],
+            "duration_seconds": report["duration_seconds"],
+            "llm_requests": report["llm"]["requests"],
+            "total_tokens": report["llm"]["total_tokens"],
+            "counters": report["counters"],
+        }
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        pass
+
+    if args.json:
+        print(json.dumps(status, indent=2))
+    else:
+        _print_status(status)
+
+    if status["unfinished_scan"] is not None:
+        return EXIT_UNFINISHED
+    return 0 if status["last_scanned_commit"] else 1
+
+
+def _print_status(status: Dict[str, Any]) -> None:
+    if not status["cloned"]:
+        color_print.print_yellow(f"Not cloned yet: {status['repo_path']}")
+        return
+    color_print.print_cyan(f"Clone: {status['repo_path']}")
+    if status["last_scanned_commit"]:
+        color_print.print_green(f"Last completed scan: {status['last_scanned_commit'][:12]}")
+    else:
+        color_print.print_yellow("No completed scan")
+
+    unfinished = status["unfinished_scan"]
+    if unfinished is not None:
+        commit = (unfinished["commit"] or "unknown commit")[:12]
+        files = f"{unfinished['files_done']}"
+        if unfinished["files_planned"] is not None:
+            files += f"/{unfinished['files_planned']}"
+        color_print.print_yellow(
+            f"Unfinished scan of {commit}: {files} files and {unfinished['directories_done']} directories done"
+            f"{'' if unfinished['planned'] else ', still planning'} (running, or resume it with --resume)"
+        )
+
+    report = status["last_report"]
+    if report is not None:
+        color_print.print_cyan(
+            f"Last scan report: {report['duration_seconds']:.1f}s, {report['llm_requests']} LLM requests, "
+            f"{report['total_tokens']} tokens"
+        )
+
+
+def _search(args: argparse.Namespace, extra_args: List[str]) -> int:
+    if args.top_k < 1:
+        color_print.print_red("--top-k must be at least 1")
+        return 2
+    return _query_index(
+        args, lambda index: index.search(args.query, args.top_k, args.kind, args.under), rebuild=args.rebuild
+    )
+
+
+def _subtree(args: argparse.Namespace, extra_args: List[str]) -> int:
+    if args.depth is not None and args.depth < 0:
+        color_print.print_red("--depth must not be negative")
+        return 2
+    return _query_index(args, lambda index: index.subtree(args.path, args.depth, args.kind))
+
+
+def _query_index(args: argparse.Namespace, query: Callable[[Any], List[Any]], rebuild: bool = False) -> int:
+    """Run a query against a repository's summary index and print the hits with their summaries.
+
+    Returns:
+        0 if anything was found, 1 if nothing was or the repository was never scanned, 2 on invalid arguments.
+    """
+    from .utils.clone_repo import get_clone_path
+    from .utils.summary_index import open_summary_index
+    from .utils.summary_store import open_summary_store
+
+    metadata_dir = os.path.join(get_clone_path(args.repo_url, args.target_dir, args.branch, args.pr), "scanner_metadata")
+    if not os.path.isdir(metadata_dir):
+        color_print.print_yellow(f"No summaries yet: {metadata_dir}")
+        return 1
+
+    try:
+        with open_summary_store(metadata_dir, args.store_backend) as store, \
+                open_summary_index(metadata_dir, store, rebuild) as index:
+            hits = query(index)
+            summaries: Dict[str, Dict[str, str]] = {}
+            for kind in {hit.kind for hit in hits}:
+                summaries[kind] = store.get_many(kind, [hit.path for hit in hits if hit.kind == kind])
+    except ValueError as error:
+        color_print.print_red(str(error))
+        return 2
+
+    results = [
+        {"kind": hit.kind, "path": hit.path, "score": round(hit.score, 4), "summary": summaries[hit.kind].get(hit.path)}
+        for hit in hits
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            summary = result["summary"] or ""
+            if not args.summaries:
+                summary = summary.strip().split("\n", 1)[0]
+            name = result["path"] + ("/" if result["kind"] == "directory" and result["path"] != "." else "")
+            score = f" ({result['score']:.2f})" if result["score"] else ""
+            color_print.print_cyan(f"{name}{score}")
+            if summary:
+                print(f"    {summary}" if not args.summaries else f"{summary}\n")
+        if not results:
+            color_print.print_yellow("No matching summaries")
+    return 0 if results else 1
+
+
+def _export(args: argparse.Namespace, extra_args: List[str]) -> int:
+    from .ExportSummaries import export_summaries
+    from .utils.clone_repo import get_clone_path
+
+    metadata_dir = os.path.join(get_clone_path(args.repo_url, args.target_dir, args.branch, args.pr), "scanner_metadata")
+    try:
+        return 0 if export_summaries(metadata_dir, args.output, args.store_backend) else 1
+    except ValueError as error:
+        color_print.print_red(str(error))
+        return 2
+
+
+def _daemon(args: argparse.Namespace, extra_args: List[str]) -> int:
+    from .ScanDaemon import main as daemon_main
+    return daemon_main(extra_args, prog="scythe-scan daemon")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
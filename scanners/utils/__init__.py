@@ -0,0 +1 @@
+"""Building blocks of the scanners: cloning, enumeration, LLM requests, storage and reporting."""
@@ -0,0 +1,212 @@
+"""Token-budgeted map-reduce summarization of files too large for one prompt."""
+
+import hashlib
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+from . import color_print
+from .color_print import Colors
+from .llm_client import LLMClient, generate_summary
+from .scan_metrics import bind_metrics, get_active_metrics, increment, timed
+from .scan_progress import file_detail
+
+
+# Rough characters-per-token ratio used to turn token budgets into read sizes
+CHARS_PER_TOKEN = 4
+DEFAULT_CHUNK_TOKENS = 6000
+DEFAULT_CHUNK_CONCURRENCY = 4
+
+
+def estimate_tokens(character_count: int) -> int:
+    """Estimate the number of prompt tokens for a given amount of text.
+
+    Args:
+        character_count: Number of characters (or bytes) of text.
+
+    Returns:
+        Approximate token count.
+    """
+    return -(-character_count // CHARS_PER_TOKEN)
+
+
+def iter_text_chunks(file_path: str, chunk_chars: int) -> Iterator[str]:
+    """Read a text file incrementally in chunks of at most chunk_chars characters.
+
+    Chunks end on a line boundary whenever the chunk contains one, so lines are
+    only split when a single line is longer than a chunk. At most two chunks'
+    worth of text is held in memory at a time.
+
+    Args:
+        file_path: Path to the file to read.
+        chunk_chars: Maximum number of characters per chunk.
+
+    Yields:
+        Consecutive chunks which concatenate to the decoded file content.
+
+    Raises:
+        ValueError: If chunk_chars is less than 1.
+        OSError: If the file cannot be read.
+    """
+    if chunk_chars < 1:
+        raise ValueError("chunk_chars must be at least 1")
+
+    buffer = ""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+        while True:
+            with timed("read"):
+                piece = file.read(chunk_chars)
+            buffer += piece
+            while len(buffer) >= chunk_chars or (not piece and buffer):
+                cut = buffer.rfind("\n", 0, chunk_chars) + 1 or min(chunk_chars, len(buffer))
+                yield buffer[:cut]
+                buffer = buffer[cut:]
+            if not piece:
+                return
+
+
+def hash_file_content(file_path: str, chunk_chars: int) -> str:
+    """Hash a file's decoded content without loading it all into memory.
+
+    The digest equals compute_content_hash() of the whole content, so large and
+    small files share the same cache keys.
+
+    Args:
+        file_path: Path to the file to hash.
+        chunk_chars: Number of characters to read at a time.
+
+    Returns:
+        Hex-encoded SHA-256 digest of the UTF-8 encoded content.
+
+    Raises:
+        OSError: If the file cannot be read.
+    """
+    digest = hashlib.sha256()
+    for chunk in iter_text_chunks(file_path, chunk_chars):
+        digest.update(chunk.encode("utf-8", errors="ignore"))
+    return digest.hexdigest()
+
+
+def summarize_file_in_chunks(
+    file_path: str,
+    relative_path: str,
+    api_key: str,
+    model: str,
+    client: Optional[LLMClient] = None,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    max_parallel: int = DEFAULT_CHUNK_CONCURRENCY
+) -> Optional[str]:
+    """Summarize a file of any size with a bounded prompt size and memory footprint.
+
+    The file is streamed in chunks of about chunk_tokens tokens which are
+    summarized in parallel (map), and the chunk summaries are then combined into
+    the file summary (reduce). If the chunk summaries themselves exceed the
+    budget, they are first reduced in groups until they fit. A file that fits in
+    a single chunk is summarized with one request, exactly like a small file.
+
+    Only up to max_parallel chunks are read ahead of the requests in flight, so
+    memory use is independent of the file size. Pass a client that caps the
+    requests in flight, such as CappedClient, to keep the chunk requests within
+    a scan-wide limit.
+
+    Args:
+        file_path: Path to the file to summarize.
+        relative_path: File path relative to the repository root, used in prompts.
+        api_key: OpenRouter API key.
+        model: Model name to use for generation.
+        client: Shared LLM client to reuse across requests.
+        chunk_tokens: Approximate prompt budget per request, in tokens.
+        max_parallel: Maximum number of chunk requests in flight for this file.
+
+    Returns:
+        Summary string if successful, None if the file is blank or any request failed.
+
+    Raises:
+        ValueError: If chunk_tokens or max_parallel is less than 1.
+        OSError: If the file cannot be read.
+    """
+    if chunk_tokens < 1:
+        raise ValueError("chunk_tokens must be at least 1")
+    if max_parallel < 1:
+        raise ValueError("max_parallel must be at least 1")
+
+    chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks = (chunk for chunk in iter_text_chunks(file_path, chunk_chars) if chunk.strip())
+    first_chunk = next(chunks, None)
+    second_chunk = next(chunks, None)
+
+    if first_chunk is None:
+        file_detail(f"Skipping empty file: {relative_path}", Colors.YELLOW)
+        increment("files_skipped_empty")
+        return None
+    if second_chunk is None:
+        return generate_summary(first_chunk, f"file: {relative_path}", api_key, model, client)
+
+    with ThreadPoolExecutor(max_workers=max_parallel, initializer=bind_metrics, initargs=(get_active_metrics(),)) as executor:
+        chunk_summaries: List[Optional[str]] = []
+        in_flight = deque()
+        for number, chunk in enumerate(itertools.chain((first_chunk, second_chunk), chunks), start=1):
+            in_flight.append(executor.submit(
+                generate_summary, chunk, f"part {number} of file: {relative_path}", api_key, model, client
+            ))
+            if len(in_flight) >= max_parallel:
+                chunk_summaries.append(in_flight.popleft().result())
+                if chunk_summaries[-1] is None:
+                    break
+        else:
+            chunk_summaries += [future.result() for future in in_flight]
+
+        if None in chunk_summaries:
+            for future in in_flight:
+                future.cancel()
+            color_print.print_red(f"Failed to summarize every part of {relative_path}")
+            return None
+
+        file_detail(f"Combining {len(chunk_summaries)} part summaries for: {relative_path}", Colors.CYAN)
+        return _reduce_summaries(chunk_summaries, relative_path, api_key, model, client, chunk_chars, executor)
+
+
+def _reduce_summaries(
+    summaries: List[str],
+    relative_path: str,
+    api_key: str,
+    model: str,
+    client: Optional[LLMClient],
+    budget_chars: int,
+    executor: ThreadPoolExecutor
+) -> Optional[str]:
+    """Combine consecutive part summaries into one, in rounds if they exceed the budget."""
+    while len(summaries) > 1 and sum(len(summary) + 2 for summary in summaries) > budget_chars:
+        groups = _group_by_size(summaries, budget_chars)
+        if len(groups) == len(summaries):
+            break
+
+        summaries = list(executor.map(
+            lambda group: generate_summary(
+                "\n\n".join(group), f"section of file: {relative_path} (given as summaries of its consecutive parts)",
+                api_key, model, client
+            ),
+            groups
+        ))
+        if None in summaries:
+            color_print.print_red(f"Failed to combine part summaries of {relative_path}")
+            return None
+
+    return generate_summary(
+        "\n\n".join(summaries), f"file: {relative_path} (given as summaries of its consecutive parts)",
+        api_key, model, client
+    )
+
+
+def _group_by_size(summaries: List[str], budget_chars: int) -> List[List[str]]:
+    """Split summaries into consecutive groups whose joined size stays within the budget."""
+    groups: List[List[str]] = []
+    size = budget_chars
+    for summary in summaries:
+        if size + len(summary) + 2 > budget_chars:
+            groups.append([])
+            size = 0
+        groups[-1].append(summary)
+        size += len(summary) + 2
+    return groups
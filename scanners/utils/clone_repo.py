@@ -1,12 +1,24 @@
 """Repository cloning utility using GitPython."""
 
+import hashlib
 import os
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
 from urllib.parse import urlparse
 
-from git import Repo
+from . import color_print
 
-import color_print
+try:
+    import fcntl
+except ImportError:
+    # Without flock (Windows), mirrors are only locked between threads of one process
+    fcntl = None
+
+
+# Locks of the mirrors synced by this process, by absolute mirror path
+_mirror_locks: Dict[str, threading.Lock] = {}
+_mirror_locks_lock = threading.Lock()
 
 
 def _extract_repo_name(repo_url: str) -> str:
@@ -36,21 +48,168 @@ def _extract_repo_name(repo_url: str) -> str:
 
     except Exception:
         # Ultimate fallback: use a hash of the URL
-        import hashlib
         return hashlib.md5(repo_url.encode()).hexdigest()[:8]
 
 
-def clone_repository(
+def get_clone_path(
     repo_url: str,
     target_dir: Optional[str] = None,
     branch: Optional[str] = None,
     pr_number: Optional[int] = None
+) -> str:
+    """Get the folder clone_repository uses for a repository, branch or pull request.
+
+    Args:
+        repo_url: The URL of the Git repository.
+        target_dir: The base directory holding clones. If None, defaults to
+            'clone_dir' in the project root.
+        branch: The branch name, if a specific branch is cloned.
+        pr_number: The pull request number, if a pull request is cloned.
+
+    Returns:
+        Path of the working tree for the clone.
+    """
+    if target_dir is None:
+        # Default to clone_dir in the project root
+        target_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "clone_dir")
+
+    # Extract repository name and create subdirectory path
+    repo_name = _extract_repo_name(repo_url)
+
+    # Append branch/PR info to directory name if specified
+    if pr_number is not None:
+        repo_name = f"{repo_name}-pr-{pr_number}"
+    elif branch is not None:
+        repo_name = f"{repo_name}-{branch}"
+
+    return os.path.join(target_dir, repo_name)
+
+
+def get_mirror_path(repo_url: str, mirror_dir: Optional[str] = None) -> str:
+    """Get the path of the persistent bare mirror cached for a repository URL.
+
+    Args:
+        repo_url: The URL of the Git repository.
+        mirror_dir: The directory holding mirrors. If None, defaults to
+            'clone_dir/.mirrors' in the project root.
+
+    Returns:
+        Path of the bare mirror repository.
+    """
+    if mirror_dir is None:
+        mirror_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "clone_dir", ".mirrors")
+
+    # Different URLs can share a repository name, so key mirrors by the full URL too
+    url_hash = hashlib.sha1(repo_url.encode()).hexdigest()[:8]
+    return os.path.join(mirror_dir, f"{_extract_repo_name(repo_url)}-{url_hash}.git")
+
+
+@contextmanager
+def _lock_mirror(mirror_path: str) -> Iterator[None]:
+    """Hold a mirror exclusively while the block runs.
+
+    Scans of different branches of one repository share its mirror, and two
+    git processes creating or fetching into it at once fail on its ref locks.
+    Threads of this process wait on a lock per mirror path, and processes on
+    an flock of ``<mirror>.lock``.
+
+    Args:
+        mirror_path: Path of the bare mirror repository.
+    """
+    mirror_path = os.path.abspath(mirror_path)
+    with _mirror_locks_lock:
+        lock = _mirror_locks.setdefault(mirror_path, threading.Lock())
+    with lock:
+        os.makedirs(os.path.dirname(mirror_path), exist_ok=True)
+        with open(mirror_path + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                # Released when the file is closed
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+
+def _sync_mirror(repo_url: str, mirror_path: str) -> None:
+    """Create the bare mirror for a repository, or fetch only what changed since the last sync.
+
+    Concurrent syncs of the same mirror run one after the other.
+
+    Args:
+        repo_url: The URL of the Git repository.
+        mirror_path: Path of the bare mirror repository.
+    """
+    from git import Repo
+
+    with _lock_mirror(mirror_path):
+        if os.path.isdir(mirror_path):
+            color_print.print_cyan(f"Fetching updates into mirror {mirror_path}...")
+            Repo(mirror_path).git.fetch('--prune', 'origin')
+        else:
+            color_print.print_cyan(f"Creating mirror {mirror_path}...")
+            Repo.clone_from(repo_url, mirror_path, mirror=True)
+
+
+def _get_clone_options(depth: Optional[int], blobless: bool) -> Dict[str, Any]:
+    """Build the git clone/fetch options for shallow and blobless clones.
+
+    Args:
+        depth: Number of commits of history to fetch, or None for full history.
+        blobless: Whether to omit file contents until they are checked out.
+
+    Returns:
+        Keyword options understood by GitPython's clone_from and fetch.
+    """
+    options: Dict[str, Any] = {}
+    if depth is not None:
+        options['depth'] = depth
+    if blobless:
+        options['filter'] = 'blob:none'
+    return options
+
+
+def _update_existing_clone(repo_dir: str, clone_target: Optional[str], depth: Optional[int] = None) -> None:
+    """Bring an existing clone up to date instead of cloning again.
+
+    Untracked files such as scanner_metadata are left in place so that
+    incremental rescans can reuse previous summaries.
+
+    Args:
+        repo_dir: Path to the existing working tree.
+        clone_target: Branch or ref that was cloned, or None for the default branch.
+        depth: Keep a shallow clone shallow by fetching only this many commits.
+    """
+    from git import Repo
+
+    repo = Repo(repo_dir)
+    fetch_options = _get_clone_options(depth, blobless=False)
+    if clone_target:
+        repo.git.fetch('origin', clone_target, **fetch_options)
+        repo.git.reset('--hard', 'FETCH_HEAD')
+    else:
+        repo.git.fetch('origin', **fetch_options)
+        repo.git.reset('--hard', '@{upstream}')
+
+
+def clone_repository(
+    repo_url: str,
+    target_dir: Optional[str] = None,
+    branch: Optional[str] = None,
+    pr_number: Optional[int] = None,
+    depth: Optional[int] = None,
+    blobless: bool = False,
+    use_mirror: bool = False,
+    mirror_dir: Optional[str] = None
 ) -> bool:
     """Clone a Git repository into a subdirectory within the specified directory.
 
     Creates a folder named after the repository within the target directory
     and clones the repository into that folder. Supports cloning specific branches
-    or pull requests.
+    or pull requests. If the folder already holds a clone, it is fetched and reset
+    to the latest commit instead, keeping any existing scanner_metadata.
+
+    Clones can be shallow (``depth``) and blobless (``blobless``) to cut clone time
+    and disk use. With ``use_mirror``, a persistent bare mirror of the repository
+    is kept per URL; later scans only fetch new objects into it and check out
+    locally from the mirror instead of downloading the whole repository again.
 
     Args:
         repo_url: The URL of the Git repository to clone.
@@ -59,41 +218,41 @@ def clone_repository(
         branch: The branch name to clone. If None, clones the default branch.
         pr_number: The pull request number to clone. If specified, clones the PR
             branch using GitHub's refs/pull/{number}/head. Overrides branch parameter.
+        depth: Number of commits of history to clone (e.g. 1), or None for full history.
+        blobless: Whether to clone with --filter=blob:none, fetching file contents
+            only when they are checked out. Not supported together with use_mirror.
+        use_mirror: Whether to clone through a persistent bare mirror cache.
+        mirror_dir: The directory holding mirrors. If None, defaults to
+            'clone_dir/.mirrors' in the project root.
 
     Returns:
         True if cloning was successful, False otherwise.
 
     Raises:
-        ValueError: If repo_url is empty or invalid, or if both branch and pr_number are specified.
+        ValueError: If repo_url is empty or invalid, if both branch and pr_number are
+            specified, if depth is less than 1, or if blobless is combined with use_mirror.
         OSError: If target directory cannot be created or accessed.
     """
+    from git import Repo
+
     if not repo_url or not isinstance(repo_url, str):
         raise ValueError("Repository URL must be a non-empty string")
 
     if branch is not None and pr_number is not None:
         raise ValueError("Cannot specify both branch and pr_number. Choose one.")
 
-    if target_dir is None:
-        # Default to clone_dir in the project root
-        target_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "clone_dir")
-
-    try:
-        # Ensure base target directory exists
-        os.makedirs(target_dir, exist_ok=True)
-
-        # Extract repository name and create subdirectory path
-        repo_name = _extract_repo_name(repo_url)
+    if depth is not None and depth < 1:
+        raise ValueError("depth must be at least 1")
 
-        # Append branch/PR info to directory name if specified
-        if pr_number is not None:
-            repo_name = f"{repo_name}-pr-{pr_number}"
-        elif branch is not None:
-            repo_name = f"{repo_name}-{branch}"
+    if blobless and use_mirror:
+        # A blobless mirror has no file contents to serve local checkouts from
+        raise ValueError("Cannot combine blobless with use_mirror. Choose one.")
 
-        repo_dir = os.path.join(target_dir, repo_name)
+    try:
+        repo_dir = get_clone_path(repo_url, target_dir, branch, pr_number)
 
-        # Ensure the repository subdirectory exists (though clone_from will create it)
-        os.makedirs(repo_dir, exist_ok=True)
+        # Ensure base target directory exists
+        os.makedirs(os.path.dirname(repo_dir), exist_ok=True)
 
         # Determine what to clone (branch or PR)
         clone_target = None
@@ -105,13 +264,37 @@ def clone_repository(
             clone_target = branch
             color_print.print_cyan(f"Cloning branch '{branch}'...")
 
-        # Clone the repository into the subdirectory
-        if clone_target:
-            Repo.clone_from(repo_url, repo_dir, branch=clone_target)
+        clone_source = repo_url
+        if use_mirror:
+            mirror_path = get_mirror_path(repo_url, mirror_dir)
+            _sync_mirror(repo_url, mirror_path)
+            # Local clones ignore --depth unless they go through the file:// transport
+            clone_source = f"file://{os.path.abspath(mirror_path)}" if depth is not None else mirror_path
+
+        clone_options = _get_clone_options(depth, blobless)
+
+        if os.path.isdir(os.path.join(repo_dir, ".git")):
+            # Reuse the previous clone so incremental rescans keep their metadata
+            color_print.print_cyan(f"Updating existing clone in {repo_dir}...")
+            _update_existing_clone(repo_dir, clone_target, depth)
+            color_print.print_green(f"Repository updated: {repo_dir}")
         else:
-            Repo.clone_from(repo_url, repo_dir)
+            # Ensure the repository subdirectory exists (though clone_from will create it)
+            os.makedirs(repo_dir, exist_ok=True)
+
+            # Clone the repository into the subdirectory
+            if pr_number is not None:
+                # Pull request refs are not branches, so they cannot be passed to
+                # clone --branch; fetch the ref and check it out detached instead
+                repo = Repo.clone_from(clone_source, repo_dir, **clone_options)
+                repo.git.fetch('origin', clone_target, **_get_clone_options(depth, blobless=False))
+                repo.git.checkout('--detach', 'FETCH_HEAD')
+            elif clone_target:
+                Repo.clone_from(clone_source, repo_dir, branch=clone_target, **clone_options)
+            else:
+                Repo.clone_from(clone_source, repo_dir, **clone_options)
 
-        color_print.print_green(f"Repository cloned to: {repo_dir}")
+            color_print.print_green(f"Repository cloned to: {repo_dir}")
         if clone_target:
             color_print.print_green(f"Checked out: {clone_target}")
 
@@ -1,3 +1,7 @@
+import threading
+from typing import Callable, Optional
+
+
 class Colors:
     """ANSI color codes for terminal output."""
 
@@ -40,6 +44,23 @@ class Colors:
     BRIGHT_BACKGROUND_WHITE = "\033[107m"
 
 
+# Held while writing to the terminal, so lines from concurrent workers never interleave
+output_lock = threading.RLock()
+_output_handler: Optional[Callable[[str, str], bool]] = None
+
+
+def set_output_handler(handler: Optional[Callable[[str, str], bool]]) -> None:
+    """Route every message through a handler instead of printing it directly.
+
+    Args:
+        handler: Called with the text and color code of each message; returns
+            True if it took care of the message, False to have it printed as
+            usual. None restores direct printing.
+    """
+    global _output_handler
+    _output_handler = handler
+
+
 def print_colored(text: str, color_code: str) -> None:
     """Print text in specified color.
 
@@ -47,7 +68,11 @@ def print_colored(text: str, color_code: str) -> None:
         text: The text to print.
         color_code: ANSI color code to apply.
     """
-    print(f"{color_code}{text}{Colors.RESET}")
+    handler = _output_handler
+    if handler is not None and handler(text, color_code):
+        return
+    with output_lock:
+        print(f"{color_code}{text}{Colors.RESET}")
 
 
 def print_red(text: str) -> None:
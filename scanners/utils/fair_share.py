@@ -0,0 +1,177 @@
+"""LLM concurrency caps: per scan, and global ones shared fairly between concurrent scans."""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from .llm_client import LLMClient
+
+
+class FairShareLimiter:
+    """Caps the requests in flight across tenants and shares the cap between them.
+
+    Whenever a slot frees up, it goes to a waiting tenant with the fewest
+    requests in flight, so a repository with thousands of files cannot starve
+    a small one scanned at the same time, while a lone scan still gets the
+    whole cap.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Create the limiter.
+
+        Args:
+            capacity: Maximum number of slots held at once, across all tenants.
+
+        Raises:
+            ValueError: If capacity is less than 1.
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self.capacity = capacity
+        self._condition = threading.Condition()
+        self._in_flight: Dict[str, int] = defaultdict(int)
+        self._waiting: Dict[str, int] = defaultdict(int)
+        self._total = 0
+
+    def acquire(self, tenant: str) -> None:
+        """Block until the tenant gets a slot.
+
+        Args:
+            tenant: Key the slot is accounted to, such as a repository URL.
+        """
+        with self._condition:
+            self._waiting[tenant] += 1
+            try:
+                self._condition.wait_for(lambda: self._is_next(tenant))
+            finally:
+                self._waiting[tenant] -= 1
+                if not self._waiting[tenant]:
+                    del self._waiting[tenant]
+            self._in_flight[tenant] += 1
+            self._total += 1
+            if self._total < self.capacity:
+                # Waiters that were skipped for this tenant may be next now
+                self._condition.notify_all()
+
+    def release(self, tenant: str) -> None:
+        """Give back a slot acquired for the tenant.
+
+        Args:
+            tenant: Key the slot was acquired for.
+        """
+        with self._condition:
+            self._in_flight[tenant] -= 1
+            if not self._in_flight[tenant]:
+                del self._in_flight[tenant]
+            self._total -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, tenant: str) -> Iterator[None]:
+        """Hold a slot for the tenant while the block runs.
+
+        Args:
+            tenant: Key the slot is accounted to.
+        """
+        self.acquire(tenant)
+        try:
+            yield
+        finally:
+            self.release(tenant)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the current use of the limiter.
+
+        Returns:
+            Dictionary with the capacity, slots in use, waiting requests and
+            the slots held per tenant.
+        """
+        with self._condition:
+            return {
+                "capacity": self.capacity,
+                "in_flight": self._total,
+                "waiting": sum(self._waiting.values()),
+                "tenants": dict(self._in_flight),
+            }
+
+    def _is_next(self, tenant: str) -> bool:
+        if self._total >= self.capacity:
+            return False
+        fewest = min(self._in_flight.get(waiting_tenant, 0) for waiting_tenant in self._waiting)
+        return self._in_flight.get(tenant, 0) <= fewest
+
+
+class CappedClient:
+    """Stand-in for LLMClient that caps the requests in flight through it.
+
+    Every request holds one of ``max_in_flight`` slots while it runs, however
+    many threads send requests, so a scan whose workers fan out (such as
+    summarize_file_in_chunks) still keeps to its concurrency limit.
+    Closing it leaves the wrapped client open.
+    """
+
+    def __init__(self, client: LLMClient, max_in_flight: int) -> None:
+        """Wrap a client.
+
+        Args:
+            client: LLMClient, or a stand-in such as FairShareClient, to send requests with.
+            max_in_flight: Maximum number of requests in flight at once.
+
+        Raises:
+            ValueError: If max_in_flight is less than 1.
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self._client = client
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def complete(self, *args, **kwargs) -> str:
+        """Send a request with the wrapped client once a slot is free."""
+        with self._slots:
+            return self._client.complete(*args, **kwargs)
+
+    def close(self) -> None:
+        """Do nothing; the wrapped client is closed by its owner."""
+
+    def __enter__(self) -> "CappedClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class FairShareClient:
+    """Stand-in for LLMClient that sends one tenant's requests through a shared client.
+
+    Every request holds a slot of the shared FairShareLimiter while it runs.
+    Closing it leaves the shared client open.
+    """
+
+    def __init__(self, client: LLMClient, limiter: FairShareLimiter, tenant: str) -> None:
+        """Bind a tenant to the shared client and limiter.
+
+        Args:
+            client: Long-lived client shared by every tenant.
+            limiter: Limiter capping the requests in flight across tenants.
+            tenant: Key this client's requests are accounted to.
+        """
+        self._client = client
+        self._limiter = limiter
+        self.tenant = tenant
+
+    def complete(self, *args, **kwargs) -> str:
+        """Send a request with LLMClient.complete once the tenant gets a slot."""
+        with self._limiter.slot(self.tenant):
+            return self._client.complete(*args, **kwargs)
+
+    def close(self) -> None:
+        """Do nothing; the shared client is closed by its owner."""
+
+    def __enter__(self) -> "FairShareClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -2,9 +2,11 @@
 
 import os
 import json
-from pathlib import Path
-from fnmatch import fnmatch
-from typing import List, Set, Tuple
+import re
+import uuid
+from dataclasses import dataclass
+from fnmatch import fnmatch, translate
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
 
 
 COMMON_BINARY_EXTENSIONS = {
@@ -19,6 +21,48 @@ COMMON_BINARY_EXTENSIONS = {
     '.bin', '.dat', '.o', '.obj'
 }
 
+# Kinds of files that get a stub summary instead of an LLM request
+LOCKFILE = "lockfile"
+GENERATED_FILE = "generated"
+MINIFIED_FILE = "minified"
+
+LOCKFILE_NAMES = {
+    'package-lock.json', 'npm-shrinkwrap.json', 'yarn.lock', 'pnpm-lock.yaml', 'bun.lock',
+    'poetry.lock', 'Pipfile.lock', 'pdm.lock', 'uv.lock', 'Cargo.lock', 'Gemfile.lock',
+    'composer.lock', 'go.sum', 'flake.lock', 'mix.lock', 'pubspec.lock', 'Podfile.lock',
+    'Package.resolved', 'packages.lock.json', 'gradle.lockfile', 'deno.lock',
+}
+GENERATED_FILE_PATTERNS = {
+    MINIFIED_FILE: ('*.min.js', '*.min.mjs', '*.min.css', '*.map'),
+    GENERATED_FILE: (
+        '*_pb2.py', '*_pb2.pyi', '*_pb2_grpc.py', '*.pb.go', '*.pb.cc', '*.pb.h', '*.pb.swift',
+        '*_pb.js', '*_pb.d.ts', '*_grpc_pb.js', '*.g.dart', '*.freezed.dart', '*.designer.cs', '*.snap',
+    ),
+}
+# Markers of generated code, looked for in the header lines of a file
+GENERATED_MARKER_PATTERN = re.compile(
+    r'@generated|do not edit|auto-?generated|automatically generated',
+    re.IGNORECASE
+)
+GENERATED_MARKER_LINES = 5
+# A sample of at least MINIFIED_MIN_CHARS whose lines average more than
+# MINIFIED_MEAN_LINE_LENGTH characters is minified or machine-written
+MINIFIED_SAMPLE_CHARS = 16384
+MINIFIED_MIN_CHARS = 2048
+MINIFIED_MEAN_LINE_LENGTH = 300
+
+
+def has_binary_extension(file_path: str) -> bool:
+    """Check if a file has a well-known binary extension, without reading it.
+    
+    Args:
+        file_path: Path to the file to check.
+        
+    Returns:
+        True if the extension is in COMMON_BINARY_EXTENSIONS, False otherwise.
+    """
+    return os.path.splitext(file_path)[1].lower() in COMMON_BINARY_EXTENSIONS
+
 
 def is_binary_file(file_path: str) -> bool:
     """Check if a file is binary by looking for null bytes.
@@ -29,8 +73,7 @@ def is_binary_file(file_path: str) -> bool:
     Returns:
         True if the file appears to be binary, False otherwise.
     """
-    file_extension = Path(file_path).suffix.lower()
-    if file_extension in COMMON_BINARY_EXTENSIONS:
+    if has_binary_extension(file_path):
         return True
     
     try:
@@ -41,6 +84,80 @@ def is_binary_file(file_path: str) -> bool:
         return True
 
 
+def classify_file_name(file_name: str) -> Optional[str]:
+    """Recognize lockfiles and generated or minified files by their name alone.
+
+    Args:
+        file_name: Name of the file, without its directory.
+
+    Returns:
+        LOCKFILE, GENERATED_FILE or MINIFIED_FILE, or None for other files.
+    """
+    if file_name in LOCKFILE_NAMES:
+        return LOCKFILE
+    for kind, patterns in GENERATED_FILE_PATTERNS.items():
+        if any(fnmatch(file_name, pattern) for pattern in patterns):
+            return kind
+    return None
+
+
+def classify_file_content(head: str) -> Optional[str]:
+    """Recognize generated or minified files from the start of their content.
+
+    Generated files are recognized by a marker such as ``@generated`` or
+    ``DO NOT EDIT`` in their first GENERATED_MARKER_LINES lines, and minified
+    ones by the mean line length of the sample.
+
+    Args:
+        head: The file's first MINIFIED_SAMPLE_CHARS characters, or all of a shorter file.
+
+    Returns:
+        GENERATED_FILE or MINIFIED_FILE, or None for other files.
+    """
+    sample = head[:MINIFIED_SAMPLE_CHARS]
+    header = sample.split('\n', GENERATED_MARKER_LINES)[:GENERATED_MARKER_LINES]
+    if any(GENERATED_MARKER_PATTERN.search(line[:MINIFIED_MEAN_LINE_LENGTH]) for line in header):
+        return GENERATED_FILE
+    if len(sample) >= MINIFIED_MIN_CHARS and len(sample) / (sample.count('\n') + 1) > MINIFIED_MEAN_LINE_LENGTH:
+        return MINIFIED_FILE
+    return None
+
+
+def write_file_atomic(file_path: str, content: str, sync: bool = False) -> None:
+    """Write a text file so that it either keeps its old content or has all of the new one.
+
+    The content is written to a temporary file next to file_path, which is then
+    renamed over it, so a crash mid-write never leaves a truncated file behind.
+    Missing parent directories are created.
+
+    Args:
+        file_path: Path of the file to write.
+        content: Text to write.
+        sync: Whether to flush the file to disk before renaming it, so the
+            write also survives a power loss.
+
+    Raises:
+        OSError: If the file cannot be written.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    os.makedirs(directory, exist_ok=True)
+    # A unique name instead of tempfile.mkstemp, whose 0600 mode would replace the file's usual permissions
+    temporary_path = os.path.join(directory, f".{os.path.basename(file_path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temporary_path, 'x') as file:
+            file.write(content)
+            if sync:
+                file.flush()
+                os.fsync(file.fileno())
+        os.replace(temporary_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
+
+
 def load_ignore_patterns(ignore_file_path: str) -> Tuple[List[str], List[str]]:
     """Load ignore patterns from ignore.json file.
     
@@ -86,9 +203,277 @@ def should_ignore_file(file_path: str, base_path: str, exact_names: List[str], r
     return False
 
 
+@dataclass
+class _GitignoreRule:
+    """A single parsed .gitignore pattern."""
+
+    pattern: str
+    regex: str
+    anchored: bool
+    dir_only: bool
+    negated: bool
+
+    @property
+    def is_literal(self) -> bool:
+        return not any(char in self.pattern for char in '*?[\\')
+
+
+def _translate_gitignore_glob(pattern: str) -> str:
+    """Translate a gitignore glob into a regex.
+    
+    Unlike fnmatch, ``*`` and ``?`` never match ``/``, and ``**`` matches across
+    directories when it forms a whole path segment.
+    
+    Args:
+        pattern: Glob without leading or trailing slashes.
+        
+    Returns:
+        Regex source matching the whole path.
+    """
+    parts = []
+    index, length = 0, len(pattern)
+    while index < length:
+        char = pattern[index]
+        if char == '*':
+            at_segment_start = index == 0 or pattern[index - 1] == '/'
+            if pattern.startswith('**', index) and at_segment_start:
+                if pattern.startswith('/', index + 2):
+                    parts.append('(?:.*/)?')
+                    index += 3
+                    continue
+                if index + 2 == length:
+                    parts.append('.*')
+                    index += 2
+                    continue
+            while pattern.startswith('*', index):
+                index += 1
+            parts.append('[^/]*')
+            continue
+        if char == '?':
+            parts.append('[^/]')
+        elif char == '[':
+            end = index + 1
+            if pattern[end:end + 1] in ('!', '^'):
+                end += 1
+            if pattern[end:end + 1] == ']':
+                end += 1
+            end = pattern.find(']', end)
+            if end == -1:
+                parts.append('\\[')
+            else:
+                char_class = pattern[index + 1:end].replace('\\', '\\\\')
+                if char_class[:1] in ('!', '^'):
+                    char_class = '^' + char_class[1:]
+                parts.append(f'[{char_class}]')
+                index = end
+        elif char == '\\' and index + 1 < length:
+            index += 1
+            parts.append(re.escape(pattern[index]))
+        else:
+            parts.append(re.escape(char))
+        index += 1
+    return f"(?s:{''.join(parts)})\\Z"
+
+
+def _parse_gitignore_line(line: str) -> Optional[_GitignoreRule]:
+    """Parse one line of a .gitignore file.
+    
+    Args:
+        line: Raw line from the file.
+        
+    Returns:
+        The parsed rule, or None for blank lines and comments.
+    """
+    line = line.rstrip('\r\n')
+    while line.endswith(' ') and not line.endswith('\\ '):
+        line = line[:-1]
+    if not line or line.startswith('#'):
+        return None
+    
+    negated = line.startswith('!')
+    if negated or line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+    
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+    
+    # A slash anywhere but the end anchors the pattern to the .gitignore's directory
+    anchored = '/' in line
+    line = line.lstrip('/')
+    
+    return _GitignoreRule(line, _translate_gitignore_glob(line), anchored, dir_only, negated)
+
+
+def _compile_any(regexes: List[str]) -> Optional[Callable[[str], Optional[re.Match]]]:
+    """Combine regexes into a single compiled alternation."""
+    if not regexes:
+        return None
+    return re.compile('|'.join(f'(?:{regex})' for regex in regexes)).match
+
+
+class IgnoreMatcher:
+    """Precompiled ignore rules from ignore.json and a repository's .gitignore.
+    
+    Exact names are kept in frozensets and all globs of the same kind are folded
+    into one compiled regex, so each path costs a handful of lookups regardless
+    of how many patterns are configured. ignore.json rules keep the semantics of
+    should_ignore_file: an exact name or glob matching any path component, or a
+    glob matching the whole relative path, ignores it. .gitignore rules follow
+    git: patterns without a slash match names at any depth, patterns with one are
+    anchored to the repository root, a trailing slash matches only directories,
+    and later ``!`` rules re-include earlier matches. Only the root .gitignore is
+    read.
+    """
+    
+    def __init__(self, exact_names: Iterable[str] = (), regex_patterns: Iterable[str] = (), gitignore_lines: Iterable[str] = ()):
+        """Compile the ignore rules.
+        
+        Args:
+            exact_names: Exact file or directory names to ignore.
+            regex_patterns: fnmatch globs matched against each component and the relative path.
+            gitignore_lines: Lines of a .gitignore file at the repository root.
+        """
+        names = set(exact_names)
+        dir_names: Set[str] = set()
+        globs = [translate(pattern) for pattern in regex_patterns]
+        name_regexes = list(globs)
+        path_regexes = list(globs)
+        dir_name_regexes: List[str] = []
+        dir_path_regexes: List[str] = []
+        
+        rules = [rule for rule in map(_parse_gitignore_line, gitignore_lines) if rule]
+        self.gitignore_rule_count = len(rules)
+        
+        # Negations make .gitignore order significant, so those rules are checked
+        # one by one (last match wins) instead of being folded into the fast path
+        self._ordered_rules: List[Tuple[re.Pattern, bool, bool, bool]] = []
+        if any(rule.negated for rule in rules):
+            self._ordered_rules = [
+                (re.compile(rule.regex), rule.anchored, rule.dir_only, rule.negated) for rule in reversed(rules)
+            ]
+        else:
+            for rule in rules:
+                if not rule.anchored and rule.is_literal:
+                    (dir_names if rule.dir_only else names).add(rule.pattern)
+                elif not rule.anchored:
+                    (dir_name_regexes if rule.dir_only else name_regexes).append(rule.regex)
+                else:
+                    (dir_path_regexes if rule.dir_only else path_regexes).append(rule.regex)
+        
+        self._names = frozenset(names)
+        self._dir_names = frozenset(dir_names)
+        self._match_name = _compile_any(name_regexes)
+        self._match_path = _compile_any(path_regexes)
+        self._match_dir_name = _compile_any(dir_name_regexes)
+        self._match_dir_path = _compile_any(dir_path_regexes)
+    
+    def matches_entry(self, relative_path: str, name: str, is_dir: bool) -> bool:
+        """Check a single entry, assuming its parent directories are not ignored.
+        
+        Args:
+            relative_path: Path relative to the repository root, using '/' separators.
+            name: Final component of relative_path.
+            is_dir: Whether the entry is a directory.
+            
+        Returns:
+            True if the entry should be ignored, False otherwise.
+        """
+        if name in self._names:
+            return True
+        if self._match_name and self._match_name(name):
+            return True
+        if self._match_path and self._match_path(relative_path):
+            return True
+        if is_dir:
+            if name in self._dir_names:
+                return True
+            if self._match_dir_name and self._match_dir_name(name):
+                return True
+            if self._match_dir_path and self._match_dir_path(relative_path):
+                return True
+        
+        for regex, anchored, dir_only, negated in self._ordered_rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(relative_path if anchored else name):
+                return not negated
+        
+        return False
+    
+    def is_ignored(self, relative_path: str, is_dir: bool = False) -> bool:
+        """Check a path, including every parent directory on the way to it.
+        
+        Args:
+            relative_path: Path relative to the repository root.
+            is_dir: Whether the path is a directory.
+            
+        Returns:
+            True if the path or any of its parent directories is ignored.
+        """
+        parts = relative_path.replace(os.sep, '/').split('/')
+        for depth, part in enumerate(parts, start=1):
+            is_last = depth == len(parts)
+            if self.matches_entry('/'.join(parts[:depth]), part, is_dir if is_last else True):
+                return True
+        return False
+    
+    def walk(self, root_path: str) -> Iterator[Tuple[str, List[str], List[str]]]:
+        """Walk a directory tree like os.walk, skipping ignored entries.
+        
+        Ignored directories are pruned once and never descended into. Callers may
+        prune the yielded directory list further, as with os.walk.
+        
+        Args:
+            root_path: Repository root to walk.
+            
+        Yields:
+            Tuples of (directory path, non-ignored subdirectory names, non-ignored file names).
+        """
+        for root, dirs, files in os.walk(root_path):
+            relative_root = os.path.relpath(root, root_path)
+            prefix = '' if relative_root == '.' else relative_root.replace(os.sep, '/') + '/'
+            dirs[:] = [name for name in dirs if not self.matches_entry(prefix + name, name, True)]
+            yield root, dirs, [name for name in files if not self.matches_entry(prefix + name, name, False)]
+
+
+def load_gitignore_lines(repo_path: str) -> List[str]:
+    """Read the .gitignore at the root of a repository.
+    
+    Args:
+        repo_path: Path to the repository root.
+        
+    Returns:
+        Lines of the file, or an empty list if it does not exist.
+    """
+    try:
+        with open(os.path.join(repo_path, '.gitignore'), 'r', encoding='utf-8', errors='ignore') as file:
+            return file.readlines()
+    except (IOError, OSError):
+        return []
+
+
+def build_ignore_matcher(exact_names: List[str], regex_patterns: List[str], repo_path: Optional[str] = None) -> IgnoreMatcher:
+    """Compile ignore.json patterns, plus the repository's .gitignore if given.
+    
+    Args:
+        exact_names: List of exact names to ignore.
+        regex_patterns: List of glob patterns to match for ignoring.
+        repo_path: Repository root whose .gitignore should also be honored.
+        
+    Returns:
+        The compiled matcher.
+    """
+    gitignore_lines = load_gitignore_lines(repo_path) if repo_path else []
+    return IgnoreMatcher(exact_names, regex_patterns, gitignore_lines)
+
+
 def get_text_files_in_directory(directory_path: str, exact_names: List[str], regex_patterns: List[str]) -> List[str]:
     """Recursively get all non-binary, non-ignored files in a directory.
     
+    The directory's own .gitignore is honored in addition to the given patterns.
+    
     Args:
         directory_path: Path to the directory to scan.
         exact_names: List of exact names to ignore.
@@ -97,24 +482,13 @@ def get_text_files_in_directory(directory_path: str, exact_names: List[str], reg
     Returns:
         List of file paths that should be processed.
     """
+    matcher = build_ignore_matcher(exact_names, regex_patterns, directory_path)
     text_files = []
     
-    for root, dirs, files in os.walk(directory_path):
-        dirs_to_remove = []
-        for dir_name in dirs:
-            dir_path = os.path.join(root, dir_name)
-            if should_ignore_file(dir_path, directory_path, exact_names, regex_patterns):
-                dirs_to_remove.append(dir_name)
-        
-        for dir_name in dirs_to_remove:
-            dirs.remove(dir_name)
-        
+    for root, dirs, files in matcher.walk(directory_path):
         for file_name in files:
             file_path = os.path.join(root, file_name)
             
-            if should_ignore_file(file_path, directory_path, exact_names, regex_patterns):
-                continue
-            
             if is_binary_file(file_path):
                 continue
             
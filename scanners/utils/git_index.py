@@ -0,0 +1,228 @@
+"""Enumerate and classify a repository's files from its Git index."""
+
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Set, Tuple
+
+from . import color_print
+from .file_utils import IgnoreMatcher
+
+if TYPE_CHECKING:
+    from git import Repo
+
+
+SYMLINK_MODE = "120000"
+GITLINK_MODE = "160000"
+
+
+@dataclass
+class IndexEntry:
+    """A tracked file as recorded in the index.
+
+    Attributes:
+        blob_id: Object ID of the file's blob.
+        size: Size of the blob in bytes.
+        is_symlink: Whether the file is a symbolic link, whose blob holds the
+            link target rather than the content.
+    """
+
+    blob_id: str
+    size: int
+    is_symlink: bool = False
+
+
+@dataclass
+class _TreeNode:
+    """A directory of the tracked file tree."""
+
+    directories: Dict[str, "_TreeNode"] = field(default_factory=dict)
+    files: List[str] = field(default_factory=list)
+
+
+class GitIndex:
+    """The tracked files of a Git working tree, with their blob IDs and sizes.
+
+    Loaded with two git calls (``ls-files --stage`` and one ``cat-file
+    --batch-check``) instead of walking the working tree and stat-ing every file,
+    so untracked and git-ignored paths never show up. Binary detection is left to
+    file_utils.is_binary_file, which only reads the first 8 KB of a file. It
+    reflects the index, which for a fresh clone matches the checkout. Submodules
+    are skipped; symlinks are measured through the file system.
+    """
+
+    def __init__(self, repo_path: str, entries: Dict[str, IndexEntry]):
+        """Build the directory tree of the tracked files.
+
+        Args:
+            repo_path: Path to the repository working tree.
+            entries: Tracked files keyed by repository-relative path with '/' separators.
+        """
+        self.repo_path = repo_path
+        self._entries = entries
+        self._path_prefix = os.path.join(repo_path, '')
+        self._tree = _TreeNode()
+        for relative_path in entries:
+            node = self._tree
+            *directories, file_name = relative_path.split('/')
+            for directory in directories:
+                node = node.directories.setdefault(directory, _TreeNode())
+            node.files.append(file_name)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, file_path: str) -> Optional[IndexEntry]:
+        """Get the index entry of a file.
+
+        Args:
+            file_path: Absolute path of the file in the working tree.
+
+        Returns:
+            The entry, or None if the file is not tracked.
+        """
+        if file_path.startswith(self._path_prefix):
+            relative_path = file_path[len(self._path_prefix):]
+        else:
+            relative_path = os.path.relpath(file_path, self.repo_path)
+        return self._entries.get(relative_path.replace(os.sep, '/'))
+
+    def get_size(self, file_path: str) -> int:
+        """Drop-in replacement for os.path.getsize that uses the blob size of tracked files.
+
+        Args:
+            file_path: Absolute path of the file in the working tree.
+
+        Returns:
+            Size of the file in bytes.
+        """
+        entry = self.get(file_path)
+        return entry.size if entry else os.path.getsize(file_path)
+
+    def duplicate_blob_ids(self) -> Set[str]:
+        """Get the blobs tracked under more than one path, i.e. files with identical content.
+
+        Returns:
+            Object IDs of the blobs that are shared by several tracked files.
+        """
+        seen: Set[str] = set()
+        duplicates: Set[str] = set()
+        for entry in self._entries.values():
+            if entry.is_symlink:
+                continue
+            if entry.blob_id in seen:
+                duplicates.add(entry.blob_id)
+            seen.add(entry.blob_id)
+        return duplicates
+
+    def walk(self, matcher: Optional[IgnoreMatcher] = None) -> Iterator[Tuple[str, List[str], List[str]]]:
+        """Walk the tracked files like IgnoreMatcher.walk, top-down and in path order.
+
+        Directories without tracked files are not visited. Callers may prune the
+        yielded directory list, as with os.walk.
+
+        Args:
+            matcher: Ignore rules to apply on top of git's, or None.
+
+        Yields:
+            Tuples of (directory path, non-ignored subdirectory names, non-ignored file names).
+        """
+        stack = [(self.repo_path, '', self._tree)]
+        while stack:
+            root, prefix, node = stack.pop()
+            dirs = list(node.directories)
+            files = list(node.files)
+            if matcher is not None:
+                dirs = [name for name in dirs if not matcher.matches_entry(prefix + name, name, True)]
+                files = [name for name in files if not matcher.matches_entry(prefix + name, name, False)]
+
+            yield root, dirs, files
+
+            stack.extend(
+                (os.path.join(root, name), prefix + name + '/', node.directories[name])
+                for name in reversed(dirs) if name in node.directories
+            )
+
+
+def load_git_index(repo_path: str) -> Optional[GitIndex]:
+    """Load the tracked files of a repository from its index.
+
+    Args:
+        repo_path: Path to the root of a Git working tree.
+
+    Returns:
+        The loaded index, or None if repo_path is not the root of a Git
+        working tree or git fails, in which case callers should walk the
+        file system instead.
+    """
+    from git import Repo
+    from git.exc import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
+
+    try:
+        repo = Repo(repo_path)
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return None
+    if repo.bare or os.path.realpath(repo.working_tree_dir) != os.path.realpath(repo_path):
+        return None
+
+    try:
+        staged = _list_staged_files(repo)
+        sizes = _get_blob_sizes(repo, {blob_id for mode, blob_id in staged.values() if mode != SYMLINK_MODE})
+    except GitCommandError as error:
+        color_print.print_yellow(f"Cannot read the Git index of {repo_path}, walking the file system instead: {error}")
+        return None
+
+    entries = {}
+    for relative_path, (mode, blob_id) in staged.items():
+        size = sizes.get(blob_id)
+        if mode == SYMLINK_MODE or size is None:
+            # A symlink's blob holds the link target, so measure what the link points to
+            try:
+                size = os.path.getsize(os.path.join(repo_path, relative_path))
+            except OSError:
+                size = 0
+        entries[relative_path] = IndexEntry(blob_id, size, mode == SYMLINK_MODE)
+    return GitIndex(repo_path, entries)
+
+
+def _list_staged_files(repo: "Repo") -> Dict[str, Tuple[str, str]]:
+    """Run ``git ls-files --stage`` and parse its records.
+
+    Returns:
+        Mapping of relative path to (mode, blob ID), without submodules.
+    """
+    output = repo.git.ls_files('--stage', '-z')
+
+    staged = {}
+    for record in output.split('\0'):
+        if not record:
+            continue
+        # "<mode> <blob id> <stage>\t<path>"
+        stage_info, relative_path = record.split('\t', 1)
+        mode, blob_id, _ = stage_info.split(' ')
+        if mode == GITLINK_MODE or relative_path in staged:
+            continue
+        staged[relative_path] = (mode, blob_id)
+    return staged
+
+
+def _get_blob_sizes(repo: "Repo", blob_ids: Set[str]) -> Dict[str, int]:
+    """Look up the sizes of many blobs with a single ``git cat-file --batch-check``.
+
+    Returns:
+        Mapping of blob ID to size in bytes. Blobs missing from the object
+        database are left out.
+    """
+    if not blob_ids:
+        return {}
+    with tempfile.TemporaryFile() as object_list:
+        object_list.write("\n".join(blob_ids).encode("ascii") + b"\n")
+        object_list.seek(0)
+        output = repo.git.cat_file('--batch-check=%(objectname) %(objectsize)', istream=object_list)
+
+    sizes = {}
+    for line in output.splitlines():
+        blob_id, size = line.split(' ', 1)
+        if size.isdigit():
+            sizes[blob_id] = int(size)
+    return sizes
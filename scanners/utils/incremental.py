@@ -0,0 +1,215 @@
+"""Git-diff-driven incremental rescan support."""
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, List, Optional, Set
+
+from . import color_print
+from .file_utils import write_file_atomic
+from .summary_store import DIRECTORY_SUMMARY, FILE_SUMMARY, SummaryStore
+
+if TYPE_CHECKING:
+    from git import Repo
+
+
+SCAN_STATE_FILENAME = "_scan_state.json"
+
+
+@dataclass
+class ChangeSet:
+    """Files changed between two commits, as repository-relative paths.
+
+    Attributes:
+        modified: Added, modified, copied or type-changed files, plus the new
+            side of renames. These need fresh summaries.
+        removed: Deleted files, plus the old side of renames. Their summaries
+            are stale and must be deleted.
+    """
+
+    modified: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def affected_directories(self) -> Set[str]:
+        """Get every directory whose rollup depends on a changed file.
+
+        Returns:
+            Repository-relative directory paths, including '.' for the root.
+            Empty if nothing changed.
+        """
+        if not self:
+            return set()
+
+        directories = {'.'}
+        for path in self.modified + self.removed:
+            directory = os.path.dirname(path)
+            while directory:
+                directories.add(directory)
+                directory = os.path.dirname(directory)
+        return directories
+
+    def __bool__(self) -> bool:
+        return bool(self.modified or self.removed)
+
+
+def load_last_scanned_commit(metadata_dir: str) -> Optional[str]:
+    """Load the commit recorded by the last completed scan.
+
+    Args:
+        metadata_dir: Base directory for scanner_metadata.
+
+    Returns:
+        Commit SHA if a previous scan was recorded, None otherwise.
+    """
+    state_path = os.path.join(metadata_dir, SCAN_STATE_FILENAME)
+    try:
+        with open(state_path, 'r') as file:
+            return json.load(file).get('last_scanned_commit')
+    except (IOError, OSError, json.JSONDecodeError):
+        return None
+
+
+def save_last_scanned_commit(metadata_dir: str, commit: str) -> bool:
+    """Record the commit a completed scan covered.
+
+    Args:
+        metadata_dir: Base directory for scanner_metadata.
+        commit: Commit SHA that was scanned.
+
+    Returns:
+        True if saved successfully, False otherwise.
+    """
+    state_path = os.path.join(metadata_dir, SCAN_STATE_FILENAME)
+    try:
+        write_file_atomic(state_path, json.dumps({'last_scanned_commit': commit}, indent=2), sync=True)
+        return True
+    except (IOError, OSError) as error:
+        color_print.print_red(f"Failed to save scan state to {state_path}: {error}")
+        return False
+
+
+def get_head_commit(repo_path: str) -> Optional[str]:
+    """Get the commit currently checked out in a repository.
+
+    Args:
+        repo_path: Path to the Git working tree.
+
+    Returns:
+        HEAD commit SHA, or None if it cannot be resolved.
+    """
+    from git import Repo
+
+    try:
+        return Repo(repo_path).head.commit.hexsha
+    except Exception as error:
+        color_print.print_red(f"Failed to resolve HEAD in {repo_path}: {error}")
+        return None
+
+
+def find_merge_base(repo_path: str, base_branch: Optional[str] = None) -> Optional[str]:
+    """Fetch a base branch and find where HEAD diverged from it.
+
+    Args:
+        repo_path: Path to the Git working tree.
+        base_branch: Branch HEAD will be merged into. If None, the remote's
+            default branch (origin/HEAD) is used.
+
+    Returns:
+        Merge-base commit SHA, or None if it cannot be determined.
+    """
+    from git import Repo
+    from git.exc import GitCommandError
+
+    try:
+        repo = Repo(repo_path)
+        if base_branch:
+            repo.git.fetch('origin', base_branch)
+            base_ref = 'FETCH_HEAD'
+        else:
+            repo.git.fetch('origin')
+            base_ref = 'origin/HEAD'
+        return repo.git.merge_base(base_ref, 'HEAD')
+    except GitCommandError as error:
+        color_print.print_red(f"Failed to find merge base with {base_branch or 'origin/HEAD'}: {error}")
+        return None
+
+
+def get_changed_files(repo_path: str, base_commit: str, head_commit: str = "HEAD") -> Optional[ChangeSet]:
+    """List files changed between two commits using ``git diff --name-status``.
+
+    Args:
+        repo_path: Path to the Git working tree.
+        base_commit: Commit the previous summaries were generated from.
+        head_commit: Commit being scanned now.
+
+    Returns:
+        ChangeSet of modified and removed files, or None if the diff cannot be
+        computed (for example because base_commit is no longer in the history).
+    """
+    from git import Repo
+    from git.exc import GitCommandError
+
+    try:
+        repo = Repo(repo_path)
+        _ensure_commit_available(repo, base_commit)
+        output = repo.git.diff('--name-status', '-M', '-z', base_commit, head_commit)
+    except GitCommandError as error:
+        color_print.print_yellow(f"Cannot diff against last scanned commit {base_commit}: {error}")
+        return None
+
+    changes = ChangeSet()
+    fields = output.split('\0')
+    index = 0
+    while index < len(fields) and fields[index]:
+        status = fields[index][0]
+        if status in ('R', 'C'):
+            old_path, new_path = fields[index + 1], fields[index + 2]
+            if status == 'R':
+                changes.removed.append(old_path)
+            changes.modified.append(new_path)
+            index += 3
+            continue
+
+        path = fields[index + 1]
+        if status == 'D':
+            changes.removed.append(path)
+        else:
+            changes.modified.append(path)
+        index += 2
+
+    return changes
+
+
+def _ensure_commit_available(repo: "Repo", commit: str) -> None:
+    """Fetch a single commit into a shallow clone that does not have it yet.
+
+    Diffing two commits only needs their trees, not the history between them,
+    so shallow clones can still rescan incrementally.
+    """
+    from git.exc import GitCommandError
+
+    try:
+        repo.git.cat_file('-e', f"{commit}^{{commit}}")
+    except GitCommandError:
+        repo.git.fetch('origin', commit, depth=1)
+
+
+def invalidate_changed_summaries(store: SummaryStore, changes: ChangeSet) -> int:
+    """Delete summaries made stale by a set of changes.
+
+    Removes the file summaries of modified and removed files and the rollup
+    summaries of every affected directory, so the next scan regenerates exactly
+    those and reuses everything else.
+
+    Args:
+        store: Store holding the repository's summaries.
+        changes: Changes since the summaries were generated.
+
+    Returns:
+        Number of summaries deleted.
+    """
+    stale_summaries = [(FILE_SUMMARY, path) for path in changes.modified + changes.removed]
+    stale_summaries += [(DIRECTORY_SUMMARY, path) for path in changes.affected_directories]
+
+    return sum(1 for kind, path in stale_summaries if store.delete(kind, path))
@@ -1,11 +1,428 @@
 """LLM client for generating summaries using OpenRouter API."""
 
+import functools
 import json
-from typing import Optional
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
 
-from openai import OpenAI
+# The OpenAI SDK and httpx are imported only by LLMClient, so that code using just
+# the config loaders and prompt helpers here does not pay for importing them
+from . import color_print
+from .rate_limiter import AdaptiveRateLimiter, CircuitBreaker, ProviderUnavailableError, backoff_delay
+from .scan_metrics import ScanMetrics, bind_metrics, get_active_metrics, increment, timed
 
-import color_print
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_MAX_RETRIES = 6
+
+# Status codes worth retrying besides 429 and server errors, as in the OpenAI SDK
+RETRYABLE_STATUS_CODES = {408, 409}
+# Longest Retry-After honored, in seconds
+MAX_RETRY_AFTER = 60.0
+
+# Bump whenever the summary prompt changes so cached summaries are not reused
+PROMPT_VERSION = 1
+
+# Completion budget per file in a batched request
+BATCH_TOKENS_PER_FILE = 150
+
+# Latencies of the most recent requests the hedging delay is taken from
+HEDGE_WINDOW = 200
+# Requests to complete before any request is hedged
+MIN_HEDGE_SAMPLES = 20
+# Largest share of the requests that may be hedged
+MAX_HEDGE_RATIO = 0.1
+
+
+class BudgetExceededError(Exception):
+    """Raised instead of sending a request that would take a scan over its token or cost budget."""
+
+
+class _AttemptAbandoned(Exception):
+    """Raised in a hedged attempt once another attempt of the same request has succeeded."""
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    """A model that summarizes files up to a given size instead of the configured model.
+
+    Attributes:
+        model: Model name, usually a faster and cheaper one.
+        max_file_tokens: Largest file, in estimated tokens, the model summarizes.
+    """
+
+    model: str
+    max_file_tokens: int
+
+
+class LLMClient:
+    """Long-lived OpenRouter client backed by a pooled keep-alive HTTP session.
+
+    Create one per scan and share it across all summary requests so connections
+    and TLS sessions are reused instead of being rebuilt for every file.
+
+    The client owns retries: every request passes a token bucket that adapts
+    to the provider's 429 responses and Retry-After headers, and a circuit
+    breaker that pauses all requests while the provider keeps failing. 429s,
+    server errors, timeouts and connection failures are retried with
+    exponential backoff and jitter.
+
+    Two options cut the latency of the slowest requests. With a
+    first_token_timeout, responses are streamed and an attempt that has not
+    produced any text by then is abandoned and retried, instead of waiting for
+    the full timeout. With a hedge_percentile, a request still unanswered after
+    that percentile of recent request latencies is sent a second time, the
+    first answer wins and the other attempt is abandoned. At most
+    MAX_HEDGE_RATIO of the requests are hedged, so a slow provider does not get
+    twice the load.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = OPENROUTER_BASE_URL,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        requests_per_second: Optional[float] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        first_token_timeout: Optional[float] = None,
+        hedge_percentile: Optional[float] = None
+    ) -> None:
+        """Initialize the client and its connection pool.
+
+        Args:
+            api_key: OpenRouter API key.
+            base_url: Base URL of the OpenAI-compatible API.
+            pool_size: Maximum number of pooled (and kept-alive) connections.
+            timeout: Per-request timeout in seconds.
+            max_retries: Maximum number of retries of a failed request.
+            requests_per_second: Initial rate limit, or None to send unlimited
+                until the provider answers 429.
+            circuit_breaker: Circuit breaker to use instead of a default one.
+            first_token_timeout: Seconds to wait for the first streamed text (or
+                for any further text) before retrying, or None to not stream.
+            hedge_percentile: Latency percentile after which a request is sent
+                again, or None to never hedge.
+
+        Raises:
+            ValueError: If pool_size is less than 1, a timeout is not positive,
+                max_retries is negative or hedge_percentile is not between 0 and 100.
+        """
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        if timeout <= 0:
+            raise ValueError("timeout must be positive")
+        if max_retries < 0:
+            raise ValueError("max_retries must not be negative")
+        if first_token_timeout is not None and first_token_timeout <= 0:
+            raise ValueError("first_token_timeout must be positive")
+        if hedge_percentile is not None and not 0 < hedge_percentile < 100:
+            raise ValueError("hedge_percentile must be between 0 and 100")
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.first_token_timeout = first_token_timeout
+        self.hedge_percentile = hedge_percentile
+        import httpx
+        from openai import OpenAI
+
+        self._rate_limiter = AdaptiveRateLimiter(requests_per_second)
+        self._circuit_breaker = circuit_breaker or CircuitBreaker()
+        # Hedges need connections of their own next to the attempts they duplicate
+        connections = pool_size * 2 if hedge_percentile is not None else pool_size
+        self._http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            timeout=timeout
+        )
+        self._client = OpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            http_client=self._http_client,
+            timeout=timeout,
+            max_retries=0
+        )
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        if hedge_percentile is not None:
+            self._hedge_pool = ThreadPoolExecutor(connections, thread_name_prefix="llm-attempt")
+        self._hedge_lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=HEDGE_WINDOW)
+        self._hedgeable_requests = 0
+        self._hedged_requests = 0
+
+    def complete(self, prompt: str, model: str, max_tokens: int = 200, temperature: float = 0.3) -> str:
+        """Send a single-message chat completion request, retrying transient failures.
+
+        Args:
+            prompt: The user prompt to send.
+            model: Model name to use for generation.
+            max_tokens: Maximum number of tokens to generate.
+            temperature: Sampling temperature.
+
+        Returns:
+            The stripped completion text.
+
+        Raises:
+            ProviderUnavailableError: If the provider has been down for longer
+                than the circuit breaker waits.
+            openai.OpenAIError: If the request failed with a non-retryable error
+                or still failed after max_retries retries.
+        """
+        metrics = get_active_metrics()
+        start = time.perf_counter()
+        try:
+            if self._hedge_pool is None:
+                content, usage = self._send_with_retries(prompt, model, max_tokens, temperature)
+            else:
+                content, usage = self._send_hedged(prompt, model, max_tokens, temperature, metrics)
+        except Exception:
+            if metrics is not None:
+                metrics.record_llm_failure()
+            raise
+
+        latency = time.perf_counter() - start
+        if self._hedge_pool is not None:
+            with self._hedge_lock:
+                self._latencies.append(latency)
+        if metrics is not None:
+            metrics.record_llm_request(
+                latency,
+                usage.prompt_tokens if usage else 0,
+                usage.completion_tokens if usage else 0
+            )
+        return content.strip()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the state of the rate limiter and circuit breaker, and of hedging if enabled.
+
+        Returns:
+            Dictionary with a ``rate_limit`` and a ``circuit`` section, and a
+            ``hedging`` section with the current hedging delay in seconds (None
+            until enough requests have completed) and the number of requests
+            sent and hedged.
+        """
+        stats = {"rate_limit": self._rate_limiter.stats(), "circuit": self._circuit_breaker.stats()}
+        if self._hedge_pool is not None:
+            with self._hedge_lock:
+                stats["hedging"] = {
+                    "delay_seconds": self._hedge_delay(),
+                    "requests": self._hedgeable_requests,
+                    "hedged": self._hedged_requests,
+                }
+        return stats
+
+    def _send_hedged(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        metrics: Optional[ScanMetrics]
+    ) -> Tuple[str, Any]:
+        """Send the request, and once more if it is slow, and return the first answer."""
+        with self._hedge_lock:
+            self._hedgeable_requests += 1
+            delay = self._hedge_delay()
+
+        abandoned = threading.Event()
+        attempt = functools.partial(self._send_bound, metrics, prompt, model, max_tokens, temperature, abandoned)
+        primary = self._hedge_pool.submit(attempt)
+        attempts = [primary]
+        if delay is not None and not wait(attempts, timeout=delay).done and self._take_hedge():
+            increment("llm_hedged")
+            attempts.append(self._hedge_pool.submit(attempt))
+
+        error = None
+        for finished in as_completed(attempts):
+            if finished.exception() is not None:
+                error = error or finished.exception()
+                continue
+            # The other attempt stops at its next chunk or retry
+            abandoned.set()
+            if finished is not primary:
+                increment("llm_hedge_wins")
+            return finished.result()
+        raise error
+
+    def _send_bound(self, metrics: Optional[ScanMetrics], *args: Any) -> Tuple[str, Any]:
+        """Run _send_with_retries on a pool thread, recording into the caller's metrics."""
+        bind_metrics(metrics)
+        try:
+            return self._send_with_retries(*args)
+        finally:
+            bind_metrics(None)
+
+    def _hedge_delay(self) -> Optional[float]:
+        """Get the latency percentile after which to hedge; call with _hedge_lock held."""
+        if len(self._latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        latencies = sorted(self._latencies)
+        return latencies[max(0, math.ceil(len(latencies) * self.hedge_percentile / 100) - 1)]
+
+    def _take_hedge(self) -> bool:
+        """Count a hedge unless MAX_HEDGE_RATIO of the requests are hedged already."""
+        with self._hedge_lock:
+            if self._hedged_requests + 1 > self._hedgeable_requests * MAX_HEDGE_RATIO:
+                return False
+            self._hedged_requests += 1
+            return True
+
+    def _send_with_retries(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        abandoned: Optional[threading.Event] = None
+    ) -> Tuple[str, Any]:
+        """Send the request until it succeeds, fails for good, runs out of retries or is abandoned.
+
+        Returns:
+            The completion text and the usage the provider reported, if any.
+        """
+        attempt = 0
+        while True:
+            if abandoned is not None and abandoned.is_set():
+                raise _AttemptAbandoned()
+            probe = self._circuit_breaker.before_request()
+            sent_at = self._rate_limiter.acquire()
+            try:
+                with timed("llm"):
+                    if self.first_token_timeout is None:
+                        response = self._client.chat.completions.create(
+                            model=model,
+                            messages=[
+                                {"role": "user", "content": prompt}
+                            ],
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            timeout=self.timeout
+                        )
+                        result = response.choices[0].message.content, response.usage
+                    else:
+                        result = self._stream(prompt, model, max_tokens, temperature, abandoned)
+            except Exception as error:
+                if abandoned is not None and abandoned.is_set():
+                    # Another attempt got an answer, so this one's failure says nothing about the provider
+                    self._circuit_breaker.record_success(probe)
+                    raise _AttemptAbandoned() from error
+                delay = self._handle_failure(error, attempt, probe, sent_at)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                increment("llm_retries")
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            self._circuit_breaker.record_success(probe)
+            self._rate_limiter.record_success()
+            return result
+
+    def _stream(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        temperature: float,
+        abandoned: Optional[threading.Event]
+    ) -> Tuple[str, Any]:
+        """Stream one attempt, giving up if its text is slow to start or the request takes too long.
+
+        Returns:
+            The completion text and the usage the provider reported, if any.
+
+        Raises:
+            openai.APITimeoutError: If no text arrived within first_token_timeout,
+                a read took longer than that or the whole response took longer than timeout.
+            _AttemptAbandoned: If another attempt of the same request got an answer first.
+        """
+        import httpx
+        from openai import APITimeoutError
+
+        started = time.monotonic()
+        try:
+            stream = self._client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True},
+                # Each read, including the wait for the response headers, may take first_token_timeout
+                timeout=httpx.Timeout(self.timeout, read=self.first_token_timeout)
+            )
+        except APITimeoutError:
+            increment("llm_first_token_timeouts")
+            raise
+        parts: List[str] = []
+        usage = None
+        with stream:
+            try:
+                for chunk in stream:
+                    if abandoned is not None and abandoned.is_set():
+                        raise _AttemptAbandoned()
+                    if chunk.usage:
+                        usage = chunk.usage
+                    parts.extend(choice.delta.content for choice in chunk.choices if choice.delta.content)
+
+                    elapsed = time.monotonic() - started
+                    if not parts and elapsed > self.first_token_timeout:
+                        raise httpx.ReadTimeout("no text within the first-token timeout", request=stream.response.request)
+                    if elapsed > self.timeout:
+                        raise httpx.ReadTimeout("response not complete within the timeout", request=stream.response.request)
+            except httpx.TimeoutException as error:
+                if not parts:
+                    increment("llm_first_token_timeouts")
+                raise APITimeoutError(request=stream.response.request) from error
+        return "".join(parts), usage
+
+    def _handle_failure(self, error: Exception, attempt: int, probe: bool, sent_at: float) -> Optional[float]:
+        """Report a failed request to the limiter and circuit breaker.
+
+        Returns:
+            Seconds to wait before retrying, or None if the error is not retryable.
+        """
+        from openai import APIConnectionError, APIStatusError, RateLimitError
+
+        retry_after = _get_retry_after(error)
+        if isinstance(error, RateLimitError):
+            # The provider is up, just busy; frequent 429s make the limiter hold back every worker
+            increment("llm_rate_limited")
+            self._circuit_breaker.record_success(probe)
+            if self._rate_limiter.throttle(sent_at, retry_after):
+                return 0.0
+            return retry_after or backoff_delay(attempt)
+
+        if isinstance(error, APIConnectionError) or (isinstance(error, APIStatusError) and error.status_code >= 500):
+            self._circuit_breaker.record_failure(probe)
+            return max(retry_after or 0.0, backoff_delay(attempt))
+
+        self._circuit_breaker.record_success(probe)
+        if isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES:
+            return max(retry_after or 0.0, backoff_delay(attempt))
+        return None
+
+    def close(self) -> None:
+        """Close the underlying connection pool, abandoning attempts that lost a race."""
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+        self._http_client.close()
+
+    def __enter__(self) -> "LLMClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
 
 
 def load_api_key(config_path: str = "config.json") -> Optional[str]:
@@ -54,7 +471,73 @@ def load_model(config_path: str = "config.json") -> Optional[str]:
         return None
 
 
-def generate_summary(content: str, context: str, api_key: str, model: str) -> Optional[str]:
+def load_base_url(config_path: str = "config.json") -> str:
+    """Load the API base URL from config file.
+
+    Args:
+        config_path: Path to the config.json file.
+
+    Returns:
+        The configured ``base_url``, or the OpenRouter API URL if none is set.
+    """
+    try:
+        with open(config_path, 'r') as file:
+            return json.load(file).get('base_url') or OPENROUTER_BASE_URL
+    except (IOError, OSError, json.JSONDecodeError):
+        return OPENROUTER_BASE_URL
+
+
+def load_model_tiers(config_path: str = "config.json") -> List[ModelTier]:
+    """Load the size-based model tiers from the ``model_tiers`` section of the config file.
+
+    The section lists models with the largest file, in tokens, each one
+    summarizes, e.g. ``[{"model": "openai/gpt-4o-mini", "max_file_tokens": 2000}]``.
+    Larger files, chunked files and directory rollups use the configured ``model``.
+
+    Args:
+        config_path: Path to the config.json file.
+
+    Returns:
+        Tiers ordered from the smallest files up; empty if the section is
+        missing or unreadable. Entries without a model and a positive size are skipped.
+    """
+    try:
+        with open(config_path, 'r') as file:
+            entries = json.load(file).get('model_tiers') or []
+    except (IOError, OSError, json.JSONDecodeError):
+        return []
+
+    tiers = []
+    for entry in entries:
+        try:
+            tier = ModelTier(str(entry["model"]), int(entry["max_file_tokens"]))
+        except (KeyError, TypeError, ValueError):
+            tier = None
+        if tier is None or not tier.model or tier.max_file_tokens <= 0:
+            color_print.print_yellow(f"Ignoring model tier {entry} in config.json: needs a model and a positive max_file_tokens")
+            continue
+        tiers.append(tier)
+    return sorted(tiers, key=lambda tier: tier.max_file_tokens)
+
+
+def select_model(model: str, model_tiers: Sequence[ModelTier], file_tokens: int) -> str:
+    """Pick the model that summarizes a file of the given size.
+
+    Args:
+        model: Configured model, used for files larger than every tier.
+        model_tiers: Tiers ordered from the smallest files up, as from load_model_tiers().
+        file_tokens: Estimated size of the file, in tokens.
+
+    Returns:
+        The model of the first tier the file fits in, or model.
+    """
+    for tier in model_tiers:
+        if file_tokens <= tier.max_file_tokens:
+            return tier.model
+    return model
+
+
+def generate_summary(content: str, context: str, api_key: str, model: str, client: Optional[LLMClient] = None) -> Optional[str]:
     """Generate a summary using OpenRouter API.
 
     Args:
@@ -62,16 +545,19 @@ def generate_summary(content: str, context: str, api_key: str, model: str) -> Op
         context: Context description (e.g., "file: path/to/file.py").
         api_key: OpenRouter API key.
         model: Model name to use for generation.
+        client: Shared client to send the request with. If None, a temporary
+            client is created and closed after the request.
 
     Returns:
         Generated summary string if successful, None otherwise.
+
+    Raises:
+        ProviderUnavailableError: If the provider is down, so the scan stops
+            instead of dropping every remaining summary.
+        BudgetExceededError: If the client enforces a scan budget the request
+            would exceed.
     """
     try:
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
-        )
-
         prompt = f"""Generate a concise 2-3 sentence summary of the following {context}.
 Focus on the main purpose, key functionality, and important details.
 
@@ -80,18 +566,135 @@ Content:
 
 Summary:"""
 
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.3
-        )
+        if client is None:
+            with LLMClient(api_key, pool_size=1) as temporary_client:
+                return temporary_client.complete(prompt, model)
 
-        summary = response.choices[0].message.content.strip()
-        return summary
+        return client.complete(prompt, model)
 
+    except (ProviderUnavailableError, BudgetExceededError):
+        raise
     except Exception as error:
+        increment("summaries_failed")
         color_print.print_red(f"Failed to generate summary for {context}: {error}")
         return None
+
+
+def generate_batch_summary(
+    contents: Dict[str, str],
+    api_key: str,
+    model: str,
+    client: Optional[LLMClient] = None
+) -> Optional[Dict[str, str]]:
+    """Generate summaries for several small files with a single request.
+
+    The model is asked for a JSON object keyed by file path. Paths missing from
+    the response, or not answered with a non-empty string, are left out of the
+    result so the caller can summarize them individually.
+
+    Args:
+        contents: File content keyed by repository-relative path.
+        api_key: OpenRouter API key.
+        model: Model name to use for generation.
+        client: Shared client to send the request with. If None, a temporary
+            client is created and closed after the request.
+
+    Returns:
+        Summaries keyed by path, or None if the request failed or the response
+        is not a JSON object.
+
+    Raises:
+        ProviderUnavailableError: If the provider is down.
+        BudgetExceededError: If the client enforces a scan budget the request
+            would exceed.
+    """
+    sections = "\n\n".join(f"=== {path} ===\n{content}" for path, content in contents.items())
+    prompt = f"""Generate a concise 2-3 sentence summary of each of the following {len(contents)} files.
+Focus on the main purpose, key functionality, and important details.
+Each file starts with a line of the form "=== path ===".
+
+Respond with only a JSON object that maps every file path, exactly as given, to its summary.
+
+Files:
+{sections}
+
+JSON:"""
+    max_tokens = BATCH_TOKENS_PER_FILE * len(contents)
+
+    try:
+        if client is None:
+            with LLMClient(api_key, pool_size=1) as temporary_client:
+                response = temporary_client.complete(prompt, model, max_tokens=max_tokens)
+        else:
+            response = client.complete(prompt, model, max_tokens=max_tokens)
+    except (ProviderUnavailableError, BudgetExceededError):
+        raise
+    except Exception as error:
+        color_print.print_red(f"Failed to generate batched summary for {len(contents)} files: {error}")
+        return None
+
+    summaries = parse_batch_response(response)
+    if summaries is None:
+        color_print.print_yellow(f"Could not parse batched summary for {len(contents)} files")
+        return None
+    return {path: summaries[path] for path in contents if summaries.get(path)}
+
+
+def parse_batch_response(response: str) -> Optional[Dict[str, str]]:
+    """Extract the JSON object of a batched summary response.
+
+    Tolerates markdown code fences and text around the object.
+
+    Args:
+        response: Raw completion text.
+
+    Returns:
+        Stripped string values keyed by path, or None if no JSON object is found.
+    """
+    start = response.find("{")
+    end = response.rfind("}")
+    if start == -1 or end < start:
+        return None
+
+    try:
+        parsed = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(parsed, dict):
+        return None
+
+    return {
+        str(path): summary.strip()
+        for path, summary in parsed.items()
+        if isinstance(summary, str) and summary.strip()
+    }
+
+
+def _get_retry_after(error: Exception) -> Optional[float]:
+    """Read the Retry-After delay of an API error response.
+
+    Understands ``retry-after-ms``, and ``retry-after`` as seconds or an HTTP date.
+
+    Returns:
+        Seconds to wait, capped at MAX_RETRY_AFTER, or None if the response has
+        no usable header.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            seconds = float(headers["retry-after-ms"]) / 1000
+        elif headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                seconds = float(value)
+            except ValueError:
+                seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        else:
+            return None
+    except (TypeError, ValueError):
+        return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
@@ -0,0 +1,294 @@
+"""Load-balanced routing of LLM requests over several OpenAI-compatible endpoints."""
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from . import color_print
+from .llm_client import DEFAULT_MAX_RETRIES, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT, LLMClient
+from .rate_limiter import MAX_OUTAGE, CircuitBreaker, ProviderUnavailableError
+from .scan_metrics import increment
+
+
+@dataclass(frozen=True)
+class EndpointConfig:
+    """One OpenAI-compatible endpoint, with the key to use on it.
+
+    Attributes:
+        name: Name shown in logs and stats.
+        base_url: Base URL of the API.
+        api_key: API key for the endpoint.
+        weight: Share of the requests the endpoint gets relative to the others.
+        max_concurrency: Maximum number of requests in flight on the endpoint.
+        requests_per_second: Initial rate limit, or None to send unlimited
+            until the endpoint answers 429.
+    """
+
+    name: str
+    base_url: str
+    api_key: str
+    weight: float = 1.0
+    max_concurrency: int = DEFAULT_POOL_SIZE
+    requests_per_second: Optional[float] = None
+
+
+def load_endpoints(config_path: str = "config.json") -> List[EndpointConfig]:
+    """Load the endpoints to route requests over from the ``endpoints`` section of the config file.
+
+    Each entry needs a ``base_url`` and may set ``name``, ``api_key`` (the
+    top-level ``openrouter_api_key`` by default), ``weight``, ``max_concurrency``
+    and ``requests_per_second``, e.g.
+    ``[{"base_url": "https://openrouter.ai/api/v1", "api_key": "sk-...", "weight": 2}]``.
+
+    Args:
+        config_path: Path to the config.json file.
+
+    Returns:
+        The endpoints in config order; empty if the section is missing or
+        unreadable. Invalid entries are skipped.
+    """
+    try:
+        with open(config_path, 'r') as file:
+            config_data = json.load(file)
+    except (IOError, OSError, json.JSONDecodeError):
+        return []
+
+    default_api_key = config_data.get('openrouter_api_key')
+    if default_api_key == "your-api-key-here":
+        default_api_key = None
+
+    endpoints = []
+    for number, entry in enumerate(config_data.get('endpoints') or []):
+        try:
+            endpoint = EndpointConfig(
+                name=str(entry.get("name") or entry["base_url"]),
+                base_url=entry["base_url"],
+                api_key=entry.get("api_key") or default_api_key,
+                weight=float(entry.get("weight", 1.0)),
+                max_concurrency=int(entry.get("max_concurrency", DEFAULT_POOL_SIZE)),
+                requests_per_second=entry.get("requests_per_second"),
+            )
+        except (AttributeError, KeyError, TypeError, ValueError):
+            color_print.print_yellow(f"Ignoring endpoint {number} in config.json: needs a base_url and numeric limits")
+            continue
+        if not endpoint.api_key:
+            color_print.print_yellow(f"Ignoring endpoint {endpoint.name} in config.json: no API key configured")
+            continue
+        if endpoint.weight <= 0 or endpoint.max_concurrency < 1:
+            color_print.print_yellow(f"Ignoring endpoint {endpoint.name} in config.json: weight and max_concurrency must be positive")
+            continue
+        endpoints.append(endpoint)
+    return endpoints
+
+
+class _Endpoint:
+    """Client and load of one endpoint of an LLMRouter."""
+
+    def __init__(self, config: EndpointConfig, timeout: float, max_retries: int, **client_options: Any) -> None:
+        self.config = config
+        # Fail at once while the circuit is open, so requests move to another endpoint
+        self.circuit_breaker = CircuitBreaker(max_outage=0.0)
+        self.client = LLMClient(
+            config.api_key, config.base_url, config.max_concurrency, timeout, max_retries,
+            config.requests_per_second, self.circuit_breaker, **client_options
+        )
+        self.in_flight = 0
+        self.requests = 0
+        self.failovers = 0
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.in_flight < self.config.max_concurrency
+
+    def load(self) -> Tuple[float, float]:
+        """Sort key of the endpoint: least loaded relative to its weight first."""
+        return (self.in_flight / self.config.weight, self.requests / self.config.weight)
+
+
+class LLMRouter:
+    """Stand-in for LLMClient that spreads requests over several endpoints.
+
+    Each endpoint has its own LLMClient, and with it its own connection pool,
+    adaptive rate limit and circuit breaker, so one key's rate limit or one
+    provider's outage only slows down its share of the requests. Every request
+    goes to the healthy endpoint with the fewest requests in flight relative to
+    its weight, ties going to the one that has served the fewest requests
+    relative to its weight, and waits while every endpoint is at its
+    max_concurrency.
+
+    An endpoint whose circuit opens is skipped until its next probe is due;
+    the request that opened it, and any that were waiting on it, move to the
+    other endpoints. So does a request that ran out of retries on connection
+    failures or server errors, as long as there is an endpoint it has not
+    tried. Only once every endpoint has been down for max_outage seconds do
+    requests fail with ProviderUnavailableError.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[EndpointConfig],
+        timeout: float = DEFAULT_TIMEOUT,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        max_outage: float = MAX_OUTAGE,
+        first_token_timeout: Optional[float] = None,
+        hedge_percentile: Optional[float] = None
+    ) -> None:
+        """Create a client for each endpoint.
+
+        Args:
+            endpoints: Endpoints to route requests over.
+            timeout: Per-request timeout in seconds.
+            max_retries: Maximum number of retries of a failed request on one endpoint.
+            max_outage: Seconds every endpoint may be down before requests fail.
+            first_token_timeout: Stream responses and retry attempts without text
+                after this many seconds, as in LLMClient; None to not stream.
+            hedge_percentile: Latency percentile, per endpoint, after which a
+                request is sent again to the same endpoint; None to never hedge.
+
+        Raises:
+            ValueError: If there are no endpoints, an endpoint's weight or
+                max_concurrency is not positive, or an option is out of range
+                for LLMClient.
+        """
+        if not endpoints:
+            raise ValueError("at least one endpoint is required")
+        for config in endpoints:
+            if config.weight <= 0:
+                raise ValueError(f"weight of endpoint {config.name} must be positive")
+            if config.max_concurrency < 1:
+                raise ValueError(f"max_concurrency of endpoint {config.name} must be at least 1")
+
+        self.max_outage = max_outage
+        self._condition = threading.Condition()
+        self._endpoints: List[_Endpoint] = []
+        self._outage_since: Optional[float] = None
+        try:
+            for config in endpoints:
+                self._endpoints.append(_Endpoint(
+                    config, timeout, max_retries,
+                    first_token_timeout=first_token_timeout, hedge_percentile=hedge_percentile
+                ))
+        except BaseException:
+            self.close()
+            raise
+
+    def complete(self, prompt: str, model: str, max_tokens: int = 200, temperature: float = 0.3) -> str:
+        """Send a request to the least loaded healthy endpoint, moving it to another one if that endpoint goes down.
+
+        Raises:
+            ProviderUnavailableError: If every endpoint has been down for longer than max_outage.
+            openai.OpenAIError: If the request failed with a non-retryable error,
+                or still failed after max_retries retries on every endpoint.
+        """
+        from openai import APIConnectionError, APIStatusError
+
+        tried: Set[_Endpoint] = set()
+        while True:
+            endpoint = self._acquire(tried)
+            try:
+                return endpoint.client.complete(prompt, model, max_tokens, temperature)
+            except ProviderUnavailableError:
+                pass
+            except (APIConnectionError, APIStatusError) as error:
+                if isinstance(error, APIStatusError) and error.status_code < 500:
+                    raise
+                tried.add(endpoint)
+                if len(tried) == len(self._endpoints):
+                    raise
+            finally:
+                self._release(endpoint)
+
+            with self._condition:
+                endpoint.failovers += 1
+            increment("llm_failovers")
+            color_print.print_yellow(f"LLM endpoint {endpoint.config.name} is down, sending the request elsewhere")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the load and the rate limiter and circuit breaker state of every endpoint.
+
+        Returns:
+            Dictionary with an ``endpoints`` section keyed by endpoint name.
+        """
+        with self._condition:
+            loads = {
+                endpoint.config.name: {
+                    "weight": endpoint.config.weight,
+                    "max_concurrency": endpoint.config.max_concurrency,
+                    "in_flight": endpoint.in_flight,
+                    "requests": endpoint.requests,
+                    "failovers": endpoint.failovers,
+                }
+                for endpoint in self._endpoints
+            }
+        return {
+            "endpoints": {
+                endpoint.config.name: {**loads[endpoint.config.name], **endpoint.client.stats()}
+                for endpoint in self._endpoints
+            }
+        }
+
+    def _acquire(self, exclude: Set[_Endpoint]) -> _Endpoint:
+        """Block until an endpoint can take a request, and count the request against it.
+
+        A due probe of an endpoint that is down goes first, so the endpoint is
+        put back in rotation as soon as it recovers.
+
+        Args:
+            exclude: Endpoints the request already failed on; not all of them.
+
+        Raises:
+            ProviderUnavailableError: If every endpoint has been down for longer than max_outage.
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                waits = {endpoint: endpoint.circuit_breaker.seconds_until_probe() for endpoint in self._endpoints}
+                healthy = [endpoint for endpoint in self._endpoints if not endpoint.circuit_breaker.is_open]
+                if healthy:
+                    self._outage_since = None
+                elif self._outage_since is None:
+                    self._outage_since = now
+                elif now - self._outage_since >= self.max_outage:
+                    raise ProviderUnavailableError(
+                        f"Every LLM endpoint has been failing for {now - self._outage_since:.0f} seconds"
+                    )
+
+                available = [
+                    endpoint for endpoint in self._endpoints
+                    if endpoint not in exclude and endpoint.has_capacity and waits[endpoint] == 0
+                ]
+                probes = [endpoint for endpoint in available if endpoint.circuit_breaker.is_open]
+                candidates = probes or [endpoint for endpoint in available if endpoint in healthy]
+                if candidates:
+                    endpoint = min(candidates, key=_Endpoint.load)
+                    endpoint.in_flight += 1
+                    endpoint.requests += 1
+                    return endpoint
+
+                # Wake up for the next probe that is due, or when a request finishes
+                timeout = min(
+                    (wait for endpoint, wait in waits.items() if 0 < wait < float("inf") and endpoint.has_capacity),
+                    default=None
+                )
+                if not healthy:
+                    remaining = self._outage_since + self.max_outage - now
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                self._condition.wait(timeout)
+
+    def _release(self, endpoint: _Endpoint) -> None:
+        with self._condition:
+            endpoint.in_flight -= 1
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """Close the client of every endpoint."""
+        for endpoint in self._endpoints:
+            endpoint.client.close()
+
+    def __enter__(self) -> "LLMRouter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
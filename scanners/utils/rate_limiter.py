@@ -0,0 +1,355 @@
+"""Client-side rate limiting, retry backoff and circuit breaking for LLM requests."""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from . import color_print
+
+
+# Rate limit applied after a decrease is this fraction of the request rate that triggered it
+RATE_DECREASE_FACTOR = 0.5
+# The rate is only lowered once at least this share of the requests answered within
+# RATE_WINDOW, and THROTTLED_MIN_COUNT of them, were 429s
+THROTTLED_SHARE = 0.2
+THROTTLED_MIN_COUNT = 3
+# While the 429 share stays below THROTTLED_SHARE, a reduced rate grows back by this
+# fraction of the rate it was reduced from per second
+RATE_RECOVERY_STEP = 0.1
+MIN_REQUESTS_PER_SECOND = 1.0
+# Minimum seconds between two rate decreases
+DECREASE_INTERVAL = 2.0
+# Seconds of request starts and outcomes used to measure the request rate and 429 share
+RATE_WINDOW = 5.0
+
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 5.0
+MAX_RESET_TIMEOUT = 120.0
+MAX_OUTAGE = 600.0
+
+
+class ProviderUnavailableError(Exception):
+    """Raised when the LLM provider has kept failing for longer than the circuit breaker waits."""
+
+
+def backoff_delay(attempt: int, base: float = BASE_BACKOFF, maximum: float = MAX_BACKOFF) -> float:
+    """Get a retry delay with exponential backoff and full jitter.
+
+    Args:
+        attempt: Number of the retry, starting at 0.
+        base: Upper bound of the first delay, in seconds.
+        maximum: Cap on the upper bound, in seconds.
+
+    Returns:
+        A delay drawn uniformly between 0 and min(maximum, base * 2 ** attempt).
+    """
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by every worker, paced by the provider's 429 responses.
+
+    Requests are not limited until the provider rejects a significant share
+    of them: at least THROTTLED_SHARE of the requests answered in the last
+    RATE_WINDOW seconds, and THROTTLED_MIN_COUNT of them. The rate then drops
+    to RATE_DECREASE_FACTOR of the rate that was being sent. While the share of
+    429s stays below THROTTLED_SHARE, it grows back every second by
+    RATE_RECOVERY_STEP of the rate it was lowered from, so the request rate
+    settles around the provider's limit. An isolated 429 only delays its own
+    retry, by its Retry-After value if it has one. While 429s are frequent, a
+    Retry-After value pauses all workers until it has elapsed.
+    The rate is lowered at most once every DECREASE_INTERVAL seconds, and not
+    for 429s to requests sent before the last decrease, so a burst of
+    rejections only lowers it once.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        min_requests_per_second: float = MIN_REQUESTS_PER_SECOND
+    ) -> None:
+        """Create the limiter.
+
+        Args:
+            requests_per_second: Initial rate limit, or None to start unlimited.
+            min_requests_per_second: Lowest rate 429s can reduce the limit to.
+
+        Raises:
+            ValueError: If a rate is not positive.
+        """
+        if requests_per_second is not None and requests_per_second <= 0:
+            raise ValueError("requests_per_second must be positive")
+        if min_requests_per_second <= 0:
+            raise ValueError("min_requests_per_second must be positive")
+
+        self.rate = requests_per_second
+        self.min_rate = min_requests_per_second
+        self._condition = threading.Condition()
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._last_increase = self._last_refill
+        self._recovery_step = (requests_per_second or 0.0) * RATE_RECOVERY_STEP
+        self._recent_starts: Deque[float] = deque()
+        # (time, whether it was a 429) of the requests answered within RATE_WINDOW
+        self._recent_outcomes: Deque[Tuple[float, bool]] = deque()
+        self._recent_throttled = 0
+        self._throttled = 0
+
+    def acquire(self) -> float:
+        """Block until a request may be sent.
+
+        Returns:
+            Monotonic time the request was let through, to pass to throttle().
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.rate is None:
+                        break
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    wait = (1 - self._tokens) / self.rate
+                self._condition.wait(wait)
+
+            self._recent_starts.append(now)
+            while self._recent_starts[0] < now - RATE_WINDOW:
+                self._recent_starts.popleft()
+            return now
+
+    def throttle(self, sent_at: float, retry_after: Optional[float] = None) -> bool:
+        """Slow down after the provider rejected a request with 429.
+
+        Args:
+            sent_at: Value acquire() returned for the rejected request.
+            retry_after: Seconds the provider asked to wait, if any.
+
+        Returns:
+            True if every worker is paused for retry_after, False if only the
+            rejected request should wait before its retry.
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._throttled += 1
+            self._record_outcome(now, throttled=True)
+            if (
+                sent_at >= self._last_decrease
+                and now - self._last_decrease >= DECREASE_INTERVAL
+                and self._is_throttled_often()
+            ):
+                current = self._measured_rate(now)
+                if self.rate is not None:
+                    current = min(current, self.rate)
+                self.rate = max(self.min_rate, current * RATE_DECREASE_FACTOR)
+                self._recovery_step = current * RATE_RECOVERY_STEP
+                self._tokens = 0.0
+                self._last_refill = now
+                self._last_decrease = now
+                self._last_increase = now
+            if not retry_after or not self._is_throttled_often():
+                return False
+            self._paused_until = max(self._paused_until, now + retry_after)
+            return True
+
+    def record_success(self) -> None:
+        """Let the rate grow back after a request succeeded."""
+        with self._condition:
+            now = time.monotonic()
+            self._record_outcome(now, throttled=False)
+            if self.rate is not None and not self._is_throttled_often():
+                elapsed = min(now - self._last_increase, 1.0)
+                self.rate += self._recovery_step * elapsed
+            self._last_increase = now
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the current limit and the number of 429s seen.
+
+        Returns:
+            Dictionary with the rate limit in requests per second (None while
+            unlimited), the seconds left of a Retry-After pause and the 429 count.
+        """
+        with self._condition:
+            return {
+                "requests_per_second": self.rate,
+                "paused_seconds": max(0.0, self._paused_until - time.monotonic()),
+                "rate_limited": self._throttled,
+            }
+
+    def _refill(self, now: float) -> None:
+        # Allow a burst of up to one second of requests
+        self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _record_outcome(self, now: float, throttled: bool) -> None:
+        self._recent_outcomes.append((now, throttled))
+        self._recent_throttled += throttled
+        while self._recent_outcomes[0][0] < now - RATE_WINDOW:
+            self._recent_throttled -= self._recent_outcomes.popleft()[1]
+
+    def _is_throttled_often(self) -> bool:
+        return (
+            self._recent_throttled >= THROTTLED_MIN_COUNT
+            and self._recent_throttled >= THROTTLED_SHARE * len(self._recent_outcomes)
+        )
+
+    def _measured_rate(self, now: float) -> float:
+        if not self._recent_starts:
+            return self.min_rate
+        window = min(RATE_WINDOW, max(now - self._recent_starts[0], 1.0))
+        return len(self._recent_starts) / window
+
+
+class CircuitBreaker:
+    """Pauses every worker while the provider is down, instead of failing each request.
+
+    After ``failure_threshold`` consecutive server errors, timeouts or connection
+    failures the circuit opens and before_request() blocks. Once the reset
+    timeout has passed, one request is let through as a probe: if it succeeds the
+    circuit closes and the waiting workers resume; if it fails the circuit stays
+    open and the reset timeout doubles. When the circuit has been open for
+    ``max_outage`` seconds, waiting requests give up with ProviderUnavailableError,
+    and later ones do too unless they get to send a probe.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        max_reset_timeout: float = MAX_RESET_TIMEOUT,
+        max_outage: float = MAX_OUTAGE
+    ) -> None:
+        """Create a closed circuit breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit.
+            reset_timeout: Seconds before the first probe of an open circuit.
+            max_reset_timeout: Cap on the reset timeout as probes keep failing.
+            max_outage: Seconds the circuit may stay open before waiting requests fail.
+
+        Raises:
+            ValueError: If failure_threshold is less than 1.
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.max_outage = max_outage
+        self._condition = threading.Condition()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_at = 0.0
+        self._cooldown = reset_timeout
+        self._probe_in_flight = False
+        self._times_opened = 0
+
+    @property
+    def is_open(self) -> bool:
+        """Whether requests are currently held back."""
+        with self._condition:
+            return self._opened_at is not None
+
+    def seconds_until_probe(self) -> float:
+        """Get how long before_request() would hold a request back.
+
+        Returns:
+            0 while the circuit is closed or a probe is due, the seconds until
+            the next probe while it is open, or infinity while a probe is in flight.
+        """
+        with self._condition:
+            if self._opened_at is None:
+                return 0.0
+            if self._probe_in_flight:
+                return float("inf")
+            return max(0.0, self._probe_at - time.monotonic())
+
+    def before_request(self) -> bool:
+        """Block while the circuit is open.
+
+        Returns:
+            True if the request is the probe of an open circuit. Its outcome must
+            be reported with record_success() or record_failure() with probe=True.
+
+        Raises:
+            ProviderUnavailableError: If the circuit has been open for longer than max_outage.
+        """
+        with self._condition:
+            while self._opened_at is not None:
+                now = time.monotonic()
+                if not self._probe_in_flight and now >= self._probe_at:
+                    self._probe_in_flight = True
+                    return True
+                give_up_at = self._opened_at + self.max_outage
+                if now >= give_up_at:
+                    raise ProviderUnavailableError(
+                        f"LLM provider has been failing for {now - self._opened_at:.0f} seconds"
+                    )
+                wait_until = give_up_at if self._probe_in_flight else min(self._probe_at, give_up_at)
+                self._condition.wait(wait_until - now)
+            return False
+
+    def record_success(self, probe: bool = False) -> None:
+        """Record that the provider answered, which closes an open circuit.
+
+        Args:
+            probe: Whether the request was the probe returned by before_request().
+        """
+        with self._condition:
+            self._failures = 0
+            if probe:
+                self._probe_in_flight = False
+            if self._opened_at is not None:
+                color_print.print_green(
+                    f"LLM provider recovered after {time.monotonic() - self._opened_at:.0f} seconds, resuming requests"
+                )
+                self._opened_at = None
+                self._cooldown = self.reset_timeout
+                self._condition.notify_all()
+
+    def record_failure(self, probe: bool = False) -> None:
+        """Record a server error, timeout or connection failure.
+
+        Args:
+            probe: Whether the request was the probe returned by before_request().
+        """
+        with self._condition:
+            self._failures += 1
+            now = time.monotonic()
+            if probe:
+                self._probe_in_flight = False
+                self._cooldown = min(self._cooldown * 2, self.max_reset_timeout)
+                self._probe_at = now + self._cooldown
+                self._condition.notify_all()
+            elif self._opened_at is None and self._failures >= self.failure_threshold:
+                self._opened_at = now
+                self._probe_at = now + self._cooldown
+                self._times_opened += 1
+                color_print.print_yellow(
+                    f"LLM provider failed {self._failures} requests in a row, pausing requests for {self._cooldown:g} seconds"
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the state of the circuit.
+
+        Returns:
+            Dictionary with the state ("closed" or "open"), consecutive failures,
+            seconds the circuit has been open and how often it opened.
+        """
+        with self._condition:
+            return {
+                "state": "closed" if self._opened_at is None else "open",
+                "consecutive_failures": self._failures,
+                "open_seconds": time.monotonic() - self._opened_at if self._opened_at is not None else 0.0,
+                "times_opened": self._times_opened,
+            }
@@ -0,0 +1,234 @@
+"""Dependency-aware bottom-up scheduler for directory rollup summaries."""
+
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class _DirectoryNode:
+    """Rollup state of one directory while its inputs are outstanding."""
+
+    def __init__(self, path: str, parent: Optional[str], child_paths: List[str], file_count: int) -> None:
+        self.path = path
+        self.parent = parent
+        self.pending = file_count + len(child_paths)
+        self.file_summaries: List[Optional[str]] = [None] * file_count
+        self.child_summaries: Dict[str, Optional[str]] = dict.fromkeys(child_paths)
+
+
+class RollupScheduler:
+    """Roll up each directory as soon as its own files and direct children finish.
+
+    Directories are registered top-down while the tree is walked. A directory's
+    rollup is submitted to the executor the moment its last file summary or child
+    rollup completes, so sibling directories roll up in parallel and rollups
+    overlap with file summarization elsewhere in the tree. Child summaries are
+    handed to the parent in memory, and a directory's state is dropped once its
+    parent has received its summary.
+
+    Each rollup receives the directory's file summaries in file order followed by
+    its direct children's rollups in walk order, so the result is deterministic
+    regardless of completion order.
+
+    Once a file summary or rollup has raised, no further rollups are submitted,
+    so a stopping scan never stores a rollup built from incomplete inputs.
+
+    With max_pending set, submit_file() and submit_batch() block while that many
+    file tasks are queued or running. The walk then advances only as fast as
+    files are summarized, so queued tasks and the state of open directories
+    stay bounded however large the repository is.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        rollup: Callable[[str, List[str]], Optional[str]],
+        max_pending: Optional[int] = None
+    ) -> None:
+        """Initialize the scheduler.
+
+        Args:
+            executor: Executor running file summaries and rollups.
+            rollup: Called with a directory path and its non-empty input summaries;
+                returns the directory's summary or None.
+            max_pending: Maximum number of file tasks submitted but not finished,
+                or None for no limit. Rollups are never held back.
+
+        Raises:
+            ValueError: If max_pending is less than 1.
+        """
+        if max_pending is not None and max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+
+        self._executor = executor
+        self._rollup = rollup
+        self._pending_slots = threading.BoundedSemaphore(max_pending) if max_pending else None
+        self._lock = threading.Lock()
+        self._nodes: Dict[str, _DirectoryNode] = {}
+        self._root_summary: Optional[str] = None
+        self._root_done = threading.Event()
+        self._errors: List[BaseException] = []
+
+    def add_directory(self, path: str, parent: Optional[str], child_paths: List[str], file_count: int) -> None:
+        """Register a directory whose files and children are still to be summarized.
+
+        Must be called before any of the directory's files are submitted and
+        before any of its children are registered.
+
+        Args:
+            path: Directory path.
+            parent: Parent directory path, or None for the root.
+            child_paths: Paths of the direct subdirectories that will be registered.
+            file_count: Number of files that will be submitted with submit_file().
+        """
+        node = _DirectoryNode(path, parent, child_paths, file_count)
+        with self._lock:
+            self._nodes[path] = node
+            ready = node.pending == 0
+
+        if ready:
+            self._schedule_rollup(node)
+
+    def add_completed_directory(self, path: str, parent: Optional[str], summary: Optional[str]) -> None:
+        """Register a directory whose rollup is already known, e.g. from a previous scan.
+
+        Args:
+            path: Directory path.
+            parent: Parent directory path, or None for the root.
+            summary: The directory's existing summary.
+        """
+        self._complete(path, parent, summary)
+
+    def add_completed_file(self, directory: str, index: int, summary: Optional[str]) -> None:
+        """Feed a file summary that is already known, e.g. from an interrupted scan, to its directory.
+
+        Args:
+            directory: Registered directory containing the file.
+            index: Position of the file within the directory, as for submit_file().
+            summary: The file's existing summary.
+        """
+        self._file_done(directory, index, summary)
+
+    def submit_file(self, directory: str, index: int, function: Callable[..., Optional[str]], *args: Any) -> Future:
+        """Summarize a file on the executor and feed the result to its directory.
+
+        Args:
+            directory: Registered directory containing the file.
+            index: Position of the file within the directory, from 0 to file_count - 1.
+            function: Callable returning the file summary or None.
+            *args: Arguments for function.
+
+        Returns:
+            Future of the file summary.
+        """
+        return self._submit_task(
+            lambda done: self._file_done(directory, index, self._result_of(done)), function, *args
+        )
+
+    def submit_batch(
+        self,
+        files: List[Tuple[str, int]],
+        function: Callable[..., List[Optional[str]]],
+        *args: Any
+    ) -> Future:
+        """Summarize several files with one executor task and feed each result to its directory.
+
+        The files may belong to different registered directories.
+
+        Args:
+            files: (directory, index) of each file, as for submit_file().
+            function: Callable returning one summary or None per file, in order.
+            *args: Arguments for function.
+
+        Returns:
+            Future of the list of file summaries.
+        """
+        return self._submit_task(lambda done: self._batch_done(files, done), function, *args)
+
+    def wait(self) -> Optional[str]:
+        """Block until the root directory has been rolled up.
+
+        Returns:
+            The root directory's summary, or None if it has none.
+
+        Raises:
+            BaseException: The first error raised by a file summary or rollup.
+        """
+        self._root_done.wait()
+        if self._errors:
+            raise self._errors[0]
+        return self._root_summary
+
+    def _submit_task(self, on_done: Callable[[Future], None], function: Callable[..., Any], *args: Any) -> Future:
+        """Submit a file task once a pending slot is free, and free it when the task finishes."""
+        if self._pending_slots is None:
+            future = self._executor.submit(function, *args)
+            future.add_done_callback(on_done)
+            return future
+
+        self._pending_slots.acquire()
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._pending_slots.release()
+            raise
+
+        def task_done(done: Future) -> None:
+            self._pending_slots.release()
+            on_done(done)
+
+        future.add_done_callback(task_done)
+        return future
+
+    def _batch_done(self, files: List[Tuple[str, int]], future: Future) -> None:
+        summaries = self._result_of(future) or [None] * len(files)
+        for (directory, index), summary in zip(files, summaries):
+            self._file_done(directory, index, summary)
+
+    def _file_done(self, directory: str, index: int, summary: Optional[str]) -> None:
+        with self._lock:
+            node = self._nodes[directory]
+            node.file_summaries[index] = summary
+            node.pending -= 1
+            ready = node.pending == 0
+
+        if ready:
+            self._schedule_rollup(node)
+
+    def _schedule_rollup(self, node: _DirectoryNode) -> None:
+        inputs = [summary for summary in node.file_summaries if summary]
+        inputs += [summary for summary in node.child_summaries.values() if summary]
+        with self._lock:
+            failed = bool(self._errors)
+        # Once a task has raised, the scan is stopping and its inputs may be incomplete
+        if not inputs or failed:
+            self._complete(node.path, node.parent, None)
+            return
+
+        future = self._executor.submit(self._rollup, node.path, inputs)
+        future.add_done_callback(lambda done: self._complete(node.path, node.parent, self._result_of(done)))
+
+    def _complete(self, path: str, parent: Optional[str], summary: Optional[str]) -> None:
+        parent_node = None
+        with self._lock:
+            self._nodes.pop(path, None)
+            if parent is not None:
+                parent_node = self._nodes[parent]
+                parent_node.child_summaries[path] = summary
+                parent_node.pending -= 1
+                if parent_node.pending != 0:
+                    parent_node = None
+
+        if parent is None:
+            self._root_summary = summary
+            self._root_done.set()
+        elif parent_node is not None:
+            self._schedule_rollup(parent_node)
+
+    def _result_of(self, future: Future) -> Any:
+        error = future.exception()
+        if error is None:
+            return future.result()
+        with self._lock:
+            self._errors.append(error)
+        return None
@@ -0,0 +1,178 @@
+"""Model pricing and hard token or cost budgets for a scan."""
+
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from . import color_print
+from .chunked_summary import estimate_tokens
+from .llm_client import BudgetExceededError
+from .scan_metrics import ScanMetrics
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """Price of a model, in US dollars per million tokens.
+
+    Attributes:
+        prompt: Price of a million prompt tokens.
+        completion: Price of a million completion tokens.
+    """
+
+    prompt: float
+    completion: float
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """Get the price of the given token counts, in US dollars."""
+        return (prompt_tokens * self.prompt + completion_tokens * self.completion) / 1_000_000
+
+
+def load_pricing(config_path: str = "config.json") -> Dict[str, ModelPrice]:
+    """Load model prices from the ``pricing`` section of the config file.
+
+    The section maps model names to their ``prompt`` and ``completion`` prices
+    in US dollars per million tokens, e.g.
+    ``{"openai/gpt-4o-mini": {"prompt": 0.15, "completion": 0.6}}``.
+
+    Args:
+        config_path: Path to the config.json file.
+
+    Returns:
+        Price per model name; empty if the section is missing or unreadable.
+        Entries without both prices are skipped.
+    """
+    try:
+        with open(config_path, 'r') as file:
+            pricing = json.load(file).get('pricing') or {}
+    except (IOError, OSError, json.JSONDecodeError):
+        return {}
+
+    prices = {}
+    for model, price in pricing.items():
+        try:
+            prices[model] = ModelPrice(float(price["prompt"]), float(price["completion"]))
+        except (KeyError, TypeError, ValueError):
+            color_print.print_yellow(f"Ignoring pricing of {model} in config.json: needs numeric prompt and completion prices")
+    return prices
+
+
+class ScanBudget:
+    """Hard cap on the tokens, or the cost, a scan may spend.
+
+    Spending is read from the scan's ScanMetrics, which adds up the usage the
+    provider reports for completed requests. Requests still in flight are not
+    counted there yet, so each request reserves its estimated prompt tokens and
+    its max_tokens until it completes, and a request is refused if what was
+    spent plus every reservation would go over the budget.
+    """
+
+    def __init__(
+        self,
+        metrics: ScanMetrics,
+        max_tokens: Optional[int] = None,
+        max_cost: Optional[float] = None,
+        price: Optional[ModelPrice] = None
+    ) -> None:
+        """Create the budget.
+
+        Args:
+            metrics: Metrics of the scan the budget applies to.
+            max_tokens: Maximum prompt plus completion tokens, or None for no cap.
+            max_cost: Maximum cost in US dollars, or None for no cap.
+            price: Price of the model the scan uses; required for max_cost.
+
+        Raises:
+            ValueError: If a cap is not positive, or max_cost is set without a price.
+        """
+        if max_tokens is not None and max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        if max_cost is not None and max_cost <= 0:
+            raise ValueError("max_cost must be positive")
+        if max_cost is not None and price is None:
+            raise ValueError("a cost budget needs the model's price in the pricing section of config.json")
+
+        self.metrics = metrics
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.price = price
+        self._lock = threading.Lock()
+        self._reserved_prompt = 0
+        self._reserved_completion = 0
+
+    def reserve(self, prompt_tokens: int, completion_tokens: int) -> None:
+        """Reserve room for a request, or refuse it.
+
+        Args:
+            prompt_tokens: Estimated prompt tokens of the request.
+            completion_tokens: Most completion tokens the request may use.
+
+        Raises:
+            BudgetExceededError: If the request could take the scan over its budget.
+        """
+        spent_prompt, spent_completion = self.metrics.token_usage()
+        with self._lock:
+            prompt = spent_prompt + self._reserved_prompt + prompt_tokens
+            completion = spent_completion + self._reserved_completion + completion_tokens
+            if self.max_tokens is not None and prompt + completion > self.max_tokens:
+                raise BudgetExceededError(
+                    f"token budget of {self.max_tokens:,} reached "
+                    f"({spent_prompt + spent_completion:,} tokens used)"
+                )
+            if self.max_cost is not None and self.price.cost(prompt, completion) > self.max_cost:
+                raise BudgetExceededError(
+                    f"cost budget of ${self.max_cost:,.4g} reached "
+                    f"(${self.price.cost(spent_prompt, spent_completion):,.4g} spent)"
+                )
+            self._reserved_prompt += prompt_tokens
+            self._reserved_completion += completion_tokens
+
+    def release(self, prompt_tokens: int, completion_tokens: int) -> None:
+        """Give back the reservation of a completed or failed request.
+
+        Args:
+            prompt_tokens: Prompt tokens passed to reserve().
+            completion_tokens: Completion tokens passed to reserve().
+        """
+        with self._lock:
+            self._reserved_prompt -= prompt_tokens
+            self._reserved_completion -= completion_tokens
+
+
+class BudgetedClient:
+    """Stand-in for LLMClient that checks a ScanBudget before every request.
+
+    Closing it leaves the wrapped client open.
+    """
+
+    def __init__(self, client: Any, budget: ScanBudget) -> None:
+        """Wrap a client.
+
+        Args:
+            client: LLMClient, or a stand-in such as FairShareClient, to send requests with.
+            budget: Budget every request is checked against.
+        """
+        self._client = client
+        self.budget = budget
+
+    def complete(self, prompt: str, model: str, max_tokens: int = 200, temperature: float = 0.3) -> str:
+        """Send a request with the wrapped client if it fits in the budget.
+
+        Raises:
+            BudgetExceededError: If the request could take the scan over its budget.
+        """
+        prompt_tokens = estimate_tokens(len(prompt))
+        self.budget.reserve(prompt_tokens, max_tokens)
+        try:
+            return self._client.complete(prompt, model, max_tokens, temperature)
+        finally:
+            self.budget.release(prompt_tokens, max_tokens)
+
+    def close(self) -> None:
+        """Do nothing; the wrapped client is closed by its owner."""
+
+    def __enter__(self) -> "BudgetedClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,319 @@
+"""Write-ahead scan journal that lets an interrupted scan resume where it stopped."""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import color_print
+from .summary_store import DIRECTORY_SUMMARY, FILE_SUMMARY
+
+
+JOURNAL_FILENAME = "_scan_journal.jsonl"
+JOURNAL_VERSION = 1
+
+
+@dataclass
+class DirectoryPlan:
+    """The work planned for one directory of a scan.
+
+    Attributes:
+        path: Repository-relative path of the directory, '.' for the root.
+        parent: Repository-relative path of the parent directory, None for the root.
+        children: Repository-relative paths of the subdirectories to summarize, in walk order.
+        files: Name and size in bytes (None if not measured) of each text file
+            to summarize, in walk order.
+        reuse: Whether the directory keeps its existing rollup, and with it its
+            whole subtree, instead of being summarized.
+    """
+
+    path: str
+    parent: Optional[str]
+    children: List[str] = field(default_factory=list)
+    files: List[Tuple[str, Optional[int]]] = field(default_factory=list)
+    reuse: bool = False
+
+
+class ScanJournal:
+    """Append-only record of a scan's work plan and of the summaries completed so far.
+
+    The journal is a JSON-lines file in scanner_metadata. A header names the
+    commit being scanned. It is followed by one record per directory to
+    summarize, written as the walk reaches it, and a marker once the walk is
+    complete. One record is added for each file or directory summary as soon
+    as it is stored, so while the walk runs these records are interleaved with
+    the plan.
+
+    Only a journal whose plan is marked complete is resumed. A resumed scan
+    reads the plan back instead of walking the tree, and looks
+    up only the summaries the journal marks as done. Summaries are stored
+    before they are recorded, so a crash in between at worst makes the resumed
+    scan find the summary in the store. A record torn by a crash is dropped
+    when the journal is reopened.
+    """
+
+    def __init__(self, journal_path: str, commit: Optional[str], file: IO[str]) -> None:
+        """Wrap an open journal file; use start() or resume() instead.
+
+        Args:
+            journal_path: Path of the journal file.
+            commit: Commit the scan covers.
+            file: The journal opened for appending.
+        """
+        self.journal_path = journal_path
+        self.commit = commit
+        self.planned = False
+        # Files to summarize in the recorded plan, None if it does not say
+        self.planned_files: Optional[int] = None
+        self._file: Optional[IO[str]] = file
+        self._lock = threading.Lock()
+        self._done = {FILE_SUMMARY: set(), DIRECTORY_SUMMARY: set()}
+
+    @classmethod
+    def start(cls, metadata_dir: str, commit: Optional[str]) -> Optional["ScanJournal"]:
+        """Begin a new journal, replacing the one of any earlier scan.
+
+        Args:
+            metadata_dir: Base directory for scanner_metadata.
+            commit: Commit the scan covers.
+
+        Returns:
+            The journal, or None if it cannot be written, in which case the scan
+            runs without being resumable.
+        """
+        journal_path = os.path.join(metadata_dir, JOURNAL_FILENAME)
+        try:
+            os.makedirs(metadata_dir, exist_ok=True)
+            file = open(journal_path, 'w')
+        except (IOError, OSError) as error:
+            color_print.print_yellow(f"Cannot write scan journal {journal_path}, the scan will not be resumable: {error}")
+            return None
+
+        journal = cls(journal_path, commit, file)
+        journal._append({"journal": JOURNAL_VERSION, "commit": commit})
+        return journal
+
+    @classmethod
+    def resume(cls, metadata_dir: str, commit: str) -> Optional["ScanJournal"]:
+        """Reopen the journal of an interrupted scan of the same commit.
+
+        Args:
+            metadata_dir: Base directory for scanner_metadata.
+            commit: Commit the scan covers now.
+
+        Returns:
+            The journal with its completed summaries loaded, or None if there is
+            no journal, it belongs to another commit or its plan was never finished.
+        """
+        journal_path = os.path.join(metadata_dir, JOURNAL_FILENAME)
+        try:
+            with open(journal_path, 'rb') as file:
+                records, valid_size = _read_records(file)
+        except FileNotFoundError:
+            return None
+        except (IOError, OSError) as error:
+            color_print.print_yellow(f"Cannot read scan journal {journal_path}: {error}")
+            return None
+
+        header = records[0] if records else {}
+        if header.get("journal") != JOURNAL_VERSION or header.get("commit") != commit:
+            color_print.print_yellow(f"Scan journal {journal_path} is not for commit {commit[:12]}; starting over")
+            return None
+
+        done = {FILE_SUMMARY: set(), DIRECTORY_SUMMARY: set()}
+        planned = False
+        planned_files = None
+        for record in records[1:]:
+            if "done" in record:
+                done[record["done"]].add(record["path"])
+            elif "planned" in record:
+                planned = True
+                planned_files = record.get("files")
+        if not planned:
+            color_print.print_yellow(f"Scan journal {journal_path} has no complete plan; starting over")
+            return None
+
+        try:
+            file = open(journal_path, 'r+')
+            file.truncate(valid_size)
+            file.seek(valid_size)
+        except (IOError, OSError) as error:
+            color_print.print_yellow(f"Cannot reopen scan journal {journal_path}: {error}")
+            return None
+
+        journal = cls(journal_path, commit, file)
+        journal.planned = True
+        journal.planned_files = planned_files
+        journal._done = done
+        return journal
+
+    def record_plan(self, plans: Iterable[DirectoryPlan]) -> Iterator[DirectoryPlan]:
+        """Record the work plan as it is produced, then mark it complete.
+
+        Each directory is recorded before it is passed on, so the scan can
+        summarize its files while the rest of the tree is still being walked.
+        The plan is marked complete once the plans run out. If the journal
+        cannot be written, the plans are still passed on and planned stays False.
+
+        Args:
+            plans: Directories to summarize, parents before their children.
+
+        Yields:
+            The same directories, each once it is recorded.
+        """
+        count = 0
+        file_count = 0
+        for plan in plans:
+            self._append({
+                "directory": plan.path,
+                "parent": plan.parent,
+                "children": plan.children,
+                "files": plan.files,
+                "reuse": plan.reuse,
+            }, flush=False)
+            count += 1
+            file_count += len(plan.files)
+            yield plan
+        self._append({"planned": count, "files": file_count}, sync=True)
+        self.planned = self._file is not None
+        self.planned_files = file_count
+
+    def read_plan(self) -> Iterator[DirectoryPlan]:
+        """Read the recorded plan back, one directory at a time.
+
+        Yields:
+            The planned directories in the order they were recorded.
+        """
+        with open(self.journal_path, 'r') as file:
+            for line in file:
+                record = json.loads(line)
+                if "planned" in record:
+                    return
+                if "directory" in record:
+                    yield DirectoryPlan(
+                        record["directory"], record["parent"], record["children"],
+                        [(name, size) for name, size in record["files"]], record["reuse"]
+                    )
+
+    def is_done(self, kind: str, relative_path: str) -> bool:
+        """Check whether a summary was completed before the scan was resumed.
+
+        Args:
+            kind: FILE_SUMMARY or DIRECTORY_SUMMARY.
+            relative_path: Path relative to the repository root, as planned.
+
+        Returns:
+            True if the journal records the summary as stored.
+        """
+        return relative_path in self._done[kind]
+
+    @property
+    def done_count(self) -> int:
+        """Number of summaries completed before the scan was resumed."""
+        return len(self._done[FILE_SUMMARY]) + len(self._done[DIRECTORY_SUMMARY])
+
+    def record_done(self, kind: str, relative_path: str) -> None:
+        """Record that a summary has been stored.
+
+        Args:
+            kind: FILE_SUMMARY or DIRECTORY_SUMMARY.
+            relative_path: Path relative to the repository root, as planned.
+        """
+        self._append({"done": kind, "path": relative_path})
+
+    def finish(self) -> None:
+        """Delete the journal of a completed scan."""
+        self.close()
+        try:
+            os.remove(self.journal_path)
+        except FileNotFoundError:
+            pass
+        except OSError as error:
+            color_print.print_red(f"Failed to delete scan journal {self.journal_path}: {error}")
+
+    def close(self) -> None:
+        """Close the journal, keeping it for a later resume."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self) -> "ScanJournal":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _append(self, record: dict, flush: bool = True, sync: bool = False) -> None:
+        """Append a record, giving up on the journal if it cannot be written."""
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._file.write(json.dumps(record) + "\n")
+                if flush or sync:
+                    self._file.flush()
+                if sync:
+                    os.fsync(self._file.fileno())
+            except (IOError, OSError) as error:
+                color_print.print_red(f"Failed to write scan journal {self.journal_path}, the scan will not be resumable: {error}")
+                self._file.close()
+                self._file = None
+
+
+def read_journal_progress(metadata_dir: str) -> Optional[Dict[str, Any]]:
+    """Read how far an unfinished scan got, without opening its journal for writing.
+
+    Args:
+        metadata_dir: scanner_metadata directory of the scanned repository.
+
+    Returns:
+        Dictionary with the ``commit`` being scanned, whether its plan is
+        complete (``planned``), the ``files_planned`` if known and the file and
+        directory summaries done, or None if there is no readable journal,
+        that is if no scan is running or was interrupted.
+    """
+    try:
+        with open(os.path.join(metadata_dir, JOURNAL_FILENAME), 'rb') as file:
+            records, _ = _read_records(file)
+    except (IOError, OSError):
+        return None
+    if not records or records[0].get("journal") != JOURNAL_VERSION:
+        return None
+
+    progress = {
+        "commit": records[0].get("commit"),
+        "planned": False,
+        "files_planned": None,
+        "files_done": 0,
+        "directories_done": 0,
+    }
+    for record in records[1:]:
+        if record.get("done") == FILE_SUMMARY:
+            progress["files_done"] += 1
+        elif record.get("done") == DIRECTORY_SUMMARY:
+            progress["directories_done"] += 1
+        elif "planned" in record:
+            progress["planned"] = True
+            progress["files_planned"] = record.get("files")
+    return progress
+
+
+def _read_records(file: IO[bytes]) -> Tuple[List[dict], int]:
+    """Parse journal records up to the first incomplete or corrupt line.
+
+    Returns:
+        The records, and the size in bytes of the intact part of the file.
+    """
+    records = []
+    valid_size = 0
+    for line in file:
+        if not line.endswith(b"\n"):
+            break
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            break
+        valid_size += len(line)
+    return records, valid_size
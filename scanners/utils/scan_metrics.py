@@ -0,0 +1,439 @@
+"""Scan instrumentation: phase timers, LLM latency and token accounting, reports and profiling."""
+
+import cProfile
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from . import color_print
+from .file_utils import write_file_atomic
+
+
+T = TypeVar("T")
+
+# Phases recorded by the scanner, in pipeline order
+PHASES = ("clone", "walk", "filter", "read", "llm", "write", "index", "rollup")
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+
+SCAN_REPORT_FILENAME = "_scan_report.json"
+PROFILE_FILENAME = "_scan_profile.prof"
+MEMORY_PROFILE_FILENAME = "_scan_memory.txt"
+_MEMORY_PROFILE_TOP = 30
+
+
+class ScanMetrics:
+    """Thread-safe accumulator of everything measured during one scan.
+
+    Phases are timed in every worker thread and summed, so with concurrency
+    the per-phase totals can exceed the wall-clock time of the scan, and
+    phases may overlap (``rollup`` includes the ``llm`` time of rollup
+    requests).
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._seconds: Dict[str, float] = defaultdict(float)
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._llm_latencies: List[float] = []
+        self._llm_failures = 0
+        self._prompt_tokens = 0
+        self._completion_tokens = 0
+        self._sections: Dict[str, Any] = {}
+
+    def add(self, phase: str, seconds: float) -> None:
+        """Record one timed occurrence of a phase.
+
+        Args:
+            phase: Phase name, usually one of PHASES.
+            seconds: Duration of the occurrence.
+        """
+        with self._lock:
+            self._seconds[phase] += seconds
+            self._counts[phase] += 1
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """Increase a named event counter, such as ``files_generated``.
+
+        Args:
+            counter: Counter name.
+            amount: Amount to add.
+        """
+        with self._lock:
+            self._counters[counter] += amount
+
+    def record_llm_request(self, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0) -> None:
+        """Record a completed LLM request.
+
+        Args:
+            seconds: Request latency.
+            prompt_tokens: Prompt tokens reported in the response's usage.
+            completion_tokens: Completion tokens reported in the response's usage.
+        """
+        with self._lock:
+            self._llm_latencies.append(seconds)
+            self._prompt_tokens += prompt_tokens
+            self._completion_tokens += completion_tokens
+
+    def token_usage(self) -> Tuple[int, int]:
+        """Get the tokens used so far.
+
+        Returns:
+            The prompt and completion tokens reported by completed LLM requests.
+        """
+        with self._lock:
+            return self._prompt_tokens, self._completion_tokens
+
+    def counters(self) -> Dict[str, int]:
+        """Get the event counters recorded so far.
+
+        Returns:
+            Mapping of counter name to its value.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def record_llm_failure(self) -> None:
+        """Record an LLM request that raised after the client's own retries."""
+        with self._lock:
+            self._llm_failures += 1
+
+    def set_section(self, name: str, values: Any) -> None:
+        """Attach a JSON-serializable section to the report, such as cache statistics.
+
+        Args:
+            name: Section name.
+            values: Section content.
+        """
+        with self._lock:
+            self._sections[name] = values
+
+    def phases(self) -> Dict[str, Dict[str, float]]:
+        """Get the phase totals recorded so far.
+
+        Returns:
+            Mapping of phase name to its total ``seconds`` and ``count``.
+        """
+        with self._lock:
+            return {
+                phase: {"seconds": self._seconds[phase], "count": self._counts[phase]}
+                for phase in sorted(self._seconds, key=_phase_order)
+            }
+
+    def report(self) -> Dict[str, Any]:
+        """Build the machine-readable report of the scan so far.
+
+        Returns:
+            Dictionary with wall-clock duration, phases, LLM latency quantiles
+            and token totals, event counters and attached sections.
+        """
+        phases = self.phases()
+        with self._lock:
+            latencies = sorted(self._llm_latencies)
+            report = {
+                "started_at": self.started_at,
+                "duration_seconds": time.perf_counter() - self._start,
+                "phases": phases,
+                "llm": {
+                    "requests": len(latencies),
+                    "failures": self._llm_failures,
+                    "latency_seconds": {
+                        **{f"p{round(quantile * 100)}": _quantile(latencies, quantile) for quantile in LATENCY_QUANTILES},
+                        "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+                        "max": latencies[-1] if latencies else 0.0,
+                        "sum": sum(latencies),
+                    },
+                    "prompt_tokens": self._prompt_tokens,
+                    "completion_tokens": self._completion_tokens,
+                    "total_tokens": self._prompt_tokens + self._completion_tokens,
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+            report.update(self._sections)
+        return report
+
+
+_thread_state = threading.local()
+
+
+@contextmanager
+def collect_metrics(metrics: Optional[ScanMetrics] = None) -> Iterator[ScanMetrics]:
+    """Record the phases of everything run inside the block.
+
+    Recording is bound to the calling thread and to the worker threads of
+    executors created with ``initializer=bind_metrics``, so scans running
+    concurrently in one process each record into their own ScanMetrics.
+    Outside such a block, timing is a no-op.
+
+    Args:
+        metrics: Accumulator to record into. A new one is created if None.
+
+    Yields:
+        The active ScanMetrics.
+    """
+    previous = get_active_metrics()
+    active = metrics if metrics is not None else ScanMetrics()
+    _thread_state.metrics = active
+    try:
+        yield active
+    finally:
+        _thread_state.metrics = previous
+
+
+def get_active_metrics() -> Optional[ScanMetrics]:
+    """Get the ScanMetrics of the enclosing collect_metrics() block, if any."""
+    return getattr(_thread_state, "metrics", None)
+
+
+def bind_metrics(metrics: Optional[ScanMetrics]) -> None:
+    """Make the calling thread record into metrics.
+
+    Meant as a thread pool initializer, so that worker threads record into the
+    ScanMetrics of the thread that created the pool::
+
+        ThreadPoolExecutor(max_workers, initializer=bind_metrics, initargs=(get_active_metrics(),))
+
+    Args:
+        metrics: Accumulator to record into, or None to stop recording.
+    """
+    _thread_state.metrics = metrics
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Time the enclosed block as one occurrence of a phase.
+
+    Args:
+        phase: Phase name, usually one of PHASES.
+    """
+    metrics = get_active_metrics()
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(phase, time.perf_counter() - start)
+
+
+def timed_iter(phase: str, iterable: Iterable[T]) -> Iterator[T]:
+    """Iterate over an iterable, timing only the production of each item.
+
+    Time the consumer spends between items is not counted.
+
+    Args:
+        phase: Phase name, usually one of PHASES.
+        iterable: Iterable to time, typically a generator doing I/O.
+
+    Yields:
+        The items of iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        with timed(phase):
+            item = next(iterator, _EXHAUSTED)
+        if item is _EXHAUSTED:
+            return
+        yield item
+
+
+def increment(counter: str, amount: int = 1) -> None:
+    """Increase a named event counter of the active ScanMetrics, if any."""
+    metrics = get_active_metrics()
+    if metrics is not None:
+        metrics.increment(counter, amount)
+
+
+@contextmanager
+def instrument_scan(
+    report_dir: str,
+    prometheus_path: Optional[str] = None,
+    profile: bool = False
+) -> Iterator[ScanMetrics]:
+    """Collect metrics for a scan and write its reports when the block exits.
+
+    If the calling thread already collects metrics, for example for a daemon
+    job, the scan records into that ScanMetrics instead of a new one.
+
+    The JSON report is written to ``report_dir/_scan_report.json`` also when
+    the scan fails, unless report_dir was never created (for example because
+    the clone failed); it is not created here so that it cannot block a later
+    clone into the same place. With profile set, every thread started inside the
+    block is profiled with cProfile and allocations are traced with
+    tracemalloc; the results go to ``_scan_profile.prof`` (readable with
+    pstats or snakeviz) and ``_scan_memory.txt`` in report_dir.
+
+    Args:
+        report_dir: Directory to write the reports to, usually scanner_metadata.
+        prometheus_path: Also write the report in Prometheus text format here,
+            e.g. for the node_exporter textfile collector.
+        profile: Whether to profile CPU time and memory allocations.
+
+    Yields:
+        The ScanMetrics being collected.
+    """
+    with collect_metrics(get_active_metrics()) as metrics:
+        profiling = _start_profiling() if profile else None
+        try:
+            yield metrics
+        finally:
+            report_dir_exists = os.path.isdir(report_dir)
+            if profiling is not None:
+                _stop_profiling(profiling, report_dir if report_dir_exists else None)
+            report = metrics.report()
+            if report_dir_exists:
+                write_json_report(report, os.path.join(report_dir, SCAN_REPORT_FILENAME))
+            if prometheus_path:
+                write_prometheus_report(report, prometheus_path)
+
+
+def write_json_report(report: Dict[str, Any], report_path: str) -> bool:
+    """Write a scan report as JSON.
+
+    Args:
+        report: Report from ScanMetrics.report().
+        report_path: Path of the JSON file.
+
+    Returns:
+        True if written successfully, False otherwise.
+    """
+    try:
+        write_file_atomic(report_path, json.dumps(report, indent=2))
+        return True
+    except (IOError, OSError) as error:
+        color_print.print_red(f"Failed to write scan report to {report_path}: {error}")
+        return False
+
+
+def write_prometheus_report(report: Dict[str, Any], prometheus_path: str) -> bool:
+    """Write a scan report in the Prometheus text exposition format.
+
+    Args:
+        report: Report from ScanMetrics.report().
+        prometheus_path: Path of the ``.prom`` file.
+
+    Returns:
+        True if written successfully, False otherwise.
+    """
+    llm = report["llm"]
+    latency = llm["latency_seconds"]
+    lines = [
+        "# HELP scythe_scan_duration_seconds Wall-clock duration of the last scan.",
+        "# TYPE scythe_scan_duration_seconds gauge",
+        f"scythe_scan_duration_seconds {report['duration_seconds']:.6f}",
+        "# HELP scythe_scan_phase_seconds Time spent per scan phase, summed over threads.",
+        "# TYPE scythe_scan_phase_seconds gauge",
+    ]
+    lines += [f'scythe_scan_phase_seconds{{phase="{phase}"}} {totals["seconds"]:.6f}' for phase, totals in report["phases"].items()]
+    lines += [
+        "# HELP scythe_llm_request_duration_seconds Latency of LLM requests.",
+        "# TYPE scythe_llm_request_duration_seconds summary",
+    ]
+    lines += [
+        f'scythe_llm_request_duration_seconds{{quantile="{quantile}"}} {latency[f"p{round(quantile * 100)}"]:.6f}'
+        for quantile in LATENCY_QUANTILES
+    ]
+    lines += [
+        f"scythe_llm_request_duration_seconds_sum {latency['sum']:.6f}",
+        f"scythe_llm_request_duration_seconds_count {llm['requests']}",
+        "# HELP scythe_llm_request_failures Failed LLM requests.",
+        "# TYPE scythe_llm_request_failures gauge",
+        f"scythe_llm_request_failures {llm['failures']}",
+        "# HELP scythe_llm_tokens Tokens reported by the API.",
+        "# TYPE scythe_llm_tokens gauge",
+        f'scythe_llm_tokens{{type="prompt"}} {llm["prompt_tokens"]}',
+        f'scythe_llm_tokens{{type="completion"}} {llm["completion_tokens"]}',
+        "# HELP scythe_scan_events Scan event counters.",
+        "# TYPE scythe_scan_events gauge",
+    ]
+    lines += [f'scythe_scan_events{{event="{name}"}} {value}' for name, value in report["counters"].items()]
+
+    cache = report.get("cache")
+    if cache:
+        lines += [
+            "# HELP scythe_summary_cache_lookups Summary cache lookups during the scan.",
+            "# TYPE scythe_summary_cache_lookups gauge",
+            f'scythe_summary_cache_lookups{{result="hit"}} {cache["hits"]}',
+            f'scythe_summary_cache_lookups{{result="miss"}} {cache["misses"]}',
+        ]
+
+    # Written atomically so a collector never reads a half-written file
+    try:
+        write_file_atomic(prometheus_path, "\n".join(lines) + "\n")
+        return True
+    except (IOError, OSError) as error:
+        color_print.print_red(f"Failed to write Prometheus metrics to {prometheus_path}: {error}")
+        return False
+
+
+def _start_profiling() -> Dict[str, Any]:
+    """Profile the calling thread and every thread started from now on."""
+    profilers = [cProfile.Profile()]
+    lock = threading.Lock()
+
+    def profile_new_thread(*_) -> None:
+        # Runs as the new thread's first profile event and replaces itself with cProfile
+        profiler = cProfile.Profile()
+        with lock:
+            profilers.append(profiler)
+        profiler.enable()
+
+    # From Python 3.12, cProfile is built on sys.monitoring: a single profiler
+    # already sees every thread, and a second one cannot be enabled
+    if sys.version_info < (3, 12):
+        threading.setprofile(profile_new_thread)
+    tracemalloc.start(10)
+    profilers[0].enable()
+    return {"profilers": profilers, "lock": lock}
+
+
+def _stop_profiling(profiling: Dict[str, Any], report_dir: Optional[str]) -> None:
+    """Stop profiling and, unless report_dir is None, write the results there."""
+    profiling["profilers"][0].disable()
+    if sys.version_info < (3, 12):
+        threading.setprofile(None)
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if report_dir is None:
+        return
+
+    try:
+        with profiling["lock"]:
+            stats = pstats.Stats(*profiling["profilers"])
+        stats.dump_stats(os.path.join(report_dir, PROFILE_FILENAME))
+
+        with open(os.path.join(report_dir, MEMORY_PROFILE_FILENAME), 'w') as file:
+            file.write(f"Traced memory: {current / 1024 / 1024:.1f} MB current, {peak / 1024 / 1024:.1f} MB peak\n\n")
+            file.write(f"Top {_MEMORY_PROFILE_TOP} allocation sites still alive at the end of the scan:\n")
+            for statistic in snapshot.statistics("lineno")[:_MEMORY_PROFILE_TOP]:
+                file.write(f"{statistic}\n")
+        color_print.print_green(f"Profiles saved to: {report_dir}")
+    except (IOError, OSError) as error:
+        color_print.print_red(f"Failed to write profiles to {report_dir}: {error}")
+
+
+def _quantile(sorted_values: List[float], quantile: float) -> float:
+    """Nearest-rank quantile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(quantile * len(sorted_values)) - 1)]
+
+
+_EXHAUSTED = object()
+
+
+def _phase_order(phase: str):
+    return (PHASES.index(phase), "") if phase in PHASES else (len(PHASES), phase)
@@ -0,0 +1,333 @@
+"""Dry-run estimates of the requests, tokens, cost and duration of a scan."""
+
+import json
+import math
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import color_print
+from .chunked_summary import CHARS_PER_TOKEN, DEFAULT_CHUNK_TOKENS, estimate_tokens
+from .file_utils import classify_file_name
+from .git_index import GitIndex
+from .incremental import ChangeSet
+from .llm_client import BATCH_TOKENS_PER_FILE
+from .scan_budget import ModelPrice
+from .scan_journal import DirectoryPlan
+from .scan_metrics import SCAN_REPORT_FILENAME
+from .summary_generator import BATCH_TOKENS, MAX_BATCH_FILES, SMALL_FILE_TOKENS
+from .summary_store import DIRECTORY_SUMMARY, FILE_SUMMARY, SummaryStore
+
+
+SCAN_ESTIMATE_FILENAME = "_scan_estimate.json"
+
+# Completion tokens of one summary, and request latency, when no earlier scan tells better
+DEFAULT_SUMMARY_TOKENS = 100
+DEFAULT_LATENCY_SECONDS = 3.0
+
+# Characters of the prompt templates around the content, in llm_client
+SUMMARY_PROMPT_CHARS = 160
+BATCH_PROMPT_CHARS = 320
+BATCH_HEADER_CHARS = 10
+
+
+@dataclass
+class ScanEstimate:
+    """What a scan is expected to cost, worked out without sending any request.
+
+    Attributes:
+        files: Text files in the directories to summarize.
+        files_existing: Files that already have a summary and are reused.
+        files_empty: Files that are skipped because they are empty.
+        files_stubbed: Lockfiles and generated or minified files recognized by
+            their name, which get a stub summary.
+        files_duplicate: Files with the same content as an earlier file, which
+            share its summary.
+        files_chunked: Files too large for one request, summarized in chunks.
+        directories: Directory rollups to generate.
+        directories_reused: Directories that keep their existing rollup.
+        requests: LLM requests to send.
+        prompt_tokens: Estimated prompt tokens.
+        completion_tokens: Estimated completion tokens.
+        concurrency: Requests in flight the duration is projected for.
+        latency_seconds: Mean request latency the duration is projected with.
+        summary_tokens: Completion tokens assumed per summary.
+        calibrated: Whether latency and summary length come from the last
+            scan's report rather than the defaults.
+        costs: Estimated cost in US dollars per priced model.
+    """
+
+    files: int = 0
+    files_existing: int = 0
+    files_empty: int = 0
+    files_stubbed: int = 0
+    files_duplicate: int = 0
+    files_chunked: int = 0
+    directories: int = 0
+    directories_reused: int = 0
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    concurrency: int = 1
+    latency_seconds: float = DEFAULT_LATENCY_SECONDS
+    summary_tokens: int = DEFAULT_SUMMARY_TOKENS
+    calibrated: bool = False
+    costs: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def files_to_summarize(self) -> int:
+        """Files that need a new summary from the LLM."""
+        return self.files - self.files_existing - self.files_empty - self.files_stubbed - self.files_duplicate
+
+    @property
+    def total_tokens(self) -> int:
+        """Estimated prompt plus completion tokens."""
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def duration_seconds(self) -> float:
+        """Projected wall-clock time of the requests at the given concurrency."""
+        return self.requests * self.latency_seconds / self.concurrency
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the estimate as a JSON-serializable dictionary, derived values included."""
+        return {
+            **asdict(self),
+            "files_to_summarize": self.files_to_summarize,
+            "total_tokens": self.total_tokens,
+            "duration_seconds": self.duration_seconds,
+        }
+
+
+def estimate_scan(
+    plans: Iterable[DirectoryPlan],
+    store: SummaryStore,
+    changes: Optional[ChangeSet] = None,
+    batch_small_files: bool = True,
+    concurrency: int = 1,
+    prices: Optional[Dict[str, ModelPrice]] = None,
+    latency_seconds: Optional[float] = None,
+    summary_tokens: Optional[int] = None,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    git_index: Optional[GitIndex] = None
+) -> ScanEstimate:
+    """Work out the requests a scan of the planned directories would send.
+
+    Mirrors summarize_repository_tree: files with a summary in the store are
+    reused, small files are packed into batches in plan order, files larger
+    than chunk_tokens are summarized chunk by chunk and the chunk summaries
+    reduced, and every directory without a rollup is rolled up from its files
+    and subdirectories. Files recognized as lockfiles or generated by their
+    name, and files the index lists with the same content as an earlier one,
+    need no request. Prompt tokens are approximated from file sizes at
+    CHARS_PER_TOKEN characters per token; each summary is assumed to take
+    summary_tokens completion tokens. Hits in the global summary cache and
+    files recognized as generated by their content are not predicted, so the
+    estimate is an upper bound there.
+
+    Args:
+        plans: Directory plans from plan_repository_tree, with file sizes measured.
+        store: Store holding the existing summaries.
+        changes: Changes an incremental scan would invalidate, or None. Their
+            summaries count as stale even though the store still has them.
+        batch_small_files: Whether the scan packs small files into shared requests.
+        concurrency: Requests in flight to project the duration for.
+        prices: Prices to work out the cost for, keyed by model name.
+        latency_seconds: Mean request latency, or None for DEFAULT_LATENCY_SECONDS.
+        summary_tokens: Completion tokens of one summary, or None for
+            DEFAULT_SUMMARY_TOKENS.
+        chunk_tokens: Prompt budget per request, as in generate_file_summary.
+        git_index: Index the plans were made from, to recognize identical files.
+
+    Returns:
+        The estimate.
+
+    Raises:
+        ValueError: If concurrency is less than 1.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+
+    estimate = ScanEstimate(concurrency=concurrency)
+    if latency_seconds is not None and summary_tokens is not None:
+        estimate.calibrated = True
+    estimate.latency_seconds = latency_seconds or DEFAULT_LATENCY_SECONDS
+    estimate.summary_tokens = summary_tokens = summary_tokens or DEFAULT_SUMMARY_TOKENS
+    stale_files = set(changes.modified) if changes is not None else set()
+    stale_directories = changes.affected_directories if changes is not None else set()
+    summary_chars = summary_tokens * CHARS_PER_TOKEN
+    chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+    duplicate_blob_ids = git_index.duplicate_blob_ids() if git_index is not None else set()
+    claimed_blob_ids = set()
+
+    def add_request(prompt_chars):
+        estimate.requests += 1
+        estimate.prompt_tokens += estimate_tokens(prompt_chars)
+        estimate.completion_tokens += summary_tokens
+
+    def add_file(relative_path, size):
+        if size <= chunk_chars:
+            add_request(SUMMARY_PROMPT_CHARS + len(relative_path) + size)
+            return
+
+        estimate.files_chunked += 1
+        chunks = math.ceil(size / chunk_chars)
+        for offset in range(0, size, chunk_chars):
+            add_request(SUMMARY_PROMPT_CHARS + len(relative_path) + min(size - offset, chunk_chars))
+        # Reduce rounds as in _reduce_summaries, then the final combining request
+        while chunks > 1 and chunks * (summary_chars + 2) > chunk_chars:
+            groups = math.ceil(chunks * (summary_chars + 2) / chunk_chars)
+            if groups == chunks:
+                break
+            for _ in range(groups):
+                add_request(SUMMARY_PROMPT_CHARS + len(relative_path) + chunks // groups * (summary_chars + 2))
+            chunks = groups
+        add_request(SUMMARY_PROMPT_CHARS + len(relative_path) + chunks * (summary_chars + 2))
+
+    # Small files waiting for a batch: path, size and whether a summary must be generated
+    batch: List[Tuple[str, int, bool]] = []
+    batch_tokens = 0
+
+    def flush_batch():
+        nonlocal batch, batch_tokens
+        pending = [(relative_path, size) for relative_path, size, needed in batch if needed]
+        if len(pending) == 1:
+            add_file(*pending[0])
+        elif pending:
+            estimate.requests += 1
+            estimate.prompt_tokens += estimate_tokens(
+                BATCH_PROMPT_CHARS + sum(BATCH_HEADER_CHARS + len(relative_path) + size for relative_path, size in pending)
+            )
+            estimate.completion_tokens += min(summary_tokens, BATCH_TOKENS_PER_FILE) * len(pending)
+        batch = []
+        batch_tokens = 0
+
+    for plan in plans:
+        if plan.reuse:
+            estimate.directories_reused += 1
+            continue
+
+        relative_paths = [os.path.join(plan.path, file_name) if plan.path != '.' else file_name for file_name, _ in plan.files]
+        existing = store.get_many(FILE_SUMMARY, relative_paths)
+        summarized_files = 0
+        for (file_name, size), relative_path in zip(plan.files, relative_paths):
+            estimate.files += 1
+            size = size or 0
+            entry = git_index.get(os.path.join(git_index.repo_path, relative_path)) if duplicate_blob_ids else None
+            blob_id = entry.blob_id if entry is not None and entry.blob_id in duplicate_blob_ids else None
+            needed = relative_path not in existing or relative_path in stale_files
+            if blob_id in claimed_blob_ids:
+                # Waits for the file that claimed the content instead of taking part in a batch
+                if not needed:
+                    estimate.files_existing += 1
+                elif size:
+                    estimate.files_duplicate += 1
+                else:
+                    estimate.files_empty += 1
+                summarized_files += 1 if size or not needed else 0
+                continue
+            if blob_id is not None:
+                claimed_blob_ids.add(blob_id)
+
+            if not needed:
+                estimate.files_existing += 1
+                summarized_files += 1
+            elif not size:
+                estimate.files_empty += 1
+                needed = False
+            elif classify_file_name(file_name) is not None:
+                estimate.files_stubbed += 1
+                summarized_files += 1
+                needed = False
+            else:
+                summarized_files += 1
+
+            file_tokens = estimate_tokens(size)
+            if not batch_small_files or file_tokens > SMALL_FILE_TOKENS:
+                if needed:
+                    add_file(relative_path, size)
+                continue
+            if batch and (batch_tokens + file_tokens > BATCH_TOKENS or len(batch) >= MAX_BATCH_FILES):
+                flush_batch()
+            batch.append((relative_path, size, needed))
+            batch_tokens += file_tokens
+
+        if store.get(DIRECTORY_SUMMARY, plan.path) is not None and plan.path not in stale_directories:
+            estimate.directories_reused += 1
+            continue
+        inputs = summarized_files + len(plan.children)
+        if inputs:
+            estimate.directories += 1
+            add_request(SUMMARY_PROMPT_CHARS + len(plan.path) + inputs * (summary_chars + 2))
+
+    flush_batch()
+    estimate.costs = {
+        model: price.cost(estimate.prompt_tokens, estimate.completion_tokens)
+        for model, price in (prices or {}).items()
+    }
+    return estimate
+
+
+def load_last_scan_rates(metadata_dir: str) -> Tuple[Optional[float], Optional[int]]:
+    """Read the request latency and summary length of the last scan from its report.
+
+    Args:
+        metadata_dir: Base directory for scanner_metadata.
+
+    Returns:
+        Mean request latency in seconds and mean completion tokens per generated
+        summary, or None for both if there is no report or it generated nothing.
+    """
+    try:
+        with open(os.path.join(metadata_dir, SCAN_REPORT_FILENAME), 'r') as file:
+            report = json.load(file)
+        llm, counters = report["llm"], report["counters"]
+        summaries = counters.get("files_generated", 0) + counters.get("directories_generated", 0)
+        if not llm["requests"] or not summaries or not llm["completion_tokens"]:
+            return None, None
+        return llm["latency_seconds"]["mean"], max(1, round(llm["completion_tokens"] / summaries))
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+
+def print_scan_estimate(estimate: ScanEstimate, model: Optional[str] = None) -> None:
+    """Print an estimate for a person deciding whether to run the scan.
+
+    Args:
+        estimate: The estimate to print.
+        model: Model configured for the scan; its cost is listed first.
+    """
+    color_print.print_green(
+        f"Files: {estimate.files:,} text files, {estimate.files_existing:,} already summarized, "
+        f"{estimate.files_empty:,} empty, {estimate.files_stubbed:,} lockfiles or generated, "
+        f"{estimate.files_duplicate:,} duplicates, {estimate.files_to_summarize:,} to summarize "
+        f"({estimate.files_chunked:,} in chunks)"
+    )
+    color_print.print_green(
+        f"Directories: {estimate.directories:,} to roll up, {estimate.directories_reused:,} reused"
+    )
+    color_print.print_green(f"LLM requests: {estimate.requests:,}")
+    color_print.print_green(
+        f"Tokens: ~{estimate.prompt_tokens:,} prompt + ~{estimate.completion_tokens:,} completion "
+        f"= ~{estimate.total_tokens:,}"
+    )
+
+    if not estimate.costs:
+        color_print.print_yellow("Cost: unknown, add a pricing section to config.json to estimate it")
+    for priced_model in sorted(estimate.costs, key=lambda name: (name != model, name)):
+        configured = " (configured)" if priced_model == model else ""
+        color_print.print_green(f"Cost with {priced_model}{configured}: ~${estimate.costs[priced_model]:,.4g}")
+
+    source = "from the last scan" if estimate.calibrated else "assumed"
+    color_print.print_green(
+        f"Duration: ~{_format_duration(estimate.duration_seconds)} at concurrency {estimate.concurrency} "
+        f"({estimate.latency_seconds:.1f} s mean latency and {estimate.summary_tokens} tokens per summary, {source})"
+    )
+
+
+def _format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
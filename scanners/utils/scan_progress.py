@@ -0,0 +1,280 @@
+"""Aggregated scan progress: a status line instead of a line per file."""
+
+import json
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, TextIO, Tuple
+
+from . import color_print
+from .color_print import Colors
+from .scan_metrics import ScanMetrics, get_active_metrics
+
+
+PROGRESS_AUTO = "auto"
+PROGRESS_LIVE = "live"
+PROGRESS_PLAIN = "plain"
+PROGRESS_JSON = "json"
+PROGRESS_QUIET = "quiet"
+PROGRESS_MODES = (PROGRESS_AUTO, PROGRESS_LIVE, PROGRESS_PLAIN, PROGRESS_JSON, PROGRESS_QUIET)
+DEFAULT_PROGRESS_MODE = PROGRESS_AUTO
+
+# Seconds between two redraws of the live status line
+LIVE_INTERVAL = 0.5
+# Seconds between two status lines or records written to a log
+LOG_INTERVAL = 10.0
+# Seconds of recent progress the rate and ETA are measured over
+RATE_WINDOW = 30.0
+
+# Counters that mark a discovered file as handled
+FILE_DONE_COUNTERS = (
+    "files_generated", "files_reused", "files_from_cache", "files_skipped_empty", "files_resumed",
+    "files_stubbed", "files_deduplicated",
+)
+
+_ERROR_COLORS = {Colors.RED, Colors.BRIGHT_RED}
+_WARNING_COLORS = {Colors.YELLOW, Colors.BRIGHT_YELLOW}
+
+# Reporters of the scans in progress, by the ScanMetrics they report on
+_reporters: Dict[ScanMetrics, "ProgressReporter"] = {}
+_reporters_lock = threading.Lock()
+
+
+def _level(color_code: str) -> str:
+    if color_code in _ERROR_COLORS:
+        return "error"
+    if color_code in _WARNING_COLORS:
+        return "warning"
+    return "info"
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressReporter:
+    """Reports the progress of one scan as a periodically updated status line.
+
+    The status line shows files done out of the total, the recent rate, the
+    estimated time left and the number of failed summaries. It is computed from
+    the scan's ScanMetrics counters, so workers report nothing themselves and
+    the terminal is written at a fixed rate however fast files complete.
+
+    While the reporter runs, every color_print message of a thread recording
+    into its ScanMetrics goes through it: ``live`` prints messages above a
+    status line redrawn in place every LIVE_INTERVAL seconds, ``plain`` prints
+    them as usual with a status line every LOG_INTERVAL seconds, ``json`` writes
+    them and the status as JSON lines, and ``quiet`` prints only warnings and
+    errors. ``auto`` is ``live`` on a terminal and ``plain`` otherwise.
+    Per-file messages sent with file_detail() are dropped unless ``verbose``.
+    """
+
+    def __init__(
+        self,
+        metrics: ScanMetrics,
+        mode: str = DEFAULT_PROGRESS_MODE,
+        verbose: bool = False,
+        interval: Optional[float] = None,
+        stream: Optional[TextIO] = None
+    ) -> None:
+        """Create the reporter; it reports nothing until started.
+
+        Args:
+            metrics: ScanMetrics of the scan.
+            mode: One of PROGRESS_MODES.
+            verbose: Whether to also print a message per file.
+            interval: Seconds between two status updates. Defaults to
+                LIVE_INTERVAL for a live status line and LOG_INTERVAL otherwise.
+            stream: Stream to write to. Defaults to standard output.
+
+        Raises:
+            ValueError: If mode is unknown or interval is not positive.
+        """
+        if mode not in PROGRESS_MODES:
+            raise ValueError(f"Unknown progress mode {mode!r}; expected one of {', '.join(PROGRESS_MODES)}")
+        if interval is not None and interval <= 0:
+            raise ValueError("interval must be positive")
+
+        self.metrics = metrics
+        self.stream = stream if stream is not None else sys.stdout
+        if mode == PROGRESS_AUTO:
+            is_terminal = getattr(self.stream, "isatty", None)
+            mode = PROGRESS_LIVE if is_terminal is not None and is_terminal() else PROGRESS_PLAIN
+        self.mode = mode
+        self.verbose = verbose
+        self.interval = interval if interval is not None else LIVE_INTERVAL if mode == PROGRESS_LIVE else LOG_INTERVAL
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status_line = ""
+        self._lock = threading.Lock()
+        self._samples: Deque[Tuple[float, int]] = deque()
+
+    def start(self) -> "ProgressReporter":
+        """Start routing the scan's messages through the reporter and updating the status."""
+        with _reporters_lock:
+            _reporters[self.metrics] = self
+            color_print.set_output_handler(_handle_message)
+        if self.mode != PROGRESS_QUIET:
+            self._thread = threading.Thread(target=self._run, name="scan-progress", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Write the final status and stop routing messages."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self._update(final=True)
+        with _reporters_lock:
+            if _reporters.get(self.metrics) is self:
+                del _reporters[self.metrics]
+            if not _reporters:
+                color_print.set_output_handler(None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the progress of the scan so far.
+
+        The total is the number of files in the scan's journal plan once it is
+        complete, and otherwise the number of files the walk has reached so far,
+        which grows as the scan goes on. The rate is measured over the last
+        RATE_WINDOW seconds.
+
+        Returns:
+            Dictionary with files done, total and failed, whether the total is
+            final, elapsed seconds, files per second, the estimated seconds
+            left (None while unknown) and the tokens used.
+        """
+        counters = self.metrics.counters()
+        done = sum(counters.get(counter, 0) for counter in FILE_DONE_COUNTERS)
+        planned = counters.get("files_planned", 0)
+        total = max(done, planned, counters.get("files_discovered", 0))
+        prompt_tokens, completion_tokens = self.metrics.token_usage()
+
+        now = time.monotonic()
+        with self._lock:
+            self._samples.append((now, done))
+            while len(self._samples) > 2 and self._samples[1][0] <= now - RATE_WINDOW:
+                self._samples.popleft()
+            first_time, first_done = self._samples[0]
+        rate = (done - first_done) / (now - first_time) if now > first_time else 0.0
+
+        return {
+            "files_done": done,
+            "files_total": total,
+            "files_failed": counters.get("summaries_failed", 0),
+            "total_known": planned > 0,
+            "elapsed_seconds": time.time() - self.metrics.started_at,
+            "files_per_second": rate,
+            "eta_seconds": (total - done) / rate if planned > 0 and rate > 0 else None,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def message(self, text: str, color_code: str, event: str = "message") -> None:
+        """Write a message of the scan without breaking the status line.
+
+        Args:
+            text: The message.
+            color_code: ANSI color code, which also sets the level in JSON mode.
+            event: Event name of the message in JSON mode.
+        """
+        level = _level(color_code)
+        if self.mode == PROGRESS_QUIET and level == "info" and event != "file":
+            return
+        with color_print.output_lock:
+            if self.mode == PROGRESS_JSON:
+                self._write_record({"event": event, "level": level, "message": text})
+                return
+            if self._status_line:
+                self.stream.write("\r\033[K")
+            self.stream.write(f"{color_code}{text}{Colors.RESET}\n")
+            if self._status_line:
+                self.stream.write(self._status_line)
+            self.stream.flush()
+
+    def _run(self) -> None:
+        self.snapshot()
+        while not self._stopped.wait(self.interval):
+            self._update()
+
+    def _update(self, final: bool = False) -> None:
+        progress = self.snapshot()
+        with color_print.output_lock:
+            if self.mode == PROGRESS_JSON:
+                self._write_record({"event": "done" if final else "progress", **progress})
+                return
+            line = self._format(progress)
+            if self.mode == PROGRESS_LIVE:
+                self._status_line = "" if final else line
+                self.stream.write(f"\r\033[K{line}\n" if final else f"\r\033[K{line}")
+            else:
+                self.stream.write(f"{line}\n")
+            self.stream.flush()
+
+    def _format(self, progress: Dict[str, Any]) -> str:
+        done, total = progress["files_done"], progress["files_total"]
+        if progress["total_known"]:
+            parts = [f"{done}/{total} files ({done / total if total else 1:.0%})"]
+        else:
+            # More files may be found as the walk goes on
+            parts = [f"{done}/{total}+ files"]
+        parts.append(f"{progress['files_per_second']:.1f} files/s")
+        if progress["eta_seconds"] is not None:
+            parts.append(f"ETA {_format_duration(progress['eta_seconds'])}")
+        parts.append(f"{progress['files_failed']} failed")
+        parts.append(f"{progress['total_tokens']} tokens")
+        parts.append(f"{_format_duration(progress['elapsed_seconds'])} elapsed")
+        return " | ".join(parts)
+
+    def _write_record(self, record: Dict[str, Any]) -> None:
+        self.stream.write(json.dumps({"time": time.time(), **record}) + "\n")
+        self.stream.flush()
+
+    def __enter__(self) -> "ProgressReporter":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+def _active_reporter() -> Optional[ProgressReporter]:
+    metrics = get_active_metrics()
+    if metrics is None:
+        return None
+    with _reporters_lock:
+        return _reporters.get(metrics)
+
+
+def _handle_message(text: str, color_code: str) -> bool:
+    reporter = _active_reporter()
+    if reporter is None:
+        # Threads outside any scan still must not print into a live status line
+        with _reporters_lock:
+            live = [reporter for reporter in _reporters.values() if reporter.mode == PROGRESS_LIVE]
+        if not live:
+            return False
+        reporter = live[0]
+    reporter.message(text, color_code)
+    return True
+
+
+def file_detail(text: str, color_code: str = Colors.CYAN) -> None:
+    """Print a message about a single file, if the scan asked for them.
+
+    Outside a scan with a ProgressReporter the message is printed as usual.
+
+    Args:
+        text: The message.
+        color_code: ANSI color code to apply.
+    """
+    reporter = _active_reporter()
+    if reporter is None:
+        color_print.print_colored(text, color_code)
+    elif reporter.verbose:
+        reporter.message(text, color_code, event="file")
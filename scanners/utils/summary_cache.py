@@ -0,0 +1,289 @@
+"""Content-addressed summary cache shared across repositories, branches and clones."""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+DEFAULT_MAX_SIZE_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 90
+
+# Fraction of max_size_bytes to shrink to when size-based eviction runs, so we
+# don't evict again on the very next insert.
+_EVICTION_TARGET_RATIO = 0.9
+
+# Cache hits whose last-used times are written back together in one transaction
+_TOUCH_BATCH_SIZE = 256
+
+# Least recently used entries read per round of size-based eviction
+_EVICTION_BATCH_SIZE = 500
+
+
+def get_default_cache_path() -> str:
+    """Get the default location of the global summary cache.
+
+    Honors ``XDG_CACHE_HOME`` and falls back to ``~/.cache``.
+
+    Returns:
+        Path to the SQLite cache file.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "scythe-scanner", "summary_cache.sqlite3")
+
+
+def compute_content_hash(content: str) -> str:
+    """Compute the content address used as the cache key.
+
+    Args:
+        content: File content to hash.
+
+    Returns:
+        Hex-encoded SHA-256 digest of the UTF-8 encoded content.
+    """
+    return hashlib.sha256(content.encode("utf-8", errors="ignore")).hexdigest()
+
+
+class SummaryCache:
+    """Persistent SQLite cache of summaries keyed by content hash, model and prompt version.
+
+    Entries unused for longer than ``max_age_days`` are dropped when the cache is
+    opened, and the least recently used entries are evicted once the stored
+    summaries exceed ``max_size_bytes``. The cache is safe to share between
+    threads and between processes scanning different repositories.
+
+    The total size is kept up to date by triggers in a ``size_bytes`` counter,
+    so inserts never sum the table. Last-used times of hits are written back in
+    batches of _TOUCH_BATCH_SIZE, before any eviction and on close.
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS
+    ) -> None:
+        """Open (or create) the cache database and apply age-based eviction.
+
+        Args:
+            cache_path: Path to the SQLite file. Defaults to get_default_cache_path().
+            max_size_bytes: Maximum total size of cached summaries.
+            max_age_days: Maximum number of days since an entry was last used.
+
+        Raises:
+            ValueError: If max_size_bytes or max_age_days is not positive.
+            sqlite3.Error: If the database cannot be opened.
+        """
+        if max_size_bytes <= 0:
+            raise ValueError("max_size_bytes must be positive")
+        if max_age_days <= 0:
+            raise ValueError("max_age_days must be positive")
+
+        self.cache_path = cache_path or get_default_cache_path()
+        self.max_size_bytes = max_size_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        # Last-used times of hits not yet written back, by entry key
+        self._pending_touches: Dict[Tuple[str, str, int], float] = {}
+        self._connection = sqlite3.connect(self.cache_path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS summaries (
+                content_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                PRIMARY KEY (content_hash, model, prompt_version)
+            )"""
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS summaries_last_used_at ON summaries (last_used_at)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        # Caches created before the size counter existed get it from one full sum
+        self._connection.execute(
+            "INSERT OR IGNORE INTO counters (name, value) "
+            "SELECT 'size_bytes', COALESCE(SUM(size), 0) FROM summaries"
+        )
+        self._connection.executescript(
+            """CREATE TRIGGER IF NOT EXISTS summaries_size_insert AFTER INSERT ON summaries BEGIN
+                UPDATE counters SET value = value + NEW.size WHERE name = 'size_bytes';
+            END;
+            CREATE TRIGGER IF NOT EXISTS summaries_size_delete AFTER DELETE ON summaries BEGIN
+                UPDATE counters SET value = value - OLD.size WHERE name = 'size_bytes';
+            END;
+            CREATE TRIGGER IF NOT EXISTS summaries_size_update AFTER UPDATE OF size ON summaries BEGIN
+                UPDATE counters SET value = value + NEW.size - OLD.size WHERE name = 'size_bytes';
+            END;"""
+        )
+        self._connection.commit()
+
+        self.evict()
+
+    def get(self, content_hash: str, model: str, prompt_version: int) -> Optional[str]:
+        """Look up a cached summary and refresh its last-used time.
+
+        The last-used time is written back later, with those of other hits.
+
+        Args:
+            content_hash: Hash from compute_content_hash().
+            model: Model the summary was generated with.
+            prompt_version: Version of the prompt the summary was generated with.
+
+        Returns:
+            The cached summary if present, None otherwise.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT summary FROM summaries WHERE content_hash = ? AND model = ? AND prompt_version = ?",
+                (content_hash, model, prompt_version)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._pending_touches[(content_hash, model, prompt_version)] = time.time()
+            if len(self._pending_touches) >= _TOUCH_BATCH_SIZE:
+                self._flush_touches()
+            return row[0]
+
+    def put(self, content_hash: str, model: str, prompt_version: int, summary: str) -> None:
+        """Store a summary, evicting old entries if the cache grows too large.
+
+        Args:
+            content_hash: Hash from compute_content_hash().
+            model: Model the summary was generated with.
+            prompt_version: Version of the prompt the summary was generated with.
+            summary: Summary text to cache.
+        """
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE, whose implicit delete skips the size triggers
+            self._connection.execute(
+                """INSERT INTO summaries
+                   (content_hash, model, prompt_version, summary, size, created_at, last_used_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (content_hash, model, prompt_version) DO UPDATE SET
+                   summary = excluded.summary, size = excluded.size,
+                   created_at = excluded.created_at, last_used_at = excluded.last_used_at""",
+                (content_hash, model, prompt_version, summary, len(summary.encode("utf-8")), now, now)
+            )
+            self._connection.commit()
+            self._pending_touches.pop((content_hash, model, prompt_version), None)
+
+            if self._total_size() > self.max_size_bytes:
+                self._evict_to_size(int(self.max_size_bytes * _EVICTION_TARGET_RATIO))
+
+    def evict(self) -> int:
+        """Drop expired entries and shrink the cache below its size limit.
+
+        Returns:
+            Number of entries removed.
+        """
+        cutoff = time.time() - self.max_age_days * 24 * 60 * 60
+        with self._lock:
+            self._flush_touches()
+            removed = self._connection.execute(
+                "DELETE FROM summaries WHERE last_used_at < ?", (cutoff,)
+            ).rowcount
+            self._connection.commit()
+
+            if self._total_size() > self.max_size_bytes:
+                removed += self._evict_to_size(int(self.max_size_bytes * _EVICTION_TARGET_RATIO))
+
+        return removed
+
+    def stats(self) -> Dict[str, float]:
+        """Get hit/miss counters for this session and over the cache lifetime.
+
+        Returns:
+            Dictionary with session hits, misses and hit rate, lifetime hits and
+            misses, and the number and total size of cached entries.
+        """
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            lifetime = dict(self._connection.execute("SELECT name, value FROM counters").fetchall())
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "lifetime_hits": lifetime.get("hits", 0) + self.hits,
+            "lifetime_misses": lifetime.get("misses", 0) + self.misses,
+            "entries": entries,
+            "size_bytes": lifetime.get("size_bytes", 0),
+        }
+
+    def close(self) -> None:
+        """Persist the session counters and last-used times and close the database."""
+        with self._lock:
+            self._flush_touches()
+            for name, value in (("hits", self.hits), ("misses", self.misses)):
+                self._connection.execute(
+                    """INSERT INTO counters (name, value) VALUES (?, ?)
+                       ON CONFLICT(name) DO UPDATE SET value = value + excluded.value""",
+                    (name, value)
+                )
+            self._connection.commit()
+            self._connection.close()
+
+    def __enter__(self) -> "SummaryCache":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _total_size(self) -> int:
+        row = self._connection.execute("SELECT value FROM counters WHERE name = 'size_bytes'").fetchone()
+        return row[0] if row else 0
+
+    def _flush_touches(self) -> None:
+        """Write back the last-used times of the hits since the last flush."""
+        if not self._pending_touches:
+            return
+        self._connection.executemany(
+            "UPDATE summaries SET last_used_at = ? WHERE content_hash = ? AND model = ? AND prompt_version = ?",
+            [(used_at, *key) for key, used_at in self._pending_touches.items()]
+        )
+        self._connection.commit()
+        self._pending_touches.clear()
+
+    def _evict_to_size(self, target_size: int) -> int:
+        """Delete least recently used entries until the total size is at most target_size."""
+        self._flush_touches()
+        excess = self._total_size() - target_size
+        removed = 0
+        while excess > 0:
+            rows = self._connection.execute(
+                "SELECT rowid, size FROM summaries ORDER BY last_used_at LIMIT ?", (_EVICTION_BATCH_SIZE,)
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for rowid, size in rows:
+                if excess <= 0:
+                    break
+                victims.append(rowid)
+                excess -= size
+            self._connection.execute(
+                f"DELETE FROM summaries WHERE rowid IN ({','.join('?' * len(victims))})", victims
+            )
+            removed += len(victims)
+        self._connection.commit()
+        return removed
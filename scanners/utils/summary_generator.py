@@ -1,90 +1,149 @@
-"""Summary generation and storage utilities."""
+"""Summary generation utilities."""
 
 import os
-from typing import Optional, List
+from typing import Dict, List, Optional, Sequence, Tuple
 
-import color_print
-from llm_client import generate_summary, load_model
+from . import color_print
+from .color_print import Colors
+from .chunked_summary import CHARS_PER_TOKEN, DEFAULT_CHUNK_TOKENS, estimate_tokens, hash_file_content, summarize_file_in_chunks
+from .file_utils import (
+    GENERATED_FILE,
+    LOCKFILE,
+    MINIFIED_FILE,
+    MINIFIED_SAMPLE_CHARS,
+    classify_file_content,
+    classify_file_name,
+)
+from .llm_client import (
+    PROMPT_VERSION,
+    LLMClient,
+    ModelTier,
+    generate_batch_summary,
+    generate_summary,
+    load_model,
+    select_model,
+)
+from .summary_cache import SummaryCache, compute_content_hash
+from .scan_metrics import increment, timed
+from .scan_progress import file_detail
+from .summary_store import DIRECTORY_SUMMARY, FILE_SUMMARY, SummaryStore
 
 
-def check_summary_exists(summary_path: str) -> bool:
-    """Check if a summary file already exists.
-    
-    Args:
-        summary_path: Path to the summary markdown file.
-        
-    Returns:
-        True if summary exists, False otherwise.
-    """
-    return os.path.exists(summary_path)
+# Files up to SMALL_FILE_TOKENS are packed into shared requests of up to
+# BATCH_TOKENS prompt tokens and MAX_BATCH_FILES files
+SMALL_FILE_TOKENS = 500
+BATCH_TOKENS = 6000
+MAX_BATCH_FILES = 20
 
-
-def save_summary_markdown(summary_path: str, summary_content: str, original_path: str) -> bool:
-    """Save summary to a markdown file.
-    
-    Args:
-        summary_path: Path where the summary should be saved.
-        summary_content: The summary text to save.
-        original_path: Original file/directory path being summarized.
-        
-    Returns:
-        True if saved successfully, False otherwise.
-    """
-    try:
-        os.makedirs(os.path.dirname(summary_path), exist_ok=True)
-        
-        with open(summary_path, 'w') as file:
-            file.write(f"# Summary: {original_path}\n\n")
-            file.write(summary_content)
-            file.write("\n")
-        
-        return True
-        
-    except (IOError, OSError) as error:
-        color_print.print_red(f"Failed to save summary to {summary_path}: {error}")
-        return False
+# Summaries of the files classify_file_name and classify_file_content recognize,
+# which are not worth an LLM request
+STUB_SUMMARIES = {
+    LOCKFILE: "Dependency lockfile ({name}) that pins the exact resolved versions of the project's "
+              "dependencies. It is maintained by the package manager and was not summarized.",
+    GENERATED_FILE: "Generated file ({name}) produced by a code generator or build tool rather than "
+                    "written by hand. It was not summarized.",
+    MINIFIED_FILE: "Minified or machine-written file ({name}) with very long lines. It was not summarized.",
+}
 
 
-def generate_file_summary(file_path: str, metadata_dir: str, repo_base_path: str, api_key: str, model: str) -> Optional[str]:
+def generate_file_summary(
+    file_path: str,
+    store: SummaryStore,
+    repo_base_path: str,
+    api_key: str,
+    model: str,
+    client: Optional[LLMClient] = None,
+    cache: Optional[SummaryCache] = None,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    model_tiers: Sequence[ModelTier] = ()
+) -> Optional[str]:
     """Generate summary for a single file.
 
+    Lockfiles and generated or minified files, recognized by their name or the
+    start of their content, get a stub summary from STUB_SUMMARIES instead.
+
+    If a global summary cache is given, it is consulted by content hash before
+    calling the LLM, and newly generated summaries are added to it.
+
+    Files larger than chunk_tokens are never read into memory at once; they are
+    streamed and summarized chunk by chunk with summarize_file_in_chunks.
+
+    The model is picked by the size of the file from model_tiers, and the
+    summary is cached under the model that wrote it.
+
     Args:
         file_path: Path to the file to summarize.
-        metadata_dir: Base directory for scanner_metadata.
+        store: Store the summaries are read from and saved to.
         repo_base_path: Base path of the repository.
         api_key: OpenRouter API key.
         model: Model name to use for generation.
+        client: Shared LLM client to reuse across requests.
+        cache: Global content-addressed summary cache.
+        chunk_tokens: Approximate prompt budget per request, in tokens.
+        model_tiers: Models for files up to a given size, as from load_model_tiers().
 
     Returns:
         Summary string if successful, None otherwise.
     """
     relative_path = os.path.relpath(file_path, repo_base_path)
-    summary_filename = f"{os.path.basename(file_path)}.summary.md"
-    summary_dir = os.path.join(metadata_dir, os.path.dirname(relative_path))
-    summary_path = os.path.join(summary_dir, summary_filename)
     
-    if check_summary_exists(summary_path):
-        color_print.print_yellow(f"Summary already exists: {relative_path}")
-        with open(summary_path, 'r') as file:
-            lines = file.readlines()
-            if len(lines) > 2:
-                return ''.join(lines[2:]).strip()
-        return None
+    existing_summary = store.get(FILE_SUMMARY, relative_path)
+    if existing_summary is not None:
+        file_detail(f"Summary already exists: {relative_path}", Colors.YELLOW)
+        increment("files_reused")
+        return existing_summary
+    
+    kind = classify_file_name(os.path.basename(file_path))
+    if kind is not None:
+        return _save_stub_summary(store, relative_path, kind)
     
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-            content = file.read()
+        chunk_chars = chunk_tokens * CHARS_PER_TOKEN
+        file_size = os.path.getsize(file_path)
+        content = None
+        if file_size <= chunk_chars:
+            with timed("read"), open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+                content = file.read()
+            
+            if not content.strip():
+                file_detail(f"Skipping empty file: {relative_path}", Colors.YELLOW)
+                increment("files_skipped_empty")
+                return None
+            kind = classify_file_content(content)
+        else:
+            with timed("read"), open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+                kind = classify_file_content(file.read(MINIFIED_SAMPLE_CHARS))
+        if kind is not None:
+            return _save_stub_summary(store, relative_path, kind)
         
-        if not content.strip():
-            color_print.print_yellow(f"Skipping empty file: {relative_path}")
-            return None
+        model = select_model(model, model_tiers, estimate_tokens(file_size))
+        content_hash = None
+        if cache is not None:
+            if content is not None:
+                content_hash = compute_content_hash(content)
+            else:
+                content_hash = hash_file_content(file_path, chunk_chars)
+            cached_summary = cache.get(content_hash, model, PROMPT_VERSION)
+            if cached_summary:
+                if store.put(FILE_SUMMARY, relative_path, cached_summary):
+                    file_detail(f"Summary restored from cache: {relative_path}", Colors.GREEN)
+                    increment("files_from_cache")
+                    return cached_summary
+                return None
         
-        color_print.print_cyan(f"Generating summary for: {relative_path}")
-        summary = generate_summary(content, f"file: {relative_path}", api_key, model)
+        if content is not None:
+            file_detail(f"Generating summary for: {relative_path}", Colors.CYAN)
+            summary = generate_summary(content, f"file: {relative_path}", api_key, model, client)
+        else:
+            file_detail(f"Generating chunked summary for: {relative_path}", Colors.CYAN)
+            summary = summarize_file_in_chunks(file_path, relative_path, api_key, model, client, chunk_tokens)
         
         if summary:
-            if save_summary_markdown(summary_path, summary, relative_path):
-                color_print.print_green(f"Summary saved: {relative_path}")
+            if cache is not None:
+                cache.put(content_hash, model, PROMPT_VERSION, summary)
+            if store.put(FILE_SUMMARY, relative_path, summary):
+                file_detail(f"Summary saved: {relative_path}", Colors.GREEN)
+                increment("files_generated")
                 return summary
         
         return None
@@ -94,44 +153,166 @@ def generate_file_summary(file_path: str, metadata_dir: str, repo_base_path: str
         return None
 
 
-def generate_directory_summary(directory_path: str, metadata_dir: str, repo_base_path: str, api_key: str, model: str, file_summaries: List[str]) -> Optional[str]:
+def generate_file_summaries_batch(
+    file_paths: List[str],
+    store: SummaryStore,
+    repo_base_path: str,
+    api_key: str,
+    model: str,
+    client: Optional[LLMClient] = None,
+    cache: Optional[SummaryCache] = None,
+    model_tiers: Sequence[ModelTier] = ()
+) -> List[Optional[str]]:
+    """Generate summaries for several small files with a single LLM request.
+
+    Existing, empty, cached and stubbed files are handled as in generate_file_summary.
+    The remaining files are sent together and the per-file summaries are parsed
+    from the JSON response. Files the response does not cover, including all of
+    them if it cannot be parsed, are summarized individually. Files that
+    model_tiers assigns to different models are sent in separate requests.
+
+    Args:
+        file_paths: Paths of the files to summarize, small enough to share a prompt.
+        store: Store the summaries are read from and saved to.
+        repo_base_path: Base path of the repository.
+        api_key: OpenRouter API key.
+        model: Model name to use for generation.
+        client: Shared LLM client to reuse across requests.
+        cache: Global content-addressed summary cache.
+        model_tiers: Models for files up to a given size, as from load_model_tiers().
+
+    Returns:
+        Summary string or None for each file, in the order of file_paths.
+    """
+    summaries: List[Optional[str]] = [None] * len(file_paths)
+    # Files to generate, grouped by the model that summarizes them
+    pending: Dict[str, Dict[str, Tuple[int, str, Optional[str]]]] = {}
+    relative_paths = [os.path.relpath(file_path, repo_base_path) for file_path in file_paths]
+    existing_summaries = store.get_many(FILE_SUMMARY, relative_paths)
+
+    for index, (file_path, relative_path) in enumerate(zip(file_paths, relative_paths)):
+        if relative_path in existing_summaries:
+            file_detail(f"Summary already exists: {relative_path}", Colors.YELLOW)
+            increment("files_reused")
+            summaries[index] = existing_summaries[relative_path]
+            continue
+
+        kind = classify_file_name(os.path.basename(file_path))
+        if kind is not None:
+            summaries[index] = _save_stub_summary(store, relative_path, kind)
+            continue
+
+        try:
+            file_size = os.path.getsize(file_path)
+            with timed("read"), open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+                content = file.read()
+        except (IOError, OSError) as error:
+            color_print.print_red(f"Failed to read file {file_path}: {error}")
+            continue
+
+        if not content.strip():
+            file_detail(f"Skipping empty file: {relative_path}", Colors.YELLOW)
+            increment("files_skipped_empty")
+            continue
+
+        kind = classify_file_content(content)
+        if kind is not None:
+            summaries[index] = _save_stub_summary(store, relative_path, kind)
+            continue
+
+        # Sized on disk like generate_file_summary, so a file gets the same tier (and cache key) either way
+        file_model = select_model(model, model_tiers, estimate_tokens(file_size))
+        content_hash = None
+        if cache is not None:
+            content_hash = compute_content_hash(content)
+            cached_summary = cache.get(content_hash, file_model, PROMPT_VERSION)
+            if cached_summary:
+                if store.put(FILE_SUMMARY, relative_path, cached_summary):
+                    file_detail(f"Summary restored from cache: {relative_path}", Colors.GREEN)
+                    increment("files_from_cache")
+                    summaries[index] = cached_summary
+                continue
+
+        pending.setdefault(file_model, {})[relative_path] = (index, content, content_hash)
+
+    for file_model, model_pending in pending.items():
+        batch_summaries = {}
+        if len(model_pending) > 1:
+            file_detail(
+                f"Generating batched summary for {len(model_pending)} files: {', '.join(model_pending)}", Colors.CYAN
+            )
+            contents = {relative_path: content for relative_path, (_, content, _) in model_pending.items()}
+            batch_summaries = generate_batch_summary(contents, api_key, file_model, client) or {}
+
+        for relative_path, (index, content, content_hash) in model_pending.items():
+            summary = batch_summaries.get(relative_path)
+            if not summary:
+                file_detail(f"Generating summary for: {relative_path}", Colors.CYAN)
+                summary = generate_summary(content, f"file: {relative_path}", api_key, file_model, client)
+            if not summary:
+                continue
+
+            if cache is not None:
+                cache.put(content_hash, file_model, PROMPT_VERSION, summary)
+            if store.put(FILE_SUMMARY, relative_path, summary):
+                file_detail(f"Summary saved: {relative_path}", Colors.GREEN)
+                increment("files_generated")
+                summaries[index] = summary
+
+    return summaries
+
+
+def generate_directory_summary(directory_path: str, store: SummaryStore, repo_base_path: str, api_key: str, model: str, file_summaries: List[str], client: Optional[LLMClient] = None) -> Optional[str]:
     """Generate rollup summary for a directory.
 
     Args:
         directory_path: Path to the directory to summarize.
-        metadata_dir: Base directory for scanner_metadata.
+        store: Store the summaries are read from and saved to.
         repo_base_path: Base path of the repository.
         api_key: OpenRouter API key.
         model: Model name to use for generation.
         file_summaries: List of summaries from files in this directory.
+        client: Shared LLM client to reuse across requests.
 
     Returns:
-        Summary string if successful, None otherwise.
+        The new or already existing summary string, None otherwise.
     """
     relative_path = os.path.relpath(directory_path, repo_base_path)
-    if relative_path == '.':
-        relative_path = 'repository root'
-        summary_path = os.path.join(metadata_dir, "_repository_summary.md")
-    else:
-        summary_dir = os.path.join(metadata_dir, relative_path)
-        summary_path = os.path.join(summary_dir, "_directory_summary.md")
+    display_path = 'repository root' if relative_path == '.' else relative_path
     
-    if check_summary_exists(summary_path):
-        color_print.print_yellow(f"Directory summary already exists: {relative_path}")
-        return None
+    existing_summary = store.get(DIRECTORY_SUMMARY, relative_path)
+    if existing_summary is not None:
+        file_detail(f"Directory summary already exists: {display_path}", Colors.YELLOW)
+        increment("directories_reused")
+        return existing_summary
     
     if not file_summaries:
-        color_print.print_yellow(f"No file summaries to aggregate for: {relative_path}")
+        file_detail(f"No file summaries to aggregate for: {display_path}", Colors.YELLOW)
         return None
     
     aggregated_content = "\n\n".join(file_summaries)
     
-    color_print.print_cyan(f"Generating directory summary for: {relative_path}")
-    summary = generate_summary(aggregated_content, f"directory: {relative_path}", api_key, model)
+    file_detail(f"Generating directory summary for: {display_path}", Colors.CYAN)
+    summary = generate_summary(aggregated_content, f"directory: {display_path}", api_key, model, client)
     
     if summary:
-        if save_summary_markdown(summary_path, summary, relative_path):
-            color_print.print_green(f"Directory summary saved: {relative_path}")
+        if store.put(DIRECTORY_SUMMARY, relative_path, summary):
+            file_detail(f"Directory summary saved: {display_path}", Colors.GREEN)
+            increment("directories_generated")
             return summary
     
     return None
+
+
+def _save_stub_summary(store: SummaryStore, relative_path: str, kind: str) -> Optional[str]:
+    """Store the stub summary of a lockfile, generated or minified file.
+
+    Returns:
+        The stub summary, or None if it could not be saved.
+    """
+    summary = STUB_SUMMARIES[kind].format(name=os.path.basename(relative_path))
+    if store.put(FILE_SUMMARY, relative_path, summary):
+        file_detail(f"Stub summary saved for {kind} file: {relative_path}", Colors.GREEN)
+        increment("files_stubbed")
+        return summary
+    return None
@@ -0,0 +1,484 @@
+"""Search index over the summaries of a repository: BM25 ranking and subtree lookups."""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from . import color_print
+from .scan_metrics import timed
+from .summary_store import SummaryEntry, SummaryStore
+
+
+INDEX_FILENAME = "summary_index.sqlite3"
+
+# BM25 term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+DEFAULT_TOP_K = 10
+
+# Bump when the tokenizer or schema changes, so older indexes are rebuilt
+INDEX_VERSION = 1
+
+# Summaries indexed per transaction while building an index from a store
+_BUILD_BATCH_SIZE = 500
+
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+_CAMEL_CASE_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can do does for from has have how if in into is it its "
+    "of on or so than that the their them then there these they this those to was were what when "
+    "which while who will with".split()
+)
+
+
+@dataclass
+class IndexHit:
+    """A summary found by a search or subtree lookup."""
+    kind: str
+    path: str
+    score: float = 0.0
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into index terms.
+
+    Words are lowercased and identifiers are also split at camelCase and
+    snake_case boundaries, so ``ScanDaemon`` matches both ``scandaemon`` and
+    ``daemon``. Stopwords and single characters are dropped.
+
+    Args:
+        text: Summary, path or query text.
+
+    Returns:
+        Terms in order of appearance, with repetitions.
+    """
+    terms = []
+    for word in _WORD_PATTERN.findall(text):
+        lowered = word.lower()
+        if lowered == word or word.isupper():
+            candidates = [lowered]
+        else:
+            candidates = [lowered, *(part.lower() for part in _CAMEL_CASE_PATTERN.findall(word))]
+        for term in candidates:
+            if len(term) > 1 and term not in STOPWORDS:
+                terms.append(term)
+    return terms
+
+
+def parent_path(relative_path: str) -> Optional[str]:
+    """Get the repository-relative parent directory of a path ('.' for top-level paths, None for the root)."""
+    if relative_path == '.':
+        return None
+    parent = relative_path.rpartition('/')[0]
+    return parent or '.'
+
+
+class SummaryIndex:
+    """Inverted index and path tree over the summaries of one repository.
+
+    The index lives in its own SQLite file next to the summaries. Each summary
+    is a document of its path and text, split into terms by tokenize(); the
+    postings table maps every term to the documents containing it and how
+    often, so a search reads only the postings of its query terms and ranks
+    them with BM25. Documents also record their parent directory, which makes
+    the paths a tree: children are one indexed lookup and a subtree is one
+    range scan over the sorted paths. Summary texts are not stored.
+
+    Indexes are safe to share between threads.
+    """
+
+    def __init__(self, metadata_dir: str) -> None:
+        """Open (or create) the index database in the metadata directory.
+
+        Args:
+            metadata_dir: Base directory for scanner_metadata.
+
+        Raises:
+            sqlite3.Error: If the database cannot be opened.
+        """
+        self.metadata_dir = metadata_dir
+        self.index_path = os.path.join(metadata_dir, INDEX_FILENAME)
+        os.makedirs(metadata_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(
+            """CREATE TABLE IF NOT EXISTS documents (
+                doc_id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                parent TEXT,
+                length INTEGER NOT NULL,
+                UNIQUE (path, kind)
+            );
+            CREATE INDEX IF NOT EXISTS documents_by_parent ON documents (parent);
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                frequency INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_by_document ON postings (doc_id);
+            CREATE TABLE IF NOT EXISTS index_info (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            ) WITHOUT ROWID;"""
+        )
+        self._connection.commit()
+
+    @property
+    def is_complete(self) -> bool:
+        """Whether the index was fully built with the current INDEX_VERSION."""
+        return self._info("version") == INDEX_VERSION
+
+    def add(self, kind: str, relative_path: str, summary: str) -> None:
+        """Index a summary, replacing the previous one of the same path and kind.
+
+        Args:
+            kind: FILE_SUMMARY or DIRECTORY_SUMMARY.
+            relative_path: Path relative to the repository root.
+            summary: Summary text.
+        """
+        self.add_many([(kind, relative_path, summary)])
+
+    def add_many(self, entries: Iterable[SummaryEntry]) -> None:
+        """Index several summaries in one transaction.
+
+        Args:
+            entries: (kind, relative path, summary) tuples.
+        """
+        documents = []
+        for kind, relative_path, summary in entries:
+            path = _normalize_path(relative_path)
+            terms = Counter(tokenize(path))
+            terms.update(tokenize(summary))
+            documents.append((kind, path, terms))
+
+        with timed("index"), self._lock, self._connection:
+            postings = []
+            total_length = 0
+            for kind, path, terms in documents:
+                self._remove_document(kind, path)
+                length = sum(terms.values())
+                doc_id = self._connection.execute(
+                    "INSERT INTO documents (kind, path, parent, length) VALUES (?, ?, ?, ?)",
+                    (kind, path, parent_path(path), length)
+                ).lastrowid
+                postings.extend((term, doc_id, frequency) for term, frequency in terms.items())
+                total_length += length
+            # Inserting in key order keeps the postings B-tree writes local
+            postings.sort()
+            self._connection.executemany("INSERT INTO postings (term, doc_id, frequency) VALUES (?, ?, ?)", postings)
+            self._add_to_totals(len(documents), total_length)
+
+    def remove(self, kind: str, relative_path: str) -> bool:
+        """Remove a summary from the index.
+
+        Args:
+            kind: FILE_SUMMARY or DIRECTORY_SUMMARY.
+            relative_path: Path relative to the repository root.
+
+        Returns:
+            True if the summary was indexed, False otherwise.
+        """
+        with timed("index"), self._lock, self._connection:
+            return self._remove_document(kind, _normalize_path(relative_path))
+
+    def rebuild(self, store: SummaryStore) -> int:
+        """Index every summary of a store from scratch.
+
+        Summaries are streamed from the store in batches, so the whole store is
+        never held in memory.
+
+        Args:
+            store: Store to index.
+
+        Returns:
+            Number of summaries indexed.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM postings")
+            self._connection.execute("DELETE FROM documents")
+            self._connection.execute("DELETE FROM index_info")
+
+        batch: List[SummaryEntry] = []
+        indexed = 0
+        for entry in store.items():
+            batch.append(entry)
+            if len(batch) >= _BUILD_BATCH_SIZE:
+                self.add_many(batch)
+                indexed += len(batch)
+                batch = []
+        self.add_many(batch)
+        indexed += len(batch)
+
+        with self._lock, self._connection:
+            self._set_info("version", INDEX_VERSION)
+        return indexed
+
+    def search(
+        self,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        kind: Optional[str] = None,
+        under: Optional[str] = None
+    ) -> List[IndexHit]:
+        """Find the summaries most relevant to a query.
+
+        Documents are ranked by BM25 over the query's terms. Only the postings
+        of those terms are read.
+
+        Args:
+            query: Free-text query.
+            top_k: Maximum number of results.
+            kind: Only return summaries of this kind, FILE_SUMMARY or DIRECTORY_SUMMARY.
+            under: Only return summaries of this directory and the paths below it.
+
+        Returns:
+            Matching summaries, best first.
+
+        Raises:
+            ValueError: If top_k is less than 1.
+        """
+        if top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+
+        conditions, filters = [], []
+        if kind is not None:
+            conditions.append("d.kind = ?")
+            filters.append(kind)
+        if under is not None and _subtree_prefix(under):
+            prefix = _subtree_prefix(under)
+            conditions.append("(d.path = ? OR (d.path >= ? AND d.path < ?))")
+            filters += [prefix[:-1], prefix, prefix[:-1] + '0']
+
+        with self._lock:
+            document_count = self._info("documents") or 0
+            if not document_count:
+                return []
+            average_length = (self._info("total_length") or 0) / document_count or 1.0
+            placeholders = ','.join('?' * len(terms))
+            document_frequencies = dict(self._connection.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+            ).fetchall())
+            weights = [
+                (term, math.log(1 + (document_count - frequency + 0.5) / (frequency + 0.5)))
+                for term, frequency in document_frequencies.items()
+            ]
+            if not weights:
+                return []
+            # Score in SQLite so that frequent terms do not ship every posting to Python
+            rows = self._connection.execute(
+                f"""WITH query_terms (term, idf) AS (VALUES {','.join(['(?, ?)'] * len(weights))})
+                SELECT d.kind, d.path, SUM(q.idf * p.frequency * ? / (p.frequency + ? * (? + ? * d.length))) AS score
+                FROM query_terms q JOIN postings p ON p.term = q.term JOIN documents d ON d.doc_id = p.doc_id
+                {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                GROUP BY p.doc_id ORDER BY score DESC, p.doc_id LIMIT ?""",
+                (
+                    *(value for weight in weights for value in weight),
+                    BM25_K1 + 1, BM25_K1, 1 - BM25_B, BM25_B / average_length,
+                    *filters, top_k,
+                )
+            ).fetchall()
+        return [IndexHit(row_kind, path, score) for row_kind, path, score in rows]
+
+    def subtree(self, relative_path: str = '.', max_depth: Optional[int] = None, kind: Optional[str] = None) -> List[IndexHit]:
+        """List the indexed summaries of a directory and everything below it.
+
+        Args:
+            relative_path: Directory path relative to the repository root ('.' for the root).
+            max_depth: Only list paths at most this many levels below the
+                directory; 1 lists its direct children. None lists everything.
+            kind: Only list summaries of this kind.
+
+        Returns:
+            Summaries in path order, the directory itself first if indexed.
+        """
+        path = _normalize_path(relative_path)
+        prefix = _subtree_prefix(path)
+        if max_depth == 1:
+            condition, parameters = "path = ? OR parent = ?", [path, path]
+        elif not prefix:
+            condition, parameters = "1", []
+        else:
+            # '0' sorts right after '/', so this range is exactly the paths starting with prefix
+            condition, parameters = "path = ? OR (path >= ? AND path < ?)", [path, prefix, prefix[:-1] + '0']
+
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT kind, path FROM documents WHERE {condition} ORDER BY path = ? DESC, path, kind",
+                (*parameters, path)
+            ).fetchall()
+
+        base_depth = _depth(path)
+        return [
+            IndexHit(row_kind, row_path) for row_kind, row_path in rows
+            if (kind is None or row_kind == kind)
+            and (max_depth is None or _depth(row_path) - base_depth <= max_depth)
+        ]
+
+    def count(self) -> int:
+        """Get the number of indexed summaries."""
+        with self._lock:
+            return self._info("documents") or 0
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> "SummaryIndex":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _remove_document(self, kind: str, path: str) -> bool:
+        row = self._connection.execute(
+            "SELECT doc_id, length FROM documents WHERE path = ? AND kind = ?", (path, kind)
+        ).fetchone()
+        if row is None:
+            return False
+        doc_id, length = row
+        self._connection.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+        self._connection.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+        self._add_to_totals(-1, -length)
+        return True
+
+    def _add_to_totals(self, documents: int, length: int) -> None:
+        self._connection.executemany(
+            "INSERT INTO index_info (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+            [("documents", documents), ("total_length", length)]
+        )
+
+    def _info(self, name: str) -> Optional[int]:
+        row = self._connection.execute("SELECT value FROM index_info WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_info(self, name: str, value: int) -> None:
+        self._connection.execute("INSERT OR REPLACE INTO index_info (name, value) VALUES (?, ?)", (name, value))
+
+
+class IndexedSummaryStore(SummaryStore):
+    """Stand-in for a SummaryStore that keeps a SummaryIndex in step with it.
+
+    Every summary stored or deleted through it is also indexed or removed from
+    the index, so the index stays current as a scan regenerates summaries.
+    Closing it leaves the wrapped store and the index open.
+    """
+
+    def __init__(self, store: SummaryStore, index: SummaryIndex) -> None:
+        """Wrap a store.
+
+        Args:
+            store: Store the summaries are kept in.
+            index: Index to update alongside it.
+        """
+        self._store = store
+        self.index = index
+
+    def get(self, kind: str, relative_path: str) -> Optional[str]:
+        return self._store.get(kind, relative_path)
+
+    def get_many(self, kind: str, relative_paths: Iterable[str]) -> Dict[str, str]:
+        return self._store.get_many(kind, relative_paths)
+
+    def put(self, kind: str, relative_path: str, summary: str) -> bool:
+        return self.put_many([(kind, relative_path, summary)]) == 1
+
+    def put_many(self, entries: Iterable[SummaryEntry]) -> int:
+        entries = list(entries)
+        stored = self._store.put_many(entries)
+        if stored == len(entries):
+            self._index(self.index.add_many, entries)
+        else:
+            # Index only what the store actually holds now
+            for kind, relative_path, summary in entries:
+                if self._store.get(kind, relative_path) == summary:
+                    self._index(self.index.add, kind, relative_path, summary)
+        return stored
+
+    def delete(self, kind: str, relative_path: str) -> bool:
+        deleted = self._store.delete(kind, relative_path)
+        self._index(self.index.remove, kind, relative_path)
+        return deleted
+
+    def items(self) -> Iterator[SummaryEntry]:
+        return self._store.items()
+
+    def _index(self, update: Callable[..., Any], *args: Any) -> None:
+        # A failed index update must not fail the scan; `scythe-scan search --rebuild` repairs the index
+        try:
+            update(*args)
+        except sqlite3.Error as error:
+            color_print.print_red(f"Failed to update the summary index {self.index.index_path}: {error}")
+
+
+def open_summary_index(metadata_dir: str, store: SummaryStore, rebuild: bool = False) -> SummaryIndex:
+    """Open the summary index of a repository, building it from the store if needed.
+
+    An index that is missing, was interrupted while being built or comes from
+    an older INDEX_VERSION is rebuilt from every summary in the store.
+
+    Args:
+        metadata_dir: Base directory for scanner_metadata.
+        store: Store holding the repository's summaries.
+        rebuild: Whether to rebuild the index even if it is complete.
+
+    Returns:
+        The opened index.
+
+    Raises:
+        sqlite3.Error: If the database cannot be opened.
+    """
+    index = SummaryIndex(metadata_dir)
+    if rebuild or not index.is_complete:
+        indexed = index.rebuild(store)
+        if indexed:
+            color_print.print_green(f"Indexed {indexed} summaries into {index.index_path}")
+    return index
+
+
+def remove_summary_index(metadata_dir: str) -> None:
+    """Delete the summary index of a repository, so that it is rebuilt the next time it is opened.
+
+    Scans that do not update the index call this, since the index would no
+    longer match the summaries.
+
+    Args:
+        metadata_dir: Base directory for scanner_metadata.
+    """
+    index_path = os.path.join(metadata_dir, INDEX_FILENAME)
+    for path in (index_path, index_path + "-wal", index_path + "-shm"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as error:
+            color_print.print_red(f"Failed to remove the outdated summary index {path}: {error}")
+
+
+def _normalize_path(relative_path: str) -> str:
+    return os.path.normpath(relative_path).replace(os.sep, '/')
+
+
+def _subtree_prefix(relative_path: str) -> str:
+    path = _normalize_path(relative_path)
+    return '' if path == '.' else path + '/'
+
+
+def _depth(path: str) -> int:
+    return 0 if path == '.' else path.count('/') + 1
@@ -0,0 +1,446 @@
+"""Pluggable storage backends for file and directory summaries."""
+
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from . import color_print
+from .file_utils import write_file_atomic
+from .scan_metrics import timed
+
+
+FILE_SUMMARY_SUFFIX = ".summary.md"
+DIRECTORY_SUMMARY_FILENAME = "_directory_summary.md"
+REPOSITORY_SUMMARY_FILENAME = "_repository_summary.md"
+
+FILE_SUMMARY = "file"
+DIRECTORY_SUMMARY = "directory"
+
+STORE_FILENAME = "summaries.sqlite3"
+DEFAULT_STORE_BACKEND = "sqlite"
+
+# Maximum number of paths per bulk SELECT, below SQLite's bound-parameter limit
+_BULK_READ_SIZE = 500
+
+# (kind, repository-relative path, summary)
+SummaryEntry = Tuple[str, str, str]
+
+
+def get_file_summary_path(metadata_dir: str, relative_path: str) -> str:
+    """Get the summary path for a repository-relative file path.
+
+    Args:
+        metadata_dir: Base directory for scanner_metadata.
+        relative_path: File path relative to the repository root.
+
+    Returns:
+        Path of the file's ``.summary.md``.
+    """
+    return os.path.join(metadata_dir, os.path.normpath(relative_path) + FILE_SUMMARY_SUFFIX)
+
+
+def get_directory_summary_path(metadata_dir: str, relative_path: str) -> str:
+    """Get the rollup summary path for a repository-relative directory path.
+
+    Args:
+        metadata_dir: Base directory for scanner_metadata.
+        relative_path: Directory path relative to the repository root ('.' for the root).
+
+    Returns:
+        Path of the directory's rollup summary.
+    """
+    if relative_path in ('.', ''):
+        return os.path.join(metadata_dir, REPOSITORY_SUMMARY_FILENAME)
+    return os.path.join(metadata_dir, os.path.normpath(relative_path), DIRECTORY_SUMMARY_FILENAME)
+
+
+def load_summary_markdown(summary_path: str) -> Optional[str]:
+    """Load the summary text from a markdown file written by save_summary_markdown.
+    
+    Args:
+        summary_path: Path to the summary markdown file.
+        
+    Returns:
+        Summary text without the header, or None if missing or unreadable.
+    """
+    try:
+        with open(summary_path, 'r') as file:
+            lines = file.readlines()
+    except (IOError, OSError):
+        return None
+    
+    if len(lines) > 2:
+        return ''.join(lines[2:]).strip()
+    return None
+
+
+def save_summary_markdown(summary_path: str, summary_content: str, original_path: str) -> bool:
+    """Save summary to a markdown file.
+    
+    The file is replaced atomically, so an interrupted scan never leaves a
+    truncated summary that later scans would reuse.
+    
+    Args:
+        summary_path: Path where the summary should be saved.
+        summary_content: The summary text to save.
+        original_path: Original file/directory path being summarized.
+        
+    Returns:
+        True if saved successfully, False otherwise.
+    """
+    try:
+        write_file_atomic(summary_path, f"# Summary: {original_path}\n\n{summary_content}\n")
+        return True
+        
+    except (IOError, OSError) as error:
+        color_print.print_red(f"Failed to save summary to {summary_path}: {error}")
+        return False
+
+
+class SummaryStore(ABC):
+    """Storage for the summaries of one scanned repository.
+
+    Summaries are keyed by kind (FILE_SUMMARY or DIRECTORY_SUMMARY) and the
+    repository-relative path of the file or directory, with '.' for the root.
+    Stores are safe to share between threads.
+    """
+
+    @abstractmethod
+    def get(self, kind: str, relative_path: str) -> Optional[str]:
+        """Look up one summary.
+
+        Args:
+            kind: FILE_SUMMARY or DIRECTORY_SUMMARY.
+            relative_path: Path relative to the repository root.
+
+        Returns:
+            The summary if stored, None otherwise.
+        """
+
+    def get_many(self, kind: str, relative_paths: Iterable[str]) -> Dict[str, str]:
+        """Look up several summaries of the same kind at once.
+
+        Args:
+            kind: FILE_SUMMARY or DIRECTORY_SUMMARY.
+            relative_paths: Paths relative to the repository root.
+
+        Returns:
+            Stored summaries keyed by path; missing paths are left out.
+        """
+        summaries = {}
+        for relative_path in relative_paths:
+            summary = self.get(kind, relative_path)
+            if summary is not None:
+                summaries[relative_path] = summary
+        return summaries
+
+    @abstractmethod
+    def put(self, kind: str, relative_path: str, summary: str) -> bool:
+        """Store a summary, replacing any previous one.
+
+        Args:
+            kind: FILE_SUMMARY or DIRECTORY_SUMMARY.
+            relative_path: Path relative to the repository root.
+            summary: Summary text.
+
+        Returns:
+            True if stored successfully, False otherwise.
+        """
+
+    def put_many(self, entries: Iterable[SummaryEntry]) -> int:
+        """Store several summaries.
+
+        Args:
+            entries: (kind, relative path, summary) tuples.
+
+        Returns:
+            Number of summaries stored.
+        """
+        return sum(1 for kind, relative_path, summary in entries if self.put(kind, relative_path, summary))
+
+    @abstractmethod
+    def delete(self, kind: str, relative_path: str) -> bool:
+        """Delete a summary.
+
+        Args:
+            kind: FILE_SUMMARY or DIRECTORY_SUMMARY.
+            relative_path: Path relative to the repository root.
+
+        Returns:
+            True if a summary was deleted, False if there was none.
+        """
+
+    @abstractmethod
+    def items(self) -> Iterator[SummaryEntry]:
+        """Iterate over every stored summary.
+
+        Yields:
+            (kind, relative path, summary) tuples.
+        """
+
+    def close(self) -> None:
+        """Release the store's resources."""
+
+    def __enter__(self) -> "SummaryStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+class MarkdownSummaryStore(SummaryStore):
+    """One markdown file per summary under ``scanner_metadata/``.
+
+    This is the original layout. It is simple to browse but costs several
+    syscalls and an inode per summary, which adds up on large repositories.
+    """
+
+    def __init__(self, metadata_dir: str) -> None:
+        """Initialize the store.
+
+        Args:
+            metadata_dir: Base directory for scanner_metadata.
+        """
+        self.metadata_dir = metadata_dir
+
+    def get(self, kind: str, relative_path: str) -> Optional[str]:
+        return load_summary_markdown(self._summary_path(kind, relative_path))
+
+    def put(self, kind: str, relative_path: str, summary: str) -> bool:
+        with timed("write"):
+            return save_summary_markdown(self._summary_path(kind, relative_path), summary, _display_path(kind, relative_path))
+
+    def delete(self, kind: str, relative_path: str) -> bool:
+        summary_path = self._summary_path(kind, relative_path)
+        try:
+            os.remove(summary_path)
+        except FileNotFoundError:
+            return False
+        except OSError as error:
+            color_print.print_red(f"Failed to delete summary {summary_path}: {error}")
+            return False
+
+        self._remove_empty_parents(os.path.dirname(summary_path))
+        return True
+
+    def items(self) -> Iterator[SummaryEntry]:
+        for root, _, files in os.walk(self.metadata_dir):
+            relative_root = os.path.relpath(root, self.metadata_dir)
+            for file_name in sorted(files):
+                if file_name.endswith(FILE_SUMMARY_SUFFIX):
+                    kind = FILE_SUMMARY
+                    relative_path = os.path.normpath(os.path.join(relative_root, file_name[:-len(FILE_SUMMARY_SUFFIX)]))
+                elif file_name == DIRECTORY_SUMMARY_FILENAME and relative_root != '.':
+                    kind, relative_path = DIRECTORY_SUMMARY, relative_root
+                elif file_name == REPOSITORY_SUMMARY_FILENAME and relative_root == '.':
+                    kind, relative_path = DIRECTORY_SUMMARY, '.'
+                else:
+                    continue
+
+                summary = load_summary_markdown(os.path.join(root, file_name))
+                if summary is not None:
+                    yield kind, relative_path, summary
+
+    def _summary_path(self, kind: str, relative_path: str) -> str:
+        if kind == DIRECTORY_SUMMARY:
+            return get_directory_summary_path(self.metadata_dir, relative_path)
+        return get_file_summary_path(self.metadata_dir, relative_path)
+
+    def _remove_empty_parents(self, directory: str) -> None:
+        """Remove now-empty metadata directories left behind by deleted summaries."""
+        metadata_dir = os.path.normpath(self.metadata_dir)
+        directory = os.path.normpath(directory)
+        while directory != metadata_dir and directory.startswith(metadata_dir + os.sep):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
+
+
+class SqliteSummaryStore(SummaryStore):
+    """All summaries of a repository in one indexed SQLite file.
+
+    Lookups by path are a single primary-key probe, bulk reads are batched
+    into a few queries, and the whole scan touches one file instead of one per
+    summary. Use export_markdown() to produce the markdown layout from it.
+    """
+
+    def __init__(self, metadata_dir: str) -> None:
+        """Open (or create) the store database in the metadata directory.
+
+        Args:
+            metadata_dir: Base directory for scanner_metadata.
+
+        Raises:
+            sqlite3.Error: If the database cannot be opened.
+        """
+        self.metadata_dir = metadata_dir
+        self.store_path = os.path.join(metadata_dir, STORE_FILENAME)
+        os.makedirs(metadata_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.store_path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """CREATE TABLE IF NOT EXISTS summaries (
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                PRIMARY KEY (kind, path)
+            ) WITHOUT ROWID"""
+        )
+        self._connection.commit()
+
+    def get(self, kind: str, relative_path: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT summary FROM summaries WHERE kind = ? AND path = ?",
+                (kind, _normalize_path(relative_path))
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_many(self, kind: str, relative_paths: Iterable[str]) -> Dict[str, str]:
+        paths_by_key = {_normalize_path(relative_path): relative_path for relative_path in relative_paths}
+        keys = list(paths_by_key)
+        summaries = {}
+        with self._lock:
+            for start in range(0, len(keys), _BULK_READ_SIZE):
+                batch = keys[start:start + _BULK_READ_SIZE]
+                rows = self._connection.execute(
+                    f"SELECT path, summary FROM summaries WHERE kind = ? AND path IN ({','.join('?' * len(batch))})",
+                    (kind, *batch)
+                ).fetchall()
+                summaries.update((paths_by_key[path], summary) for path, summary in rows)
+        return summaries
+
+    def put(self, kind: str, relative_path: str, summary: str) -> bool:
+        return self.put_many([(kind, relative_path, summary)]) == 1
+
+    def put_many(self, entries: Iterable[SummaryEntry]) -> int:
+        rows = [(kind, _normalize_path(relative_path), summary) for kind, relative_path, summary in entries]
+        try:
+            with timed("write"), self._lock:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO summaries (kind, path, summary) VALUES (?, ?, ?)", rows
+                )
+                self._connection.commit()
+            return len(rows)
+        except sqlite3.Error as error:
+            color_print.print_red(f"Failed to save {len(rows)} summaries to {self.store_path}: {error}")
+            return 0
+
+    def delete(self, kind: str, relative_path: str) -> bool:
+        with self._lock:
+            deleted = self._connection.execute(
+                "DELETE FROM summaries WHERE kind = ? AND path = ?", (kind, _normalize_path(relative_path))
+            ).rowcount
+            self._connection.commit()
+        return deleted > 0
+
+    def items(self) -> Iterator[SummaryEntry]:
+        # Page through the primary key so large stores are never loaded at once
+        last_key = ("", "")
+        while True:
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT kind, path, summary FROM summaries WHERE (kind, path) > (?, ?) ORDER BY kind, path LIMIT ?",
+                    (*last_key, _BULK_READ_SIZE)
+                ).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_key = rows[-1][:2]
+
+    def count(self) -> int:
+        """Get the number of stored summaries."""
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._connection.close()
+
+
+STORE_BACKENDS = {
+    "sqlite": SqliteSummaryStore,
+    "markdown": MarkdownSummaryStore,
+}
+
+
+def open_summary_store(metadata_dir: str, backend: str = DEFAULT_STORE_BACKEND) -> SummaryStore:
+    """Open the summary store of a repository.
+
+    The first time a SQLite store is opened over a metadata directory that holds
+    markdown summaries from an earlier scan, those summaries are imported so
+    they are not generated again.
+
+    Args:
+        metadata_dir: Base directory for scanner_metadata.
+        backend: Name of the backend, one of STORE_BACKENDS.
+
+    Returns:
+        The opened store.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend not in STORE_BACKENDS:
+        raise ValueError(f"Unknown summary store backend {backend!r}; expected one of {', '.join(STORE_BACKENDS)}")
+
+    if backend != "sqlite":
+        return STORE_BACKENDS[backend](metadata_dir)
+
+    is_new = not os.path.exists(os.path.join(metadata_dir, STORE_FILENAME))
+    store = SqliteSummaryStore(metadata_dir)
+    if is_new:
+        imported = store.put_many(MarkdownSummaryStore(metadata_dir).items())
+        if imported:
+            color_print.print_green(f"Imported {imported} markdown summaries into {store.store_path}")
+    return store
+
+
+def export_markdown(store: SummaryStore, output_dir: str) -> Tuple[int, int]:
+    """Write every summary of a store in the markdown ``scanner_metadata/`` layout.
+
+    Markdown summaries already in output_dir that are not in the store, for
+    files deleted since an earlier export, are removed so the layout mirrors
+    the store. Other files in output_dir are left alone.
+
+    Args:
+        store: Store to export.
+        output_dir: Directory to write the layout to, usually scanner_metadata itself.
+
+    Returns:
+        Number of summaries written and number of stale summaries removed.
+    """
+    target = MarkdownSummaryStore(output_dir)
+    exported = set()
+    written = 0
+    for kind, relative_path, summary in store.items():
+        exported.add((kind, _normalize_path(relative_path)))
+        if target.put(kind, relative_path, summary):
+            written += 1
+
+    # Collect before deleting: removing files and empty directories mid-walk confuses os.walk
+    stale = [
+        (kind, relative_path) for kind, relative_path, _ in target.items()
+        if (kind, _normalize_path(relative_path)) not in exported
+    ]
+    removed = sum(1 for kind, relative_path in stale if target.delete(kind, relative_path))
+    return written, removed
+
+
+def _normalize_path(relative_path: str) -> str:
+    return os.path.normpath(relative_path).replace(os.sep, '/')
+
+
+def _display_path(kind: str, relative_path: str) -> str:
+    """Get the name shown in a markdown summary's header."""
+    if kind == DIRECTORY_SUMMARY and os.path.normpath(relative_path) == '.':
+        return 'repository root'
+    return relative_path
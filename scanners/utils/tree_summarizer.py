@@ -0,0 +1,352 @@
+"""Walk a cloned repository and generate file and directory summaries."""
+
+import functools
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .color_print import Colors
+from .chunked_summary import estimate_tokens
+from .fair_share import CappedClient
+from .file_utils import IgnoreMatcher, is_binary_file
+from .git_index import GitIndex, load_git_index
+from .llm_client import LLMClient, ModelTier
+from .rollup_scheduler import RollupScheduler
+from .scan_journal import DirectoryPlan, ScanJournal
+from .scan_metrics import bind_metrics, get_active_metrics, increment, timed, timed_iter
+from .scan_progress import file_detail
+from .summary_cache import SummaryCache
+from .summary_generator import (
+    BATCH_TOKENS,
+    MAX_BATCH_FILES,
+    SMALL_FILE_TOKENS,
+    generate_directory_summary,
+    generate_file_summaries_batch,
+    generate_file_summary,
+)
+from .summary_store import DIRECTORY_SUMMARY, FILE_SUMMARY, SummaryStore
+
+
+# File tasks queued per worker before the walk waits for summaries to finish
+PENDING_FILE_TASKS_PER_WORKER = 4
+
+
+def summarize_repository_tree(
+    repo_path: str,
+    store: SummaryStore,
+    api_key: str,
+    model: str,
+    client: LLMClient,
+    cache: Optional[SummaryCache],
+    matcher: IgnoreMatcher,
+    max_concurrency: int,
+    affected_dirs: Optional[Set[str]] = None,
+    batch_small_files: bool = True,
+    journal: Optional[ScanJournal] = None,
+    model_tiers: Sequence[ModelTier] = ()
+) -> Optional[str]:
+    """Summarize every file in a repository and roll the results up per directory.
+
+    File summaries and directory rollups share one pool of ``max_concurrency``
+    workers. Each directory is rolled up from its file summaries and its direct
+    children's rollups as soon as those are ready, so rollups overlap with file
+    summarization elsewhere in the tree. Inputs are always ordered by walk order,
+    so the stored summaries do not depend on timing. Requests go through one
+    CappedClient, so the parts of large files summarized in parallel share the
+    same ``max_concurrency`` request slots as everything else.
+
+    The stages form a pipeline with backpressure: the walk (enumeration and
+    binary filtering) runs ahead of the workers (read, summarize, save) by at
+    most PENDING_FILE_TASKS_PER_WORKER queued tasks per worker, and each
+    directory's summaries are released as soon as its parent has rolled it up.
+    Memory therefore stays flat however many files the repository has.
+
+    With a journal, each directory the walk produces is recorded in it as part
+    of the scan's plan just before its files are submitted, and the plan is
+    marked complete when the walk ends. Every stored summary is recorded too.
+    If the journal was resumed, its plan is used without walking the tree, and
+    summaries it records as done are read from the store without being checked
+    again.
+
+    Small files are packed, across directories, into shared requests of up to
+    BATCH_TOKENS tokens with generate_file_summaries_batch.
+
+    Git working trees are enumerated from the index, which lists only tracked
+    files and already knows their sizes and which ones are binary. Other
+    directories are walked on the file system and each file is sniffed for NUL
+    bytes. Files the index lists with identical content are summarized once:
+    the first one is summarized as usual and the others get a copy of its summary.
+
+    Args:
+        repo_path: Path to the repository working tree.
+        store: Store the summaries are read from and saved to.
+        api_key: OpenRouter API key.
+        model: Model name to use for generation.
+        client: Shared LLM client to reuse across requests.
+        cache: Global content-addressed summary cache, or None to disable it.
+        matcher: Compiled ignore rules; ignored directories are pruned from the walk.
+            Applied on top of git's own rules when walking the index.
+        max_concurrency: Maximum number of LLM requests in flight.
+        affected_dirs: Absolute paths of the directories that need new summaries.
+            Other directories that already have a rollup are reused without being
+            walked. None summarizes the whole tree.
+        batch_small_files: Whether to summarize small files in shared requests.
+        journal: Journal to record the plan and progress of the scan in, or to
+            resume from if its plan is already recorded. None runs unjournaled.
+        model_tiers: Models for files up to a given size, as from load_model_tiers().
+            Directory rollups always use model.
+
+    Returns:
+        The repository summary, or None if none could be generated.
+    """
+    repo_path = os.path.normpath(repo_path)
+    if client is not None:
+        client = CappedClient(client, max_concurrency)
+
+    def absolute_path(relative_path):
+        return os.path.normpath(os.path.join(repo_path, relative_path))
+
+    def record_done(kind, relative_path, summary):
+        if summary is not None and journal is not None:
+            journal.record_done(kind, relative_path)
+        return summary
+
+    def summarize_file(file_path, relative_path, blob_id):
+        summary = None
+        try:
+            summary = generate_file_summary(
+                file_path, store, repo_path, api_key, model, client, cache, model_tiers=model_tiers
+            )
+        finally:
+            if blob_id is not None:
+                duplicates.resolve(blob_id, summary)
+        return record_done(FILE_SUMMARY, relative_path, summary)
+
+    def summarize_batch(file_paths, relative_paths, blob_ids):
+        summaries = [None] * len(file_paths)
+        try:
+            summaries = generate_file_summaries_batch(
+                file_paths, store, repo_path, api_key, model, client, cache, model_tiers
+            )
+        finally:
+            for blob_id, summary in zip(blob_ids, summaries):
+                if blob_id is not None:
+                    duplicates.resolve(blob_id, summary)
+        return [record_done(FILE_SUMMARY, *entry) for entry in zip(relative_paths, summaries)]
+
+    def copy_duplicate(directory_path, index, relative_path, original_path, summary):
+        if summary is not None and store.put(FILE_SUMMARY, relative_path, summary):
+            file_detail(f"Summary shared with identical file {original_path}: {relative_path}", Colors.GREEN)
+            increment("files_deduplicated")
+            record_done(FILE_SUMMARY, relative_path, summary)
+        else:
+            summary = None
+        scheduler.add_completed_file(directory_path, index, summary)
+
+    def rollup(directory_path, summaries):
+        with timed("rollup"):
+            summary = generate_directory_summary(directory_path, store, repo_path, api_key, model, summaries, client)
+        return record_done(DIRECTORY_SUMMARY, os.path.relpath(directory_path, repo_path), summary)
+
+    # Directory, index, path, relative path and shared blob of each small file waiting for a batch
+    batch_files: List[Tuple[str, int, str, str, Optional[str]]] = []
+    batch_tokens = 0
+
+    def submit_batch():
+        nonlocal batch_files, batch_tokens
+        directories, indexes, file_paths, relative_paths, blob_ids = zip(*batch_files)
+        scheduler.submit_batch(list(zip(directories, indexes)), summarize_batch, file_paths, relative_paths, blob_ids)
+        batch_files = []
+        batch_tokens = 0
+
+    with timed("walk"):
+        git_index = load_git_index(repo_path)
+    duplicates = _DuplicateFiles(git_index) if git_index is not None else None
+
+    resumed = journal is not None and journal.planned
+    if resumed:
+        plans = journal.read_plan()
+        if journal.planned_files is not None:
+            increment("files_planned", journal.planned_files)
+    else:
+        plans = plan_repository_tree(repo_path, store, matcher, affected_dirs, batch_small_files, git_index)
+        if journal is not None:
+            plans = journal.record_plan(plans)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, initializer=bind_metrics, initargs=(get_active_metrics(),)) as executor:
+        scheduler = RollupScheduler(executor, rollup, max_concurrency * PENDING_FILE_TASKS_PER_WORKER)
+        # Directories whose rollup is already known, so their subtrees need no work
+        completed: Set[str] = set()
+
+        for plan in plans:
+            root = absolute_path(plan.path)
+            parent = None if plan.parent is None else absolute_path(plan.parent)
+            if plan.parent in completed:
+                completed.add(plan.path)
+                # Only a resumed scan plans directories below a completed one
+                if plan.files:
+                    increment("files_resumed", len(plan.files))
+                continue
+
+            if plan.reuse or (journal is not None and journal.is_done(DIRECTORY_SUMMARY, plan.path)):
+                existing_summary = store.get(DIRECTORY_SUMMARY, plan.path)
+                if existing_summary or plan.reuse:
+                    completed.add(plan.path)
+                    scheduler.add_completed_directory(root, parent, existing_summary)
+                    if plan.files:
+                        increment("files_resumed", len(plan.files))
+                    continue
+
+            scheduler.add_directory(root, parent, [absolute_path(child) for child in plan.children], len(plan.files))
+            increment("files_discovered", len(plan.files))
+
+            relative_paths = [os.path.join(plan.path, file_name) if plan.path != '.' else file_name for file_name, _ in plan.files]
+            done_summaries = {}
+            if journal is not None and journal.done_count:
+                done_summaries = store.get_many(
+                    FILE_SUMMARY, [relative_path for relative_path in relative_paths if journal.is_done(FILE_SUMMARY, relative_path)]
+                )
+
+            for index, ((file_name, file_size), relative_path) in enumerate(zip(plan.files, relative_paths)):
+                file_path = os.path.join(root, file_name)
+                # Set only for the first file of content that other files share
+                blob_id = duplicates.blob_id(file_path) if duplicates is not None else None
+                if blob_id is not None and not duplicates.claim(blob_id, relative_path):
+                    if relative_path in done_summaries:
+                        scheduler.add_completed_file(root, index, done_summaries[relative_path])
+                        increment("files_resumed")
+                        continue
+                    existing_summary = store.get(FILE_SUMMARY, relative_path)
+                    if existing_summary is not None:
+                        scheduler.add_completed_file(root, index, existing_summary)
+                        increment("files_reused")
+                        continue
+                    duplicates.wait(blob_id, functools.partial(copy_duplicate, root, index, relative_path))
+                    continue
+
+                if relative_path in done_summaries:
+                    scheduler.add_completed_file(root, index, done_summaries[relative_path])
+                    increment("files_resumed")
+                    if blob_id is not None:
+                        duplicates.resolve(blob_id, done_summaries[relative_path])
+                    continue
+
+                file_tokens = estimate_tokens(file_size) if batch_small_files and file_size is not None else None
+                if file_tokens is None or file_tokens > SMALL_FILE_TOKENS:
+                    scheduler.submit_file(root, index, summarize_file, file_path, relative_path, blob_id)
+                    continue
+
+                if batch_files and (batch_tokens + file_tokens > BATCH_TOKENS or len(batch_files) >= MAX_BATCH_FILES):
+                    submit_batch()
+                batch_files.append((root, index, file_path, relative_path, blob_id))
+                batch_tokens += file_tokens
+
+        if batch_files:
+            submit_batch()
+        # The walk is over, so the total is final
+        if not resumed and journal is not None and journal.planned:
+            increment("files_planned", journal.planned_files)
+
+        return scheduler.wait()
+
+
+def plan_repository_tree(
+    repo_path: str,
+    store: SummaryStore,
+    matcher: IgnoreMatcher,
+    affected_dirs: Optional[Set[str]] = None,
+    measure_sizes: bool = True,
+    git_index: Optional[GitIndex] = None
+) -> Iterator[DirectoryPlan]:
+    """Walk the repository and yield the work for each directory, parents first.
+
+    Only enumerates and filters; nothing is read, summarized or stored.
+
+    Args:
+        repo_path: Normalized path to the repository working tree.
+        store: Store holding the existing summaries.
+        matcher: Compiled ignore rules; ignored directories are pruned from the walk.
+        affected_dirs: Absolute paths of the directories that need new summaries.
+            Other directories that already have a rollup are planned for reuse
+            and their subtrees are not walked. None plans the whole tree.
+        measure_sizes: Whether to measure the size of every text file.
+        git_index: Index of the repository to enumerate the tracked files from,
+            or None to walk the file system.
+
+    Yields:
+        The plan of each directory to summarize or reuse.
+    """
+    if git_index is not None:
+        tree_walk, get_size = git_index.walk(matcher), git_index.get_size
+    else:
+        tree_walk, get_size = matcher.walk(repo_path), os.path.getsize
+
+    for root, dirs, files in timed_iter("walk", tree_walk):
+        relative_root = os.path.relpath(root, repo_path)
+        parent = None if relative_root == '.' else os.path.dirname(relative_root) or '.'
+
+        # Directories untouched since the last scan keep their rollup, and so does their whole subtree
+        if affected_dirs is not None and os.path.normpath(root) not in affected_dirs:
+            if store.get(DIRECTORY_SUMMARY, relative_root):
+                dirs[:] = []
+                yield DirectoryPlan(relative_root, parent, reuse=True)
+                continue
+
+        with timed("filter"):
+            text_files = [file_name for file_name in files if not is_binary_file(os.path.join(root, file_name))]
+            file_sizes = [get_size(os.path.join(root, file_name)) if measure_sizes else None for file_name in text_files]
+        children = [os.path.normpath(os.path.join(relative_root, dir_name)) for dir_name in dirs]
+        yield DirectoryPlan(relative_root, parent, children, list(zip(text_files, file_sizes)))
+
+
+class _DuplicateFiles:
+    """Shares one summary between the files of a scan that have identical content.
+
+    Only blobs the Git index lists under several paths are tracked. The first
+    file claiming such a blob is summarized as usual and resolves it with its
+    summary. Every other file registers a callback instead of taking a worker,
+    and is called back with the summary once the blob is resolved.
+    """
+
+    def __init__(self, git_index: GitIndex) -> None:
+        self._git_index = git_index
+        self._blob_ids = git_index.duplicate_blob_ids()
+        self._lock = threading.Lock()
+        self._owners: Dict[str, str] = {}
+        self._summaries: Dict[str, Optional[str]] = {}
+        self._waiters: Dict[str, List[Callable[[str, Optional[str]], None]]] = defaultdict(list)
+
+    def blob_id(self, file_path: str) -> Optional[str]:
+        """Get the blob of a file if other tracked files have the same content, None otherwise."""
+        if not self._blob_ids:
+            return None
+        entry = self._git_index.get(file_path)
+        return entry.blob_id if entry is not None and entry.blob_id in self._blob_ids else None
+
+    def claim(self, blob_id: str, relative_path: str) -> bool:
+        """Make the file the one summarized for its blob, unless another file already is.
+
+        Returns:
+            True if the file claimed the blob and must resolve it.
+        """
+        with self._lock:
+            return self._owners.setdefault(blob_id, relative_path) == relative_path
+
+    def wait(self, blob_id: str, callback: Callable[[str, Optional[str]], None]) -> None:
+        """Call back with the claiming file's path and summary once the blob is resolved."""
+        with self._lock:
+            if blob_id not in self._summaries:
+                self._waiters[blob_id].append(callback)
+                return
+            summary = self._summaries[blob_id]
+        callback(self._owners[blob_id], summary)
+
+    def resolve(self, blob_id: str, summary: Optional[str]) -> None:
+        """Publish the summary of a claimed blob, None if it has none, to the waiting files."""
+        with self._lock:
+            self._summaries[blob_id] = summary
+            waiters = self._waiters.pop(blob_id, [])
+        for callback in waiters:
+            callback(self._owners[blob_id], summary)